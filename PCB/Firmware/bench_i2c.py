@@ -0,0 +1,42 @@
+from machine import Pin, SoftI2C as MachineSoftI2C
+import time
+from softi2c import SoftI2C
+
+# Same bus as main.py: SDA GP14, SCL GP15, MPU6050 at 0x68
+SDA_PIN = 14
+SCL_PIN = 15
+MPU6050_ADDR = 0x68
+ROUNDS = 200
+
+def bench(name, i2c):
+    """Time WHO_AM_I and 14-byte sensor bursts (accel, temp, gyro)."""
+    buf = bytearray(14)
+    who = i2c.readfrom_mem(MPU6050_ADDR, 0x75, 1)[0]
+
+    t0 = time.ticks_us()
+    for _ in range(ROUNDS):
+        i2c.readfrom_mem(MPU6050_ADDR, 0x75, 1)
+    single_us = time.ticks_diff(time.ticks_us(), t0) / ROUNDS
+
+    t0 = time.ticks_us()
+    for _ in range(ROUNDS):
+        i2c.readfrom_mem_into(MPU6050_ADDR, 0x3B, buf)
+    burst_us = time.ticks_diff(time.ticks_us(), t0) / ROUNDS
+
+    # 14 data bytes + address/register/address bytes, 9 clocks each
+    khz = (17 * 9) / burst_us * 1000
+    print(f"{name:<22} WHO_AM_I=0x{who:02X}  1 byte: {single_us:7.1f} us  "
+          f"14 bytes: {burst_us:7.1f} us  (~{khz:.0f} kHz effective)")
+    return bytes(buf)
+
+print("=== BENCH SoftI2C ===")
+i2c_ref = MachineSoftI2C(sda=Pin(SDA_PIN), scl=Pin(SCL_PIN), freq=400000)
+ref = bench("machine.SoftI2C", i2c_ref)
+
+i2c_fast = SoftI2C(SCL_PIN, SDA_PIN, freq=400000)
+fast = bench("softi2c (viper)", i2c_fast)
+
+i2c_pins = SoftI2C(Pin(SCL_PIN), Pin(SDA_PIN), freq=400000)
+bench("softi2c (Pin objects)", i2c_pins)
+
+print("Same data layout:", len(ref) == len(fast))
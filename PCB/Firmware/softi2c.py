@@ -0,0 +1,351 @@
+"""
+Fast bit-banged I2C master for MicroPython.
+
+Drop-in replacement for the SoftI2C class that lived in mpu6050_temp.py.
+Compared with it:
+    - timing uses sleep_us / calibrated busy-waits instead of float-second
+      time.sleep() calls
+    - both lines are configured once as open-drain; a byte no longer
+      reconfigures SDA
+    - SCL is released and polled, so devices may stretch the clock
+    - readfrom_mem_into() reads bursts into a caller-owned buffer
+    - on the RP2040, when the pins are given as GPIO numbers, the bit loops
+      run as viper code poking the SIO registers directly
+
+Passing Pin-like objects selects the portable path, which only needs
+pin(value), pin() and pin.init(). It is plain Python and several times
+slower than machine.SoftI2C, so prefer machine.SoftI2C wherever the viper
+path is not available. The host benchmark (polysense/sim/bench_softi2c.py)
+times the portable path and checks the viper loops' logic byte for byte;
+their speed is measured on the board with bench_i2c.py.
+"""
+
+import sys
+import time
+
+try:
+    import micropython
+    _VIPER = sys.platform == "rp2"
+except ImportError:
+    _VIPER = False
+
+_SIO_BASE = 0xD0000000  # RP2040 single-cycle IO block
+_STRETCH_TIMEOUT_US = 10000
+
+
+if _VIPER:
+    # SIO register offsets: GPIO_IN 0x04, GPIO_OE_SET 0x24, GPIO_OE_CLR 0x28.
+    # Lines are open-drain: OUT is kept at 0, enabling the driver pulls the
+    # line low and disabling it lets the pull-up release it.
+    # ``pins`` packs the SCL GPIO in bits 0-7 and SDA in bits 8-15.
+
+    @micropython.viper
+    def _v_spin(loops: int):
+        while loops > 0:
+            loops -= 1
+
+    @micropython.viper
+    def _v_condition(sio: int, pins: int, stop: int, loops: int) -> int:
+        gpio_in = ptr32(sio + 0x04)
+        oe_set = ptr32(sio + 0x24)
+        oe_clr = ptr32(sio + 0x28)
+        scl = 1 << (pins & 0xFF)
+        sda = 1 << ((pins >> 8) & 0xFF)
+        if stop:
+            oe_set[0] = sda
+        else:
+            oe_clr[0] = sda
+        n = loops
+        while n > 0:
+            n -= 1
+        oe_clr[0] = scl
+        t = loops * 4096 + 4096
+        while (gpio_in[0] & scl) == 0:
+            t -= 1
+            if t == 0:
+                return -1
+        n = loops
+        while n > 0:
+            n -= 1
+        if stop:
+            oe_clr[0] = sda
+        else:
+            oe_set[0] = sda
+            n = loops
+            while n > 0:
+                n -= 1
+            oe_set[0] = scl
+        return 0
+
+    @micropython.viper
+    def _v_write_byte(sio: int, pins: int, byte: int, loops: int) -> int:
+        gpio_in = ptr32(sio + 0x04)
+        oe_set = ptr32(sio + 0x24)
+        oe_clr = ptr32(sio + 0x28)
+        scl = 1 << (pins & 0xFF)
+        sda = 1 << ((pins >> 8) & 0xFF)
+        i = 8
+        while i >= 0:
+            if i == 0:
+                oe_clr[0] = sda  # release SDA for the ACK bit
+            elif (byte >> (i - 1)) & 1:
+                oe_clr[0] = sda
+            else:
+                oe_set[0] = sda
+            n = loops
+            while n > 0:
+                n -= 1
+            oe_clr[0] = scl
+            t = loops * 4096 + 4096
+            while (gpio_in[0] & scl) == 0:
+                t -= 1
+                if t == 0:
+                    return -1
+            n = loops
+            while n > 0:
+                n -= 1
+            ack = gpio_in[0] & sda
+            oe_set[0] = scl
+            i -= 1
+        return 0 if ack == 0 else 1
+
+    @micropython.viper
+    def _v_read_byte(sio: int, pins: int, nack: int, loops: int) -> int:
+        gpio_in = ptr32(sio + 0x04)
+        oe_set = ptr32(sio + 0x24)
+        oe_clr = ptr32(sio + 0x28)
+        scl = 1 << (pins & 0xFF)
+        sda = 1 << ((pins >> 8) & 0xFF)
+        oe_clr[0] = sda
+        value = 0
+        i = 9
+        while i > 0:
+            if i == 1:
+                if nack:
+                    oe_clr[0] = sda
+                else:
+                    oe_set[0] = sda
+            n = loops
+            while n > 0:
+                n -= 1
+            oe_clr[0] = scl
+            t = loops * 4096 + 4096
+            while (gpio_in[0] & scl) == 0:
+                t -= 1
+                if t == 0:
+                    return -1
+            if i > 1:
+                value = (value << 1) | (1 if gpio_in[0] & sda else 0)
+            n = loops
+            while n > 0:
+                n -= 1
+            oe_set[0] = scl
+            i -= 1
+        oe_clr[0] = sda
+        return value
+
+
+class SoftI2C:
+    """
+    Bit-banged I2C master with the machine.I2C memory/stream API.
+
+    Args:
+        scl_pin: SCL GPIO number or Pin object
+        sda_pin: SDA GPIO number or Pin object
+        freq: Target SCL frequency in Hz
+        timeout_us: Maximum clock-stretching time
+    """
+
+    def __init__(self, scl_pin, sda_pin, freq=400000, timeout_us=_STRETCH_TIMEOUT_US):
+        self.timeout_us = timeout_us
+        self.half_us = max(0, 500000 // freq)
+        self._viper = _VIPER and isinstance(scl_pin, int) and isinstance(sda_pin, int)
+        if self._viper:
+            from machine import Pin, mem32
+            self.scl = Pin(scl_pin, Pin.IN, Pin.PULL_UP)
+            self.sda = Pin(sda_pin, Pin.IN, Pin.PULL_UP)
+            mask = (1 << scl_pin) | (1 << sda_pin)
+            mem32[_SIO_BASE + 0x18] = mask  # GPIO_OUT_CLR: drive 0 when enabled
+            self._pins = scl_pin | (sda_pin << 8)
+            self._loops = self._calibrate(500000 / freq)
+        else:
+            if isinstance(scl_pin, int):
+                from machine import Pin
+                scl_pin = Pin(scl_pin)
+                sda_pin = Pin(sda_pin)
+            self.scl = scl_pin
+            self.sda = sda_pin
+            self.scl.init(self.scl.OPEN_DRAIN, self.scl.PULL_UP)
+            self.sda.init(self.sda.OPEN_DRAIN, self.sda.PULL_UP)
+            self.scl(1)
+            self.sda(1)
+
+    @staticmethod
+    def _calibrate(half_us):
+        """Busy-wait loop count for half an SCL period."""
+        n = 20000
+        t0 = time.ticks_us()
+        _v_spin(n)
+        dt = time.ticks_diff(time.ticks_us(), t0)
+        per_us = n / max(dt, 1)
+        # Register accesses and the stretch check take roughly one third
+        # of a half period at 400 kHz; subtract them
+        return max(0, int(half_us * per_us * 0.66))
+
+    # --- portable bus primitives ---
+    def _scl_release(self):
+        """Release SCL and wait while a device stretches the clock."""
+        scl = self.scl
+        scl(1)
+        if not scl():
+            t0 = time.ticks_us()
+            while not scl():
+                if time.ticks_diff(time.ticks_us(), t0) > self.timeout_us:
+                    raise OSError(110)  # ETIMEDOUT
+
+    def start(self):
+        if self._viper:
+            if _v_condition(_SIO_BASE, self._pins, 0, self._loops) < 0:
+                raise OSError(110)
+            return
+        sleep_us = time.sleep_us
+        d = self.half_us
+        self.sda(1)
+        self._scl_release()
+        sleep_us(d)
+        self.sda(0)
+        sleep_us(d)
+        self.scl(0)
+
+    def stop(self):
+        if self._viper:
+            if _v_condition(_SIO_BASE, self._pins, 1, self._loops) < 0:
+                raise OSError(110)
+            return
+        sleep_us = time.sleep_us
+        d = self.half_us
+        self.sda(0)
+        sleep_us(d)
+        self._scl_release()
+        sleep_us(d)
+        self.sda(1)
+        sleep_us(d)
+
+    def write_byte(self, byte):
+        """Send one byte; returns True if the device acknowledged it."""
+        if self._viper:
+            r = _v_write_byte(_SIO_BASE, self._pins, byte, self._loops)
+            if r < 0:
+                raise OSError(110)
+            return r == 0
+        sleep_us = time.sleep_us
+        d = self.half_us
+        scl = self.scl
+        sda = self.sda
+        release = self._scl_release
+        for i in range(7, -1, -1):
+            sda((byte >> i) & 1)
+            sleep_us(d)
+            release()
+            sleep_us(d)
+            scl(0)
+        sda(1)
+        sleep_us(d)
+        release()
+        sleep_us(d)
+        ack = sda()
+        scl(0)
+        return ack == 0
+
+    def read_byte(self, ack=True):
+        """Receive one byte, then ACK (more to come) or NACK (last byte)."""
+        if self._viper:
+            r = _v_read_byte(_SIO_BASE, self._pins, 0 if ack else 1, self._loops)
+            if r < 0:
+                raise OSError(110)
+            return r
+        sleep_us = time.sleep_us
+        d = self.half_us
+        scl = self.scl
+        sda = self.sda
+        release = self._scl_release
+        sda(1)
+        byte = 0
+        for i in range(8):
+            sleep_us(d)
+            release()
+            sleep_us(d)
+            byte = (byte << 1) | sda()
+            scl(0)
+        sda(0 if ack else 1)
+        sleep_us(d)
+        release()
+        sleep_us(d)
+        scl(0)
+        sda(1)
+        return byte
+
+    # --- machine.I2C compatible API ---
+    def _address(self, addr, read):
+        if not self.write_byte((addr << 1) | read):
+            self.stop()
+            raise OSError(19)  # ENODEV
+
+    def _write_all(self, data):
+        for b in data:
+            if not self.write_byte(b):
+                self.stop()
+                raise OSError(5)  # EIO
+
+    def _read_into(self, buf):
+        last = len(buf) - 1
+        for i in range(len(buf)):
+            buf[i] = self.read_byte(ack=(i < last))
+
+    def scan(self):
+        found = []
+        for addr in range(0x08, 0x78):
+            self.start()
+            if self.write_byte(addr << 1):
+                found.append(addr)
+            self.stop()
+        return found
+
+    def writeto(self, addr, data):
+        self.start()
+        self._address(addr, 0)
+        self._write_all(data)
+        self.stop()
+
+    def readfrom_into(self, addr, buf):
+        self.start()
+        self._address(addr, 1)
+        self._read_into(buf)
+        self.stop()
+
+    def readfrom(self, addr, num_bytes):
+        buf = bytearray(num_bytes)
+        self.readfrom_into(addr, buf)
+        return bytes(buf)
+
+    def writeto_mem(self, addr, reg, data):
+        self.start()
+        self._address(addr, 0)
+        self._write_all((reg,))
+        self._write_all(data)
+        self.stop()
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        """Burst read len(buf) bytes starting at ``reg`` (repeated start)."""
+        self.start()
+        self._address(addr, 0)
+        self._write_all((reg,))
+        self.start()
+        self._address(addr, 1)
+        self._read_into(buf)
+        self.stop()
+
+    def readfrom_mem(self, addr, reg, num_bytes):
+        buf = bytearray(num_bytes)
+        self.readfrom_mem_into(addr, reg, buf)
+        return bytes(buf)
@@ -8,17 +8,26 @@ class AHT20:
     """
     Biblioteca para ler temperatura e umidade do AHT20.
     """
-    def __init__(self, i2c):
+    def __init__(self, i2c, defer_init=False):
         self.i2c = i2c
         self.addr = AHT20_ADDR
         self.is_ready = False
-        self._initialize_sensor()
+        if not defer_init:
+            self._initialize_sensor()
 
     def _initialize_sensor(self):
         """Inicializa e verifica a conexão com o sensor."""
+        for wait_ms in self.init_steps():
+            time.sleep_ms(wait_ms)
+
+    def init_steps(self):
+        """
+        Gerador com a sequência de inicialização; cada valor produzido
+        é a espera (em ms) antes do próximo passo.
+        """
         try:
             self.i2c.writeto(self.addr, b'\xbe') # Wake-up
-            time.sleep(0.1)
+            yield 100
             status = self.i2c.readfrom(self.addr, 1)[0]
             if (status & 0x08) == 0x08:
                 self.is_ready = True
@@ -153,4 +153,26 @@ class BMP280:
             return temp_celsius, pressure_hpa
         except OSError as e:
             print(f"BMP280: Data read error: {e}")
-            return None, None
\ No newline at end of file
+            return None, None
+
+    def get_latest(self):
+        """
+        Return the most recent result of the continuous (normal mode)
+        conversion without triggering a new one or waiting.
+        Reads pressure and temperature in a single 6-byte burst, so it is
+        cheap enough for high-rate sampling.
+
+        Returns:
+            tuple: (temperature_celsius, pressure_hpa) or (None, None) on error
+        """
+        if not self.is_ready:
+            return None, None
+
+        try:
+            raw = self.i2c.readfrom_mem(self.addr, 0xF7, 6)
+            adc_P = (raw[0] << 12) | (raw[1] << 4) | (raw[2] >> 4)
+            adc_T = (raw[3] << 12) | (raw[4] << 4) | (raw[5] >> 4)
+            temp_celsius = self._compensate_temperature(adc_T)
+            return temp_celsius, self._compensate_pressure(adc_P)
+        except OSError as e:
+            return None, None
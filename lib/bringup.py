@@ -0,0 +1,52 @@
+"""
+Concurrent sensor bring-up for MicroPython.
+
+Drivers expose their initialisation as a generator (``init_steps()``) that
+yields the number of milliseconds to wait before the next step. ``run``
+drives all of them together so the individual waits overlap, and fills the
+remaining idle time with blocking jobs such as mounting the SD card or the
+OneWire ROM search.
+"""
+
+import time
+
+
+def run(steps, idle=()):
+    """
+    Drive init step generators concurrently.
+
+    Args:
+        steps: Iterable of generators yielding wait times in ms
+        idle: Callables executed, one at a time, while every generator waits
+
+    Returns:
+        Elapsed time in ms
+    """
+    t0 = time.ticks_ms()
+    pending = [[t0, gen] for gen in steps]
+    idle = list(idle)
+
+    while pending:
+        for entry in pending[:]:
+            if time.ticks_diff(entry[0], time.ticks_ms()) <= 0:
+                try:
+                    wait_ms = next(entry[1])
+                    entry[0] = time.ticks_add(time.ticks_ms(), wait_ms)
+                except StopIteration:
+                    pending.remove(entry)
+        if not pending:
+            break
+
+        if idle:
+            idle.pop(0)()
+            continue
+
+        now = time.ticks_ms()
+        wait_ms = min(time.ticks_diff(entry[0], now) for entry in pending)
+        if wait_ms > 0:
+            time.sleep_ms(wait_ms)
+
+    for job in idle:
+        job()
+
+    return time.ticks_diff(time.ticks_ms(), t0)
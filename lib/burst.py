@@ -0,0 +1,259 @@
+"""
+High-rate burst capture with on-device CIC decimation.
+
+A soft ``machine.Timer`` samples the fast channels at 1-10 Hz into a ring
+of preallocated integer blocks while the main loop keeps logging its
+30-second rows; the main loop only calls ``flush()`` once per cycle to
+write completed blocks to the card. A main-loop cycle is a little longer
+than a block (30 s of sleep plus the sensor reads), so now and then two
+blocks complete between flushes; the ring has room for both. The timer
+only refills a block once flush() has written it out: if none is free, the
+samples of the next block are dropped and counted in ``lost_blocks``.
+
+Each channel is a callable returning a reading in engineering units (or
+None); it is stored as a fixed-point integer (``value * scale``). Missing
+readings, and ticks that fall inside ``pause()``/``resume()`` (bit-banged
+DS18B20/DHT11 transfers must not be interrupted), repeat the previous
+value so the sample grid stays uniform.
+
+Outputs:
+    decimated  CIC-filtered stream at ``rate_hz / decimation`` appended to
+               a CSV (Timestamp, Offset_s, one column per channel)
+    raw        full-rate blocks appended to a binary file, read back on a
+               PC with ``read_blocks()``
+"""
+
+import struct
+import time
+from array import array
+
+BLOCK_MAGIC = b"PSBB"
+BLOCK_VERSION = 1
+_BLOCK_FMT = "<4sB19sHHB"  # magic, version, timestamp, rate_hz, samples, channels
+BUFFERS = 3  # blocks in the ring: one being filled, up to two awaiting flush()
+
+# CIC registers wrap at this width; must hold |x| * decimation**order, where
+# x is a sample minus the channel's reference value (see CIC.push).
+_CIC_BITS = 28
+_CIC_MASK = (1 << _CIC_BITS) - 1
+_CIC_SIGN = 1 << (_CIC_BITS - 1)
+
+
+class CIC:
+    """
+    Integer cascaded integrator-comb decimator (differential delay 1).
+
+    Acts as an anti-alias low-pass with nulls at multiples of the output
+    rate. Registers use modular arithmetic, so they stay small integers.
+
+    Args:
+        order: Number of integrator/comb stages
+        ratio: Decimation ratio
+    """
+
+    def __init__(self, order, ratio):
+        self.order = order
+        self.ratio = ratio
+        self.gain = ratio ** order
+        self.integ = array("i", [0] * order)
+        self.comb = array("i", [0] * order)
+        self.count = 0
+
+    def push(self, x):
+        """Feed one sample; returns the decimated output every ``ratio`` samples, else None."""
+        integ = self.integ
+        for i in range(self.order):
+            x = (integ[i] + x) & _CIC_MASK
+            integ[i] = x
+        self.count += 1
+        if self.count < self.ratio:
+            return None
+        self.count = 0
+        comb = self.comb
+        for i in range(self.order):
+            y = (x - comb[i]) & _CIC_MASK
+            comb[i] = x
+            x = y
+        if x & _CIC_SIGN:
+            x -= 1 << _CIC_BITS
+        return (x + self.gain // 2) // self.gain
+
+
+class BurstSampler:
+    """
+    Timer-driven multi-channel sampler.
+
+    Args:
+        channels: List of (name, read_fn, scale); read_fn() returns a float
+                  or None, stored as int(value * scale)
+        rate_hz: Sampling rate (1-10 Hz)
+        block_s: Seconds per block (normally the logging interval)
+        decimation: CIC decimation ratio
+        order: CIC order
+        output: "decimated" or "raw"
+        buffers: Blocks in the ring (at least 2)
+    """
+
+    def __init__(self, channels, rate_hz=10, block_s=30, decimation=10, order=3,
+                 output="decimated", buffers=BUFFERS):
+        self.names = [c[0] for c in channels]
+        self.readers = [c[1] for c in channels]
+        self.scales = [c[2] for c in channels]
+        self.rate_hz = rate_hz
+        self.output = output
+        self.nch = len(channels)
+        self.samples = rate_hz * block_s
+        if self.samples % decimation:
+            raise ValueError("block length must be a multiple of the decimation ratio")
+        self.decimation = decimation
+        self.out_samples = self.samples // decimation
+
+        # Preallocated ring of blocks; the timer fills one while the main
+        # loop writes the completed ones
+        if output == "raw":
+            size = self.samples * self.nch
+        else:
+            size = self.out_samples * self.nch
+        self.bufs = [array("i", [0] * size) for _ in range(buffers)]
+        self.stamps = [""] * buffers
+        self.ready = [False] * buffers
+        self.seqs = [0] * buffers   # completion order, so flush() writes oldest first
+        self.blocks = 0
+        self.active = 0
+        self.n = 0
+        self.dropping = False
+        self.lost_blocks = 0
+
+        self.cics = [CIC(order, decimation) for _ in range(self.nch)]
+        self.ref = array("i", [0] * self.nch)
+        self.last = array("i", [0] * self.nch)
+        self.have_ref = False
+        self.paused = False
+        self.timer = None
+
+    def start(self):
+        from machine import Timer
+        self.timer = Timer(period=1000 // self.rate_hz, mode=Timer.PERIODIC,
+                           callback=self._tick)
+
+    def stop(self):
+        if self.timer:
+            self.timer.deinit()
+            self.timer = None
+
+    def pause(self):
+        """Hold the last values (no bus traffic) until resume()."""
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    def _read(self):
+        last = self.last
+        if self.paused:
+            return
+        for c in range(self.nch):
+            try:
+                v = self.readers[c]()
+                if v is not None:
+                    last[c] = int(v * self.scales[c])
+            except Exception:
+                pass # Hold the previous value
+        if not self.have_ref:
+            # Decimate deviations from the first reading to keep CIC registers small
+            for c in range(self.nch):
+                self.ref[c] = last[c]
+            self.have_ref = True
+
+    def _tick(self, timer):
+        self._read()
+        buf = self.bufs[self.active]
+        nch = self.nch
+        if self.n == 0:
+            # A block still waiting for (or being written by) flush() is never reused
+            self.dropping = self.ready[self.active]
+            if not self.dropping:
+                t = time.localtime()
+                self.stamps[self.active] = "{:04d}-{:02d}-{:02d} {:02d}:{:02d}:{:02d}".format(
+                    t[0], t[1], t[2], t[3], t[4], t[5])
+
+        if self.output == "raw":
+            if not self.dropping:
+                base = self.n * nch
+                for c in range(nch):
+                    buf[base + c] = self.last[c]
+        else:
+            for c in range(nch):
+                # The filters run on while dropping, so the next block starts clean
+                y = self.cics[c].push(self.last[c] - self.ref[c])
+                if y is not None and not self.dropping:
+                    buf[(self.n // self.decimation) * nch + c] = y + self.ref[c]
+
+        self.n += 1
+        if self.n == self.samples:
+            self.n = 0
+            if self.dropping:
+                self.lost_blocks += 1 # Writer fell behind; this block was not stored
+            else:
+                self.seqs[self.active] = self.blocks
+                self.blocks += 1
+                self.ready[self.active] = True
+                self.active = (self.active + 1) % len(self.bufs)
+
+    def flush(self, path):
+        """Append every completed block to ``path``, oldest first; call from the main loop."""
+        pending = [i for i in range(len(self.bufs)) if self.ready[i]]
+        for i in sorted(pending, key=lambda i: self.seqs[i]):
+            if self.output == "raw":
+                self._write_raw(path, i)
+            else:
+                self._write_csv(path, i)
+            self.ready[i] = False
+
+    def _write_raw(self, path, i):
+        header = struct.pack(_BLOCK_FMT, BLOCK_MAGIC, BLOCK_VERSION, self.stamps[i].encode(),
+                             self.rate_hz, self.samples, self.nch)
+        with open(path, "ab") as f:
+            f.write(header)
+            f.write(struct.pack("<%dI" % self.nch, *self.scales))
+            f.write(self.bufs[i])
+
+    def _write_csv(self, path, i):
+        try:
+            with open(path, "r") as f:
+                pass
+        except OSError:
+            with open(path, "w") as f:
+                f.write("Timestamp,Offset_s," + ",".join(self.names) + "\n")
+        buf = self.bufs[i]
+        nch = self.nch
+        step = self.decimation / self.rate_hz
+        with open(path, "a") as f:
+            for k in range(self.out_samples):
+                values = [str(buf[k * nch + c] / self.scales[c]) for c in range(nch)]
+                f.write("{},{:.1f},{}\n".format(self.stamps[i], k * step, ",".join(values)))
+
+
+def read_blocks(path):
+    """
+    Read raw burst blocks (host side).
+
+    Yields:
+        tuple: (timestamp, rate_hz, rows) where rows is a list of per-sample
+               lists of floats, one value per channel
+    """
+    head_size = struct.calcsize(_BLOCK_FMT)
+    with open(path, "rb") as f:
+        while True:
+            head = f.read(head_size)
+            if len(head) < head_size:
+                return
+            magic, version, stamp, rate_hz, samples, nch = struct.unpack(_BLOCK_FMT, head)
+            if magic != BLOCK_MAGIC or version != BLOCK_VERSION:
+                raise ValueError("corrupt burst block")
+            scales = struct.unpack("<%dI" % nch, f.read(4 * nch))
+            data = array("i")
+            data.frombytes(f.read(4 * samples * nch))
+            rows = [[data[k * nch + c] / scales[c] for c in range(nch)]
+                    for k in range(samples)]
+            yield stamp.decode(), rate_hz, rows
@@ -0,0 +1,82 @@
+"""
+Per-channel calibration applied in the acquisition path (MicroPython and PC).
+
+The table is written on a PC by polysense.analysis.calibration (fitted
+against INMET) and copied to the SD card, one line per channel:
+
+    Temp_MPU6050_C,25.095897,1.0437176,22.693511   (channel, center, c_d ... c_0)
+
+meaning corrected = c_d (x - center)^d + ... + c_0. At load time each
+channel is resolved to its position in the logged row and the center is
+folded into the coefficients of a straight line, so a reading costs one
+multiply-add (Horner's rule, d multiply-adds, for higher degrees). Channels
+without a line, or whose line does not parse (a hand edit, a truncated
+copy), are passed through unchanged.
+
+Usage:
+    from calibration import Calibration
+    cal = Calibration.load("/sd/calibration.csv", ("Temp_MPU6050_C", "Temp_AHT20_C", ...))
+    tempA, tempB, ... = cal.apply((tempA, tempB, ...))   # None stays None
+"""
+
+
+class Calibration:
+    """
+    Corrections of the channels of a row, by position.
+
+    Args:
+        columns: Channel names, in row order
+        table: {channel: (center, c_d, ..., c_0)}
+    """
+
+    def __init__(self, columns, table):
+        self.columns = tuple(columns)
+        self.gain = []
+        self.offset = []
+        self.poly = []
+        for name in self.columns:
+            gain, offset, poly = 1.0, 0.0, None
+            spec = table.get(name)
+            if spec:
+                center, coef = spec[0], spec[1:]
+                if len(coef) == 1:
+                    gain, offset = 0.0, coef[0]
+                elif len(coef) == 2:
+                    gain, offset = coef[0], coef[1] - coef[0] * center
+                else:
+                    poly = (center, coef)
+            self.gain.append(gain)
+            self.offset.append(offset)
+            self.poly.append(poly)
+
+    @classmethod
+    def load(cls, path, columns):
+        table = {}
+        with open(path) as f:
+            for line in f:
+                fields = line.strip().split(",")
+                if len(fields) < 3 or fields[0].startswith("#"):
+                    continue
+                try:
+                    table[fields[0]] = [float(v) for v in fields[1:]]
+                except ValueError:
+                    continue # Malformed line: that channel stays raw
+        return cls(columns, table)
+
+    def apply(self, values):
+        """Corrected copy of a row of readings (None: missing)."""
+        out = list(values)
+        for i in range(len(out)):
+            x = out[i]
+            if x is None:
+                continue
+            poly = self.poly[i]
+            if poly is None:
+                out[i] = x * self.gain[i] + self.offset[i]
+            else:
+                u = x - poly[0]
+                y = 0.0
+                for c in poly[1]:
+                    y = y * u + c
+                out[i] = y
+        return out
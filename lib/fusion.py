@@ -0,0 +1,72 @@
+"""
+Consensus of redundant sensors, one sample at a time (MicroPython and PC).
+
+polysense.analysis.fusion estimates each sensor's bias and noise variance
+from the log and writes them to fusion.json. Consensus keeps one scalar
+Kalman filter per quantity, whose state (the true value) is a random walk:
+
+    predict   P += process_var
+    update    with every reading z_i present, weighted by 1 / var_i:
+              P' = 1 / (1 / P + sum 1 / var_i)
+              x' = P' * (x / P + sum (z_i - bias_i) / var_i)
+
+A row costs a few multiply-adds per sensor and allocates nothing, so it can
+run in the acquisition loop. polysense.analysis.fusion.kalman() is the same
+filter over a whole history.
+
+Usage:
+    from fusion import load
+    fused = load("/sd/fusion.json")                  # {"temperature": Consensus, ...}
+    temp = fused["temperature"].update((tempA, tempB, tempC, tempD, tempE, tempF, tempG))
+"""
+
+import json
+
+
+class Consensus:
+    """
+    Kalman consensus of one quantity.
+
+    Args:
+        channels: Sensor names, in the order readings are given
+        bias: Per sensor, subtracted from its readings
+        var: Per sensor noise variance
+        process_var: Variance of the true value's change per sample
+    """
+
+    def __init__(self, channels, bias, var, process_var):
+        self.channels = list(channels)
+        self.bias = [float(b) for b in bias]
+        self.weight = [1.0 / float(v) for v in var]
+        self.process_var = float(process_var)
+        self.x = None
+        self.p = None
+
+    def update(self, readings):
+        """Fold one sample (None or NaN: missing); the estimate, None until a reading arrives."""
+        info = 0.0
+        total = 0.0
+        for z, b, w in zip(readings, self.bias, self.weight):
+            if z is not None and z == z:
+                info += w
+                total += (z - b) * w
+        if self.x is None:
+            if info:
+                self.p = 1.0 / info
+                self.x = total * self.p
+            return self.x
+        p = self.p + self.process_var
+        if info:
+            self.p = 1.0 / (1.0 / p + info)
+            self.x = self.p * (self.x / p + total)
+        else:
+            self.p = p
+        return self.x
+
+
+def load(path):
+    """{quantity: Consensus} from a fusion.json."""
+    with open(path) as f:
+        spec = json.load(f)
+    return {name: Consensus(g["channels"], g["bias"], g["var"], g["process_var"])
+            for name, g in spec.items()}
@@ -0,0 +1,218 @@
+"""
+Sparse timestamp index for the CSV log, for MicroPython and the PC.
+
+A sidecar file next to the log (datalog_final.csv -> datalog_final.idx)
+records the byte offset of every ``stride``-th data row against its
+timestamp, so a time range is found with a binary search over the entries
+and read with one seek, instead of parsing the log from the start. The
+index is brought up to date incrementally: update() reads only the rows
+appended since the previous call.
+
+File layout (little-endian):
+    0..15        header: magic "PSIX", version (uint16), stride (uint16),
+                 rows indexed (uint32), log bytes indexed (uint32)
+    16 + 8*k     entry k: timestamp (uint32, seconds since 2000-01-01, local
+                 time like the log) and byte offset of its row (uint32)
+
+Entry k is row k*stride (0-based, header excluded) unless that row is torn
+(its timestamp does not parse), in which case the entry is skipped.
+Timestamps are assumed to grow along the log; after an RTC reset a range
+lookup may miss rows.
+
+The same format is written by polysense.io.logindex on a PC. From a PC, or
+over mpremote on the card:
+    python lib/logindex.py datalog_final.csv "2025-09-10 00:00:00" "2025-09-11 00:00:00"
+"""
+
+import struct
+
+MAGIC = b"PSIX"
+VERSION = 1
+HEADER_SIZE = 16
+ENTRY_SIZE = 8
+_HEADER_FMT = "<4sHHII"  # magic, version, stride, rows, covered bytes
+_ENTRY_FMT = "<II"       # seconds since 2000-01-01, row offset
+
+
+def _days(y, m, d):
+    """Days from 2000-01-01 to the given date (proleptic Gregorian)."""
+    if m < 3:
+        y -= 1
+        m += 12
+    return 365 * y + y // 4 - y // 100 + y // 400 + (153 * (m - 3) + 2) // 5 + d - 730426
+
+
+def seconds(stamp):
+    """
+    Seconds since 2000-01-01 of a "YYYY-MM-DD HH:MM:SS" timestamp (the
+    start of a row is fine), or None if it does not parse.
+    """
+    if isinstance(stamp, (bytes, bytearray)):
+        try:
+            stamp = bytes(stamp[:19]).decode()
+        except UnicodeError:
+            return None
+    s = stamp[:19]
+    if len(s) != 19 or s[4] != "-" or s[7] != "-" or s[10] != " " or s[13] != ":" or s[16] != ":":
+        return None
+    try:
+        y, mo, d = int(s[0:4]), int(s[5:7]), int(s[8:10])
+        h, mi, sec = int(s[11:13]), int(s[14:16]), int(s[17:19])
+    except ValueError:
+        return None
+    return ((_days(y, mo, d) * 24 + h) * 60 + mi) * 60 + sec
+
+
+def sidecar(log_path):
+    """Index path of a log: the same name with the extension .idx."""
+    dot = log_path.rfind(".")
+    return (log_path[:dot] if dot > log_path.rfind("/") else log_path) + ".idx"
+
+
+class LogIndex:
+    """
+    Index of one CSV log (created on first use).
+
+    Args:
+        log_path: CSV log with a header line
+        index_path: Sidecar file (default: sidecar(log_path))
+        stride: Rows per entry, used only when creating the index
+    """
+
+    def __init__(self, log_path, index_path=None, stride=120):
+        self.log_path = log_path
+        self.path = index_path or sidecar(log_path)
+        self.f = None
+        try:
+            self.f = open(self.path, "r+b")
+            header = self.f.read(HEADER_SIZE)
+            if len(header) != HEADER_SIZE:
+                raise ValueError  # empty or cut short (power lost in _reset())
+            magic, version, self.stride, self.rows, self.covered = struct.unpack(_HEADER_FMT, header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError
+            self.entries = (self.f.seek(0, 2) - HEADER_SIZE) // ENTRY_SIZE
+        except (OSError, ValueError):
+            self._reset(stride)
+
+    def _reset(self, stride):
+        """Start an empty index."""
+        if self.f:
+            self.f.close()
+        self.stride = stride
+        self.rows = 0
+        self.covered = 0
+        self.entries = 0
+        with open(self.path, "wb") as f:
+            f.write(struct.pack(_HEADER_FMT, MAGIC, VERSION, stride, 0, 0))
+        self.f = open(self.path, "r+b")
+
+    def _write_header(self):
+        self.f.seek(0)
+        self.f.write(struct.pack(_HEADER_FMT, MAGIC, VERSION, self.stride, self.rows, self.covered))
+
+    def entry(self, k):
+        """(seconds, offset) of entry ``k``."""
+        self.f.seek(HEADER_SIZE + k * ENTRY_SIZE)
+        return struct.unpack(_ENTRY_FMT, self.f.read(ENTRY_SIZE))
+
+    def _consistent(self, log, size):
+        """The log still holds what was indexed (it was appended to, not replaced)."""
+        if size < self.covered:
+            return False
+        if not self.entries:
+            return True
+        t, offset = self.entry(self.entries - 1)
+        log.seek(offset)
+        return seconds(log.read(19)) == t
+
+    def update(self):
+        """
+        Index the complete rows appended to the log since the last update.
+
+        Returns:
+            int: Rows read
+        """
+        with open(self.log_path, "rb") as log:
+            size = log.seek(0, 2)
+            if self.covered and not self._consistent(log, size):
+                self._reset(self.stride)
+            if not self.covered:
+                log.seek(0)
+                self.covered = len(log.readline())
+            log.seek(self.covered)
+            pos = self.covered
+            rows = self.rows
+            new = []
+            while True:
+                line = log.readline()
+                if not line or line[-1:] != b"\n":
+                    break  # a row still being written is indexed next time
+                if rows % self.stride == 0:
+                    t = seconds(line)
+                    if t is not None:
+                        new.append(struct.pack(_ENTRY_FMT, t, pos))
+                rows += 1
+                pos += len(line)
+        if new:
+            self.f.seek(HEADER_SIZE + self.entries * ENTRY_SIZE)
+            self.f.write(b"".join(new))
+            self.entries += len(new)
+        read = rows - self.rows
+        if read:
+            self.rows = rows
+            self.covered = pos
+            self._write_header()
+            self.f.flush()
+        return read
+
+    def find(self, t):
+        """Offset to start reading at for rows stamped ``t`` (seconds) or later."""
+        lo, hi = 0, self.entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.entry(mid)[0] <= t:
+                lo = mid + 1
+            else:
+                hi = mid
+        # the last entry at or before t; rows before it are all older
+        if lo:
+            return self.entry(lo - 1)[1]
+        with open(self.log_path, "rb") as log:
+            return len(log.readline())  # first data row
+
+    def rows_between(self, start, end):
+        """
+        Yield the rows (str, newline included) stamped in [start, end).
+
+        ``start`` and ``end`` are "YYYY-MM-DD HH:MM:SS" strings or seconds.
+        """
+        t0 = start if isinstance(start, int) else seconds(start)
+        t1 = end if isinstance(end, int) else seconds(end)
+        with open(self.log_path, "rb") as log:
+            log.seek(self.find(t0))
+            while True:
+                line = log.readline()
+                if not line or line[-1:] != b"\n":
+                    return
+                t = seconds(line)
+                if t is None or t < t0:
+                    continue
+                if t >= t1:
+                    return
+                yield line.decode()
+
+    def close(self):
+        self.f.close()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 4:
+        index = LogIndex(sys.argv[1])
+        index.update()
+        with open(sys.argv[1]) as f:
+            sys.stdout.write(f.readline())
+        for row in index.rows_between(sys.argv[2], sys.argv[3]):
+            sys.stdout.write(row)
+        index.close()
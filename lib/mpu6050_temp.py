@@ -9,29 +9,41 @@ class MPU6050:
     Biblioteca simples para ler a temperatura do MPU6050 em MicroPython.
     """
 
-    def __init__(self, i2c, addr=MPU6050_ADDR, temp_offset=0.0):
+    def __init__(self, i2c, addr=MPU6050_ADDR, temp_offset=0.0, defer_init=False):
         """
         Inicializa a classe.
         :param i2c: Objeto I2C já configurado.
         :param addr: Endereço I2C (0x68 ou 0x69).
         :param temp_offset: Offset de calibração (em °C).
+        :param defer_init: Se True, não inicializa agora; o chamador deve
+                           consumir init_steps() (ex.: bringup.run).
         """
         self.i2c = i2c
         self.addr = addr
         self.temp_offset = temp_offset
         self.is_ready = False
-        self._initialize_sensor()
+        if not defer_init:
+            self._initialize_sensor()
 
     def _initialize_sensor(self):
         """Inicializa e verifica a conexão com o sensor."""
+        for wait_ms in self.init_steps():
+            time.sleep_ms(wait_ms)
+
+    def init_steps(self):
+        """
+        Gerador com a sequência de inicialização.
+        Cada valor produzido é a espera (em ms) antes do próximo passo,
+        permitindo sobrepor as esperas de vários sensores no boot.
+        """
         try:
             # Reset
             self.i2c.writeto_mem(self.addr, 0x6B, b'\x80')
-            time.sleep(0.2)
+            yield 200
 
             # Wake-up (sair do sleep mode)
             self.i2c.writeto_mem(self.addr, 0x6B, b'\x00')
-            time.sleep(0.2)
+            yield 200
 
             # Testa o WHO_AM_I
             who_am_i = self.i2c.readfrom_mem(self.addr, 0x75, 1)[0]
@@ -0,0 +1,219 @@
+"""
+Preallocated, crash-safe ring log for MicroPython.
+
+The log file is allocated once at full size and then only ever overwritten
+in place with fixed-size records, so the FAT chain and the file size never
+change while logging: an append is one seek plus one in-place write.
+
+Records are not synced one by one: f_sync (flush()) rewrites the file's
+directory entry every time, which would make the root directory the most
+written block of the card. The file system writes a data sector back when
+the next record moves on to another sector, so without a sync a brown-out
+loses at most the records of the sector being filled (SECTOR // record
+size, 4 by default), and the directory entry is rewritten once every
+``sync_every`` records (bench_sdwrite: 0.008 root-directory and 0.25 data
+block writes per row at the defaults, against 1.00 and 1.00 when syncing
+every record).
+
+File layout:
+    sector 0     superblock: magic, version, record size, record count,
+                 CSV header text
+    512 + k*R    record slot k (R = record size)
+
+Record layout (R bytes):
+    0..3         sequence number, uint32 little-endian (0 = never written)
+    4            payload length
+    5..R-2       payload (one CSV row), zero padded
+    R-1          CRC-8 (Dallas/Maxim) over bytes 0..R-2
+
+Sequence numbers start at 1 and grow by one per record; record ``seq`` lives
+in slot ``(seq - 1) % count``. On boot the write head is found by a binary
+search over the slots, reading O(log count) records instead of scanning.
+
+The module is plain Python, so the same code exports a card image on a PC:
+    python lib/ringlog.py /media/sd/datalog.ring > datalog.csv
+"""
+
+import struct
+
+MAGIC = b"PSRL"
+VERSION = 1
+SUPERBLOCK_SIZE = 512
+SYNC_EVERY = 120  # records between f_sync calls (an hour at 30 s)
+_SUPERBLOCK_FMT = "<4sHHI"  # magic, version, record size, record count
+_HEADER_OFFSET = 16
+
+# Same nibble tables as OneWire.crc8 (Dallas/Maxim polynomial x^8+x^5+x^4+1)
+_CRCTAB1 = (b"\x00\x5E\xBC\xE2\x61\x3F\xDD\x83"
+            b"\xC2\x9C\x7E\x20\xA3\xFD\x1F\x41")
+_CRCTAB2 = (b"\x00\x9D\x23\xBE\x46\xDB\x65\xF8"
+            b"\x8C\x11\xAF\x32\xCA\x57\xE9\x74")
+
+
+def crc8(data, length=None):
+    """Table-driven CRC-8 over the first ``length`` bytes of ``data``."""
+    crc = 0
+    tab1 = _CRCTAB1
+    tab2 = _CRCTAB2
+    for i in range(len(data) if length is None else length):
+        crc ^= data[i]
+        crc = tab1[crc & 0x0f] ^ tab2[(crc >> 4) & 0x0f]
+    return crc
+
+
+class RingLog:
+    """
+    Fixed-size record ring stored in a preallocated file.
+
+    Args:
+        path: Log file path (e.g. '/sd/datalog.ring')
+        records: Number of record slots, used only when creating the file
+        header: CSV header stored in the superblock, used only when creating
+        record_size: Bytes per record, used only when creating
+        sync_every: Records between directory-entry syncs (1: every record)
+    """
+
+    def __init__(self, path, records=131072, header="", record_size=128, sync_every=SYNC_EVERY):
+        self.path = path
+        self.sync_every = sync_every
+        self.unsynced = 0
+        try:
+            self.f = open(path, "r+b")
+        except OSError:
+            self._create(path, records, header, record_size)
+            self.f = open(path, "r+b")
+        self._read_superblock()
+        self.buf = bytearray(self.record_size)
+        self.mv = memoryview(self.buf)
+        self.seq, self.slot = self._recover()
+
+    # --- file creation ---
+    def _create(self, path, records, header, record_size):
+        """Allocate the whole file once, zero filled (all slots empty)."""
+        header = header.encode() if isinstance(header, str) else header
+        if len(header) > SUPERBLOCK_SIZE - _HEADER_OFFSET:
+            raise ValueError("header too long")
+        sb = bytearray(SUPERBLOCK_SIZE)
+        struct.pack_into(_SUPERBLOCK_FMT, sb, 0, MAGIC, VERSION, record_size, records)
+        sb[_HEADER_OFFSET:_HEADER_OFFSET + len(header)] = header
+        chunk = bytearray(4096)
+        remaining = records * record_size
+        with open(path, "wb") as f:
+            f.write(sb)
+            while remaining > 0:
+                n = min(remaining, len(chunk))
+                f.write(chunk if n == len(chunk) else chunk[:n])
+                remaining -= n
+
+    def _read_superblock(self):
+        self.f.seek(0)
+        sb = self.f.read(SUPERBLOCK_SIZE)
+        magic, version, record_size, records = struct.unpack_from(_SUPERBLOCK_FMT, sb, 0)
+        if magic != MAGIC or version != VERSION:
+            raise OSError("not a ring log: " + self.path)
+        self.record_size = record_size
+        self.records = records
+        self.header = bytes(sb[_HEADER_OFFSET:]).rstrip(b"\x00").decode()
+
+    # --- record access ---
+    def _read_slot(self, slot):
+        """Return the sequence number stored in ``slot``, or 0 if empty/corrupt."""
+        self.f.seek(SUPERBLOCK_SIZE + slot * self.record_size)
+        if self.f.readinto(self.buf) != self.record_size:
+            return 0
+        if crc8(self.buf, self.record_size - 1) != self.buf[-1]:
+            return 0
+        return struct.unpack_from("<I", self.buf, 0)[0]
+
+    def _recover(self):
+        """
+        Locate the write head with a binary search.
+
+        Slots 0..h hold ``s0, s0+1, ..., s0+h`` (the newest pass) and every
+        later slot is empty, torn or one pass older, so ``seq(i) == s0 + i``
+        is true up to the head and false after it.
+
+        Returns:
+            tuple: (next sequence number, next slot)
+        """
+        s0 = self._read_slot(0)
+        if s0 == 0:
+            # Either a fresh log or a write to slot 0 was torn after a wrap;
+            # in the latter case the last slot holds the newest record.
+            last = self._read_slot(self.records - 1)
+            return last + 1, 0
+        lo, hi = 0, self.records - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._read_slot(mid) == s0 + mid:
+                lo = mid
+            else:
+                hi = mid - 1
+        return s0 + lo + 1, (lo + 1) % self.records
+
+    def append(self, line):
+        """Write one CSV row into the next slot (synced every ``sync_every`` rows)."""
+        data = line.encode() if isinstance(line, str) else line
+        size = self.record_size
+        n = len(data)
+        if n > size - 6:
+            raise ValueError("record too long")
+        buf = self.buf
+        struct.pack_into("<IB", buf, 0, self.seq, n)
+        buf[5:5 + n] = data
+        for i in range(5 + n, size):
+            buf[i] = 0
+        buf[size - 1] = crc8(buf, size - 1)
+
+        self.f.seek(SUPERBLOCK_SIZE + self.slot * size)
+        self.f.write(buf)
+        self.seq += 1
+        self.slot = (self.slot + 1) % self.records
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """Write back the sector being filled and the directory entry."""
+        self.f.flush()
+        self.unsynced = 0
+
+    def oldest(self):
+        """Sequence number of the oldest record still held by the ring."""
+        return max(1, self.seq - self.records)
+
+    def read(self, seq):
+        """Return the row stored as ``seq``, or None if overwritten, unwritten or corrupt."""
+        if seq < self.oldest() or seq >= self.seq:
+            return None
+        if self._read_slot((seq - 1) % self.records) != seq:
+            return None
+        return bytes(self.mv[5:5 + self.buf[4]]).decode()
+
+    def rows(self):
+        """Yield the stored rows, oldest first, skipping empty or corrupt slots."""
+        for seq in range(self.oldest(), self.seq):
+            row = self.read(seq)
+            if row is not None:
+                yield row
+
+    def close(self):
+        self.f.close()
+        self.unsynced = 0
+
+
+def export_csv(path, out):
+    """Write the header and every valid row of a ring log to ``out``."""
+    log = RingLog(path)
+    try:
+        out.write(log.header)
+        for row in log.rows():
+            out.write(row)
+    finally:
+        log.close()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 2:
+        export_csv(sys.argv[1], sys.stdout)
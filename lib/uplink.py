@@ -0,0 +1,398 @@
+"""
+Batched store-and-forward uplink for Pico W builds.
+
+The SD card stays the primary store; this module forwards its backlog to a
+collector on the local network. Every burst:
+
+    1. switches the WLAN radio on and joins the network
+    2. opens one connection (HTTP/1.1 keep-alive or MQTT) to the collector
+    3. sends the rows after the persisted offset in batches of up to
+       ``batch_bytes`` (many rows per message, zlib-compressed)
+    4. advances and persists the offset after each acknowledged batch only
+    5. closes the connection and switches the radio off again
+
+Delivery is at-least-once: a batch that was received but whose ack was lost
+is sent again, tagged with the same offset, so the collector can drop it.
+
+Sources:
+    CsvSource   datalog_final.csv; the offset is a byte position
+    RingSource  a ringlog.RingLog; the offset is the next sequence number
+
+Transports:
+    HttpTransport  POST <path>, headers X-Station and X-Offset; any 2xx is an ack
+    MqttTransport  QoS 1 PUBLISH to <topic>/<station>/<encoding>/<offset>;
+                   the PUBACK is the ack
+
+The module also runs under CPython (sockets and zlib), so it can be tested
+on Linux against mosquitto or polysense/sim/collector.py with the fake
+``network`` module in polysense/sim/stubs (see polysense/sim/run_uplink.py).
+"""
+
+import os
+import socket
+import struct
+import time
+
+
+def compress(data):
+    """
+    zlib-compress ``data``.
+
+    Returns:
+        tuple: (payload, encoding); encoding is "deflate" or "identity" when
+               the firmware was built without compression support
+    """
+    try:
+        import deflate
+    except ImportError:
+        deflate = None
+    if deflate:
+        import io
+        buf = io.BytesIO()
+        try:
+            with deflate.DeflateIO(buf, deflate.ZLIB) as d:
+                d.write(data)
+        except Exception:
+            return data, "identity"
+        return buf.getvalue(), "deflate"
+    try:
+        import zlib
+        return zlib.compress(data), "deflate"
+    except (ImportError, AttributeError):
+        return data, "identity"
+
+
+# --- log sources ---
+
+class CsvSource:
+    """
+    Rows of the CSV log, addressed by byte offset.
+
+    Args:
+        path: CSV file with a header line
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def start(self):
+        """Offset of the first data row (just after the header)."""
+        try:
+            with open(self.path, "rb") as f:
+                return len(f.readline())
+        except OSError:
+            return 0
+
+    def read(self, offset, max_bytes):
+        """
+        Read whole rows starting at ``offset``.
+
+        Returns:
+            tuple: (data, next_offset); data is empty when there is no
+                   complete row to send yet
+        """
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read(max_bytes)
+        except OSError:
+            return b"", offset
+        end = data.rfind(b"\n") + 1
+        return data[:end], offset + end
+
+
+class RingSource:
+    """
+    Rows of a ring log, addressed by sequence number.
+
+    Rows overwritten before they could be sent are skipped.
+
+    Args:
+        ring: Open ringlog.RingLog
+    """
+
+    def __init__(self, ring):
+        self.ring = ring
+
+    def start(self):
+        return self.ring.oldest()
+
+    def read(self, offset, max_bytes):
+        ring = self.ring
+        seq = max(offset, ring.oldest())
+        rows = []
+        size = 0
+        while seq < ring.seq:
+            row = ring.read(seq)
+            if row is not None:
+                if rows and size + len(row) > max_bytes:
+                    break
+                rows.append(row)
+                size += len(row)
+            seq += 1
+        return "".join(rows).encode(), seq
+
+
+# --- transports ---
+
+class HttpTransport:
+    """
+    HTTP/1.1 POST over one keep-alive connection.
+
+    Args:
+        host, port: Collector address
+        path: Request path
+    """
+
+    def __init__(self, host, port=8080, path="/ingest"):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.sock = None
+        self.stream = None
+
+    def connect(self):
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        self.sock = socket.socket()
+        self.sock.settimeout(10)
+        self.sock.connect(addr)
+        # CPython sockets need a file wrapper for readline(); MicroPython's
+        # makefile() returns the socket itself
+        self.stream = self.sock.makefile("rwb")
+
+    def send(self, payload, encoding, offset, station):
+        if self.sock is None:
+            self.connect()
+        head = ("POST {} HTTP/1.1\r\nHost: {}\r\nContent-Type: text/csv\r\n"
+                "Content-Encoding: {}\r\nContent-Length: {}\r\n"
+                "X-Station: {}\r\nX-Offset: {}\r\n\r\n").format(
+            self.path, self.host, encoding, len(payload), station, offset)
+        stream = self.stream
+        stream.write(head.encode())
+        stream.write(payload)
+        if hasattr(stream, "flush"):
+            stream.flush()
+
+        status = stream.readline().split()
+        if len(status) < 2:
+            raise OSError(104)  # ECONNRESET: peer closed the connection
+        length = 0
+        keep_alive = True
+        while True:
+            line = stream.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                keep_alive = False
+        if length:
+            stream.read(length)
+        if not keep_alive:
+            self.close()
+        return 200 <= int(status[1]) < 300
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                if self.stream is not self.sock:
+                    self.stream.close()
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.stream = None
+
+
+class MqttTransport:
+    """
+    Minimal MQTT 3.1.1 client: QoS 1 publish over one connection.
+
+    Args:
+        host, port: Broker address
+        topic: Base topic
+        client_id: MQTT client identifier
+        user, password: Optional broker credentials
+    """
+
+    def __init__(self, host, port=1883, topic="polysense", client_id="polysense",
+                 user=None, password=None):
+        self.host = host
+        self.port = port
+        self.topic = topic
+        self.client_id = client_id
+        self.user = user
+        self.password = password
+        self.sock = None
+        self.pid = 0
+
+    @staticmethod
+    def _str(s):
+        s = s.encode()
+        return struct.pack("!H", len(s)) + s
+
+    def _packet(self, kind, body):
+        n = len(body)
+        head = bytearray((kind,))
+        while True:
+            b = n & 0x7F
+            n >>= 7
+            head.append(b | 0x80 if n else b)
+            if not n:
+                break
+        self.sock.write(bytes(head))
+        self.sock.write(body)
+        if hasattr(self.sock, "flush"):
+            self.sock.flush()
+
+    def _recv(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self.sock.read(n - len(data))
+            if not chunk:
+                raise OSError(104)
+            data += chunk
+        return data
+
+    def connect(self):
+        addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        sock = socket.socket()
+        sock.settimeout(10)
+        sock.connect(addr)
+        self._raw = sock
+        self.sock = sock.makefile("rwb")
+        flags = 0x02  # clean session
+        payload = self._str(self.client_id)
+        if self.user is not None:
+            flags |= 0x80
+            payload += self._str(self.user)
+            if self.password is not None:
+                flags |= 0x40
+                payload += self._str(self.password)
+        body = self._str("MQTT") + struct.pack("!BBH", 4, flags, 60) + payload
+        self._packet(0x10, body)
+        resp = self._recv(4)
+        if resp[0] != 0x20 or resp[3] != 0:
+            self.close()
+            raise OSError(111)  # ECONNREFUSED
+
+    def send(self, payload, encoding, offset, station):
+        if self.sock is None:
+            self.connect()
+        self.pid = self.pid % 0xFFFF + 1
+        topic = "{}/{}/{}/{}".format(self.topic, station, encoding, offset)
+        self._packet(0x32, self._str(topic) + struct.pack("!H", self.pid) + payload)
+        while True:
+            resp = self._recv(2)
+            body = self._recv(resp[1])
+            if resp[0] == 0x40:
+                return struct.unpack("!H", body)[0] == self.pid
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self._packet(0xE0, b"")
+                if self.sock is not self._raw:
+                    self.sock.close()
+                self._raw.close()
+            except OSError:
+                pass
+        self.sock = None
+
+
+# --- uplink ---
+
+class Uplink:
+    """
+    Forward the log backlog in bursts.
+
+    Args:
+        source: CsvSource or RingSource
+        transport: HttpTransport or MqttTransport
+        state_path: File holding the last acknowledged offset
+        ssid, password: WLAN credentials; None leaves the radio alone
+        station: Station name sent with every batch
+        batch_bytes: Maximum uncompressed batch size
+    """
+
+    def __init__(self, source, transport, state_path, ssid=None, password=None,
+                 station="polysense", batch_bytes=16384):
+        self.source = source
+        self.transport = transport
+        self.state_path = state_path
+        self.ssid = ssid
+        self.password = password
+        self.station = station
+        self.batch_bytes = batch_bytes
+        self.offset = self._load_offset()
+        self.sent_rows = 0
+        self.sent_bytes = 0
+        self.wire_bytes = 0
+
+    def _load_offset(self):
+        try:
+            with open(self.state_path) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return self.source.start()
+
+    def _save_offset(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(self.offset))
+        # rename() replaces the old file in one directory update
+        os.rename(tmp, self.state_path)
+
+    def _radio(self, on, timeout_s=15):
+        if self.ssid is None:
+            return True
+        import network
+        wlan = network.WLAN(network.STA_IF)
+        if not on:
+            wlan.disconnect()
+            wlan.active(False)
+            return True
+        wlan.active(True)
+        if not wlan.isconnected():
+            wlan.connect(self.ssid, self.password)
+            t0 = time.time()
+            while not wlan.isconnected():
+                if time.time() - t0 > timeout_s:
+                    return False
+                time.sleep(0.2)
+        return True
+
+    def run(self, max_batches=50):
+        """
+        Run one burst.
+
+        Returns:
+            int: Batches acknowledged; stops early when the backlog is empty
+                 or on any network error (the offset is left where the last
+                 ack put it)
+        """
+        sent = 0
+        try:
+            if not self._radio(True):
+                return 0
+            while sent < max_batches:
+                data, next_offset = self.source.read(self.offset, self.batch_bytes)
+                if not data:
+                    break
+                payload, encoding = compress(data)
+                if not self.transport.send(payload, encoding, self.offset, self.station):
+                    break
+                self.offset = next_offset
+                self._save_offset()
+                sent += 1
+                self.sent_rows += data.count(b"\n")
+                self.sent_bytes += len(data)
+                self.wire_bytes += len(payload)
+        except OSError:
+            pass
+        finally:
+            self.transport.close()
+            self._radio(False)
+        return sent
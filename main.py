@@ -1,22 +1,69 @@
 # === IMPORTS ===
+import time
+# ticks_ms() starts counting at reset, so this is the reset-to-main.py latency
+boot_start_ms = time.ticks_ms()
+
 import os
 import machine
 from machine import Pin, I2C, ADC, SPI, RTC
-import time
 
-# Sensor and Device Libraries
+# Core libraries; sensor drivers are imported on demand further below so that
+# sensors disabled in SENSORS_ENABLED cost neither import time nor RAM.
+# Ship lib/ precompiled (tools/build_mpy.py) or frozen (manifest.py) to skip
+# on-device compilation entirely.
 from ssd1306 import SSD1306
-from mpu6050_temp import MPU6050
-from AHT20 import AHT20
-from bmp280 import BMP280
-from bmp180 import BMP180
-import onewire
-import ds18x20
-from ntc import NTC
-from dht11 import DHT11
 from sdcard import SDCard
+import bringup
 
 # === HARDWARE CONFIGURATION AND GENERAL SETTINGS ===
+SENSORS_ENABLED = {
+    "mpu6050": True,
+    "aht20": True,
+    "bmp280": True,
+    "bmp180": True,
+    "ds18b20": True,
+    "ntc": True,
+    "dht11": True,
+}
+boot_log_path = '/sd/boot_log.csv'
+# "csv": append rows to datalog_final.csv (default)
+# "ring": fixed-size records in a preallocated file (lib/ringlog.py); the FAT
+#         is never touched and the directory entry is synced hourly, so a
+#         brown-out loses at most the rows of the sector being filled (4).
+#         Export on a PC with: python lib/ringlog.py datalog.ring > datalog.csv
+LOG_MODE = "csv"
+RING_RECORDS = 131072  # ~45 days at 30 s; preallocated (16 MiB) on first boot
+# Sparse timestamp index of datalog_final.csv (lib/logindex.py, csv mode): one
+# entry every LOG_INDEX_STRIDE rows in datalog_final.idx, so a time range is
+# read with one seek, here or on a PC (polysense.io.logindex). 0 disables it.
+# The first update indexes the whole existing log; for a large log, build the
+# index on a PC first (python lib/logindex.py datalog_final.csv FROM TO).
+LOG_INDEX_STRIDE = 120
+# Burst capture of the fast channels (NTC, MPU6050, BMP280 pressure) between
+# the 30-second rows, CIC-decimated on the device (lib/burst.py)
+BURST_ENABLED = False
+BURST_RATE_HZ = 10
+BURST_DECIMATION = 10       # decimated stream at BURST_RATE_HZ / BURST_DECIMATION
+BURST_OUTPUT = "decimated"  # "decimated" -> burst_decimated.csv, "raw" -> burst_raw.bin
+burst_file_path = '/sd/burst_decimated.csv' if BURST_OUTPUT == "decimated" else '/sd/burst_raw.bin'
+# Store-and-forward uplink for Pico W builds (lib/uplink.py): every
+# UPLINK_INTERVAL_S the rows logged since the last acknowledged batch are sent
+# to a local collector in compressed batches; the radio is off in between.
+UPLINK_ENABLED = False
+UPLINK_TRANSPORT = "http"   # "http" (POST /ingest) or "mqtt" (QoS 1 publish)
+UPLINK_HOST = "192.168.0.10"
+UPLINK_PORT = 8080          # 1883 for MQTT
+UPLINK_SSID = None          # None: the radio is left alone (already connected, or wired)
+UPLINK_PASSWORD = None
+UPLINK_INTERVAL_S = 3600
+uplink_state_path = '/sd/uplink_offset.txt'
+# Per-sensor corrections fitted against INMET on a PC (polysense.analysis.calibration)
+# and copied to the card; loaded once at boot, applied to every row before it
+# is logged. Without the file (or with an unreadable one) the raw readings are
+# logged; malformed lines are skipped.
+CALIBRATION_ENABLED = True
+calibration_path = '/sd/calibration.csv'
+
 led = Pin("LED", Pin.OUT)
 eject_button = Pin(3, Pin.IN, Pin.PULL_DOWN)
 display_button = Pin(22, Pin.IN, Pin.PULL_DOWN)  # Display control button for power management
@@ -28,37 +75,56 @@ SCL0_PIN = 17
 i2c0 = I2C(0, sda=Pin(SDA0_PIN), scl=Pin(SCL0_PIN), freq=100000)
 spi = SPI(1, baudrate=1000000, sck=Pin(10), mosi=Pin(11), miso=Pin(12))
 cs = Pin(13, Pin.OUT)
-ds_pin = Pin(2, Pin.IN)
-ds = ds18x20.DS18X20(onewire.OneWire(ds_pin))
-ntc_sensor = NTC(28)
-try:
-    dht_sensor = DHT11(Pin(9))
-except Exception as e:
-    dht_sensor = None
+
+mpu_sensor = None
+aht_sensor = None
+bmp280_sensor = None
+bmp180_sensor = None
+ds = None
+roms = []
+ntc_sensor = None
+dht_sensor = None
 
 # === SYSTEM AND DEVICE INITIALIZATION ===
 
 # --- SD Card Mounting and Log File Creation ---
-try:
+log_file_path = '/sd/datalog_final.csv'
+ring_file_path = '/sd/datalog.ring'
+ring_log = None
+log_index = None
+csv_header = (
+    "Timestamp,Temp_MPU6050_C,Temp_AHT20_C,Umid_AHT20_pct,"
+    "Temp_BMP280_C,Press_BMP280_hPa,Temp_BMP180_C,Press_BMP180_hPa,"
+    "Temp_DS18B20_C,Temp_NTC_C,Temp_DHT11_C,Umid_DHT11_pct\n"
+)
+
+def mount_sd():
+    """Mount the SD card and create the log file with its header if needed."""
+    global ring_log, log_index
     sd = SDCard(spi, cs)
     os.mount(sd, '/sd')
-    log_file_path = '/sd/datalog_final.csv'
-    csv_header = (
-        "Timestamp,Temp_MPU6050_C,Temp_AHT20_C,Umid_AHT20_pct,"
-        "Temp_BMP280_C,Press_BMP280_hPa,Temp_BMP180_C,Press_BMP180_hPa,"
-        "Temp_DS18B20_C,Temp_NTC_C,Temp_DHT11_C,Umid_DHT11_pct\n"
-    )
+    if LOG_MODE == "ring":
+        from ringlog import RingLog
+        ring_log = RingLog(ring_file_path, records=RING_RECORDS, header=csv_header)
+        return
     try:
         with open(log_file_path, 'r') as f:
             pass # File exists, proceed with append mode
     except OSError:
         with open(log_file_path, 'w') as f:
             f.write(csv_header) # File does not exist, create with CSV header
-except Exception as e:
-    # Critical failure during SD initialization - rapid LED blink indicates error state
-    while True:
-        led.toggle()
-        time.sleep_ms(100)
+    if LOG_INDEX_STRIDE:
+        try:
+            from logindex import LogIndex
+            log_index = LogIndex(log_file_path, stride=LOG_INDEX_STRIDE)
+        except Exception as e:
+            log_index = None
+            print(f"Boot: log index not available ({e}), logging without it")
+
+def scan_onewire():
+    """Run the DS18B20 ROM search (bit-banged, so it fills sensor wait time)."""
+    global roms
+    roms = ds.scan()
 
 # --- Real-Time Clock (RTC) Initialization ---
 rtc = RTC()
@@ -67,12 +133,90 @@ rtc = RTC()
 # rtc.datetime((2025, 8, 25, 0, 22, 12, 0, 0)) # Format: (year, month, day, weekday(0=Mon), hour, minute, second, microsecond)
 
 # --- I2C Sensors, OLED Display, and OneWire Bus Initialization ---
-mpu_sensor = MPU6050(i2c1)
-aht_sensor = AHT20(i2c1)
-bmp280_sensor = BMP280(i2c1)
-bmp180_sensor = BMP180(i2c0)
+# Drivers with long settle times are created with defer_init=True and brought
+# up together by bringup.run(), which overlaps their waits and runs the SD
+# mount and OneWire scan in the gaps.
+init_steps = []
+idle_jobs = [mount_sd]
+if SENSORS_ENABLED["mpu6050"]:
+    from mpu6050_temp import MPU6050
+    mpu_sensor = MPU6050(i2c1, defer_init=True)
+    init_steps.append(mpu_sensor.init_steps())
+if SENSORS_ENABLED["aht20"]:
+    from AHT20 import AHT20
+    aht_sensor = AHT20(i2c1, defer_init=True)
+    init_steps.append(aht_sensor.init_steps())
+if SENSORS_ENABLED["bmp280"]:
+    from bmp280 import BMP280
+    bmp280_sensor = BMP280(i2c1)
+if SENSORS_ENABLED["bmp180"]:
+    from bmp180 import BMP180
+    bmp180_sensor = BMP180(i2c0)
+if SENSORS_ENABLED["ds18b20"]:
+    import onewire
+    import ds18x20
+    ds = ds18x20.DS18X20(onewire.OneWire(Pin(2, Pin.IN)))
+    idle_jobs.append(scan_onewire)
+if SENSORS_ENABLED["ntc"]:
+    from ntc import NTC
+    ntc_sensor = NTC(28)
+if SENSORS_ENABLED["dht11"]:
+    from dht import DHT11
+    try:
+        dht_sensor = DHT11(Pin(9))
+    except Exception as e:
+        dht_sensor = None
 oled = SSD1306(128, 64, i2c0)
-roms = ds.scan()
+
+try:
+    bringup_ms = bringup.run(init_steps, idle_jobs)
+except Exception as e:
+    # Critical failure during SD initialization - rapid LED blink indicates error state
+    while True:
+        led.toggle()
+        time.sleep_ms(100)
+print(f"Boot: sensors and SD ready in {bringup_ms} ms")
+
+# --- Calibration Table (optional) ---
+calibration = None
+if CALIBRATION_ENABLED:
+    try:
+        from calibration import Calibration
+        calibration = Calibration.load(calibration_path, csv_header.strip().split(",")[1:])
+        print(f"Boot: calibration loaded from {calibration_path}")
+    except OSError:
+        pass # No table on the card: log raw readings
+    except Exception as e:
+        print(f"Boot: calibration not loaded ({e}), logging raw readings")
+
+# --- Burst Capture (optional) ---
+burst = None
+if BURST_ENABLED:
+    from burst import BurstSampler
+    burst_channels = []
+    if ntc_sensor:
+        burst_channels.append(("Temp_NTC_C", ntc_sensor.get_temperature, 100))
+    if mpu_sensor:
+        burst_channels.append(("Temp_MPU6050_C", mpu_sensor.get_temperature, 100))
+    if bmp280_sensor:
+        burst_channels.append(("Press_BMP280_hPa", lambda: bmp280_sensor.get_latest()[1], 1000))
+    if burst_channels:
+        burst = BurstSampler(burst_channels, rate_hz=BURST_RATE_HZ, block_s=30,
+                             decimation=BURST_DECIMATION, output=BURST_OUTPUT)
+        burst.start()
+
+# --- Uplink (optional, Pico W) ---
+uplink = None
+if UPLINK_ENABLED:
+    import uplink as uplink_mod
+    if UPLINK_TRANSPORT == "mqtt":
+        transport = uplink_mod.MqttTransport(UPLINK_HOST, UPLINK_PORT)
+    else:
+        transport = uplink_mod.HttpTransport(UPLINK_HOST, UPLINK_PORT)
+    source = uplink_mod.RingSource(ring_log) if ring_log else uplink_mod.CsvSource(log_file_path)
+    uplink = uplink_mod.Uplink(source, transport, uplink_state_path,
+                               ssid=UPLINK_SSID, password=UPLINK_PASSWORD)
+last_uplink_ms = time.ticks_ms()
 
 # Status display state variables
 screen = 0
@@ -102,18 +246,28 @@ while True:
 
     try:
         # 1. SENSOR DATA ACQUISITION
-        tempA = mpu_sensor.get_temperature()
-        tempB, umidA = aht_sensor.get_data()
-        tempC, pressA = bmp280_sensor.get_data()
-        tempD, pressB = bmp180_sensor.get_data()
+        tempA = mpu_sensor.get_temperature() if mpu_sensor else None
+        tempB, umidA = aht_sensor.get_data() if aht_sensor else (None, None)
+        tempC, pressA = bmp280_sensor.get_data() if bmp280_sensor else (None, None)
+        tempD, pressB = bmp180_sensor.get_data() if bmp180_sensor else (None, None)
         tempE = None
         if roms:
+            if burst:
+                burst.pause() # OneWire bit timing must not be interrupted
             ds.convert_temp()
+            if burst:
+                burst.resume() # Sample on during the conversion wait
             time.sleep_ms(750)
+            if burst:
+                burst.pause()
             tempE = ds.read_temp(roms[0])
-        tempF = ntc_sensor.get_temperature()
+            if burst:
+                burst.resume()
+        tempF = ntc_sensor.get_temperature() if ntc_sensor else None
         tempG, umidB = None, None
         if dht_sensor:
+            if burst:
+                burst.pause() # DHT pulse timing must not be interrupted
             for attempt in range(3):
                 try:
                     if dht_sensor.measure():
@@ -122,6 +276,13 @@ while True:
                         break
                 except Exception:
                     time.sleep_ms(100)
+            if burst:
+                burst.resume()
+
+        if calibration:
+            (tempA, tempB, umidA, tempC, pressA, tempD, pressB,
+             tempE, tempF, tempG, umidB) = calibration.apply(
+                (tempA, tempB, umidA, tempC, pressA, tempD, pressB, tempE, tempF, tempG, umidB))
 
         # 2. RTC TIMESTAMP RETRIEVAL
         current_time = rtc.datetime()
@@ -148,8 +309,11 @@ while True:
         data_row_string = ",".join(row_values) + "\n"
 
         try:
-            with open(log_file_path, 'a') as f:
-                f.write(data_row_string)
+            if ring_log:
+                ring_log.append(data_row_string)
+            else:
+                with open(log_file_path, 'a') as f:
+                    f.write(data_row_string)
             
             led.on()
             time.sleep_ms(50)
@@ -157,10 +321,46 @@ while True:
             
             log_status = "Gravando OK"
             record_count += 1
-            
+
+            if log_index and record_count % LOG_INDEX_STRIDE == 0:
+                try:
+                    log_index.update()
+                except Exception as e:
+                    pass # The index is rebuilt from the log on the next update
+
+            if record_count == 1:
+                # Reset-to-first-record latency, the figure that matters after a brown-out
+                first_record_ms = time.ticks_ms()
+                print(f"Boot: first record logged {first_record_ms} ms after reset "
+                      f"(main.py entered at {boot_start_ms} ms, bring-up {bringup_ms} ms)")
+                try:
+                    try:
+                        with open(boot_log_path, 'r') as f:
+                            pass
+                    except OSError:
+                        with open(boot_log_path, 'w') as f:
+                            f.write("Timestamp,Main_Start_ms,Bringup_ms,First_Record_ms\n")
+                    with open(boot_log_path, 'a') as f:
+                        f.write(f"{timestamp_str},{boot_start_ms},{bringup_ms},{first_record_ms}\n")
+                except Exception as e:
+                    pass # Boot statistics are informative only
+
         except Exception as e:
             log_status = "ERRO GRAVACAO"
 
+        if burst:
+            try:
+                burst.flush(burst_file_path)
+            except Exception as e:
+                pass # Burst data is auxiliary; never block the main rows
+
+        if uplink and time.ticks_diff(time.ticks_ms(), last_uplink_ms) >= UPLINK_INTERVAL_S * 1000:
+            try:
+                uplink.run()
+            except Exception as e:
+                pass # The backlog stays on the card; retried next interval
+            last_uplink_ms = time.ticks_ms()
+
         # 4. OLED DISPLAY UPDATE (ONLY WHEN ENABLED)
         if display_enabled:  # Conditional display refresh for power efficiency
             try:
@@ -211,7 +411,13 @@ while True:
     time.sleep(30) # 30-second sampling interval
 
 # === SAFE SHUTDOWN AND SD CARD EJECTION PROTOCOL ===
+if burst:
+    burst.stop()
 try:
+    if ring_log:
+        ring_log.close()
+    if log_index:
+        log_index.close()
     os.umount('/sd')
     # 5-pulse LED sequence indicates safe removal state
     for _ in range(5):
@@ -0,0 +1,29 @@
+# Frozen-module manifest for a custom MicroPython RP2040 build.
+# Frozen drivers are executed straight from flash: no parsing, no compiling
+# and no heap used for their bytecode, which shortens every (re)boot.
+#
+# Build from the MicroPython source tree with:
+#   make -C ports/rp2 BOARD=RPI_PICO FROZEN_MANIFEST=/path/to/PolySense-Station/manifest.py
+
+include("$(PORT_DIR)/boards/manifest.py")
+
+for name in (
+    "AHT20",
+    "bmp180",
+    "bmp280",
+    "bringup",
+    "burst",
+    "calibration",
+    "dht",
+    "ds18x20",
+    "fusion",
+    "logindex",
+    "mpu6050_temp",
+    "ntc",
+    "onewire",
+    "ringlog",
+    "sdcard",
+    "ssd1306",
+    "uplink",
+):
+    module(name + ".py", base_path="lib")  # relative to this manifest
@@ -0,0 +1,11 @@
+"""
+PolySense Station host-side tooling.
+
+Subpackages:
+    analysis  Statistics and models of the logs that scale to multi-month,
+              multi-station data
+    io        Typed loading of the datalogger CSVs with a columnar, memory-mapped
+              cache
+    sim       Simulated hardware for running and benchmarking the MicroPython
+              firmware on a PC
+"""
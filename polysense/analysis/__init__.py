@@ -0,0 +1,28 @@
+"""
+Analyses of PolySense logs that scale past what fits in memory.
+
+stats       Mergeable summary statistics (exact moments, t-digest quantiles),
+            computed in chunks and in parallel
+downsample  Min/max-per-pixel and LTTB reduction of long series for plotting
+windows     Sliding windows as strided views, batched for training (tf.data)
+lstm        NumPy forward pass of notebook 11's LSTM (export() from Keras once)
+sweep       KMeans / GMM over k in a process pool, with scalable silhouette and
+            Davies-Bouldin scores
+regimes     Saved scaler + GMM / KMeans: regime of new rows, slow adaptation and
+            drift checks, without refitting
+decompose   Additive seasonal decomposition of many sensors in one pass, cached
+spectrum    rfft amplitude, Welch PSD and Lomb-Scargle of all channels; dominant
+            periods per channel, with gaps handled
+quality     Range, spike, stuck, dropout and cross-sensor flags of every reading,
+            as a bitmask, in one pass
+fusion      Bias- and noise-weighted (Kalman) consensus of each quantity's
+            sensors, cached; parameters for the on-device filter
+calibration Robust per-sensor corrections against INMET, fitted in one batch;
+            the table the firmware applies at acquisition
+
+Usage:
+    from polysense.analysis import summarize
+    summarize("datalog_final.csv").describe()
+"""
+
+from polysense.analysis.stats import Summary, TDigest, summarize
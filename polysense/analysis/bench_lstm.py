@@ -0,0 +1,101 @@
+"""
+Benchmark the NumPy LSTM forward pass against TensorFlow.
+
+Scores a day of windows (2880 at 30 s) with polysense.analysis.lstm and,
+given the Keras model, with model.predict(), reporting start-up (imports
+and loading), throughput and the largest difference between the two.
+Without --model, random weights of notebook 11's shape (two 25-unit LSTM
+layers, Dense 1, 240 x 2 windows) are used.
+
+Usage:
+    python -m polysense.analysis.bench_lstm [--windows 2880]
+    python -m polysense.analysis.bench_lstm --model lstm.npz --keras best_model.keras
+"""
+
+import argparse
+import json
+import sys
+import time
+
+
+def random_model(features=2, units=(25, 25), window=240, seed=0):
+    import numpy as np
+    from polysense.analysis.lstm import LSTMRegressor, _activation, _LSTMLayer
+    rng = np.random.default_rng(seed)
+    layers, inputs = [], features
+    for u in units:
+        layers.append(_LSTMLayer(rng.normal(0, 0.3, (inputs, 4 * u)), rng.normal(0, 0.3, (u, 4 * u)),
+                                 rng.normal(0, 0.3, 4 * u), "tanh", "sigmoid"))
+        inputs = u
+    dense = [(rng.normal(0, 0.3, (inputs, 1)).astype(np.float32), np.zeros(1, np.float32),
+              _activation("linear"))]
+    return LSTMRegressor(layers, dense, window)
+
+
+def _timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t)
+    return out, best
+
+
+def run(args):
+    t = time.perf_counter()
+    import numpy as np
+    from polysense.analysis.lstm import LSTMRegressor
+    from polysense.analysis.windows import windows
+    model = LSTMRegressor.load(args.model) if args.model else random_model()
+    startup = time.perf_counter() - t
+
+    window = model.window or 240
+    features = model.lstm[0].inputs
+    rng = np.random.default_rng(1)
+    series = rng.uniform(0, 1, (args.windows + window, features)).astype(np.float32)
+    x = windows(series, None, window)[0]
+    ours, seconds = _timed(lambda: model.predict(x, args.batch_size), args.repeat)
+    result = {"windows": len(x), "numpy": {"startup_ms": 1e3 * startup, "seconds": seconds,
+                                           "windows_per_s": len(x) / seconds}}
+
+    if args.keras:
+        t = time.perf_counter()
+        from tensorflow import keras
+        tf_model = keras.models.load_model(args.keras)
+        startup = time.perf_counter() - t
+        dense = np.ascontiguousarray(x)
+        theirs, seconds = _timed(lambda: tf_model.predict(dense, batch_size=args.batch_size,
+                                                          verbose=0), args.repeat)
+        result["tensorflow"] = {"startup_ms": 1e3 * startup, "seconds": seconds,
+                                "windows_per_s": len(x) / seconds}
+        result["max_abs_diff"] = float(np.abs(theirs - ours).max())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NumPy LSTM inference vs TensorFlow")
+    parser.add_argument("--model", help=".npz written by polysense.analysis.lstm.export")
+    parser.add_argument("--keras", help="the same model as .keras, to compare with TensorFlow")
+    parser.add_argument("--windows", type=int, default=2880, help="windows scored (default: a day)")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    r = run(args)
+    if args.json:
+        json.dump(r, sys.stdout, indent=2)
+        print()
+        return
+    print("%d windows" % r["windows"])
+    print("%-10s %11s %9s %12s" % ("engine", "startup ms", "score s", "windows/s"))
+    for name in ("numpy", "tensorflow"):
+        if name in r:
+            e = r[name]
+            print("%-10s %11.1f %9.3f %12.0f" % (name, e["startup_ms"], e["seconds"], e["windows_per_s"]))
+    if "max_abs_diff" in r:
+        print("max |numpy - tensorflow| = %.3g" % r["max_abs_diff"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Calibration of every sensor against INMET, fitted in one batch.
+
+Each channel gets a low-order polynomial correction of its raw reading x,
+fitted against the INMET reading of the same quantity in the joined file
+(data/raw/validation_and_Measured_Data_cleaned_BRT_.csv, or any frame from
+polysense.io.align.align()):
+
+    corrected = c_d u^d + ... + c_1 u + c_0,   u = x - center
+
+The fit is robust (Huber M-estimator by iteratively reweighted least
+squares, the residual scale re-estimated by MAD each pass), so hours where
+a sensor sits in the sun or INMET repeats a value pull on it no more than
+linearly. Every
+channel is solved at once: the weighted normal equations of all channels
+form one (channels, d + 1, d + 1) stack for np.linalg.solve, with missing
+rows carrying zero weight.
+
+save() writes the compact table lib/calibration.py loads from the SD card
+at boot, one line per channel:
+
+    Temp_MPU6050_C,25.095897,1.0437176,22.693511     (channel, center, c_d ... c_0)
+
+Fit against raw logs: rows the firmware already corrected would be
+corrected twice.
+
+Usage:
+    from polysense.analysis.calibration import fit, Calibration
+    calibration = fit(pd.read_csv(VALIDATION, index_col=0), degree={"humidity": 2})
+    calibration.table                       # coefficients, rmse before / after
+    calibration.apply(df)                   # corrected copy of a log
+    calibration.save("/media/sd/calibration.csv")
+
+    python -m polysense.analysis.calibration [VALIDATION] -o calibration.csv [--degree 2]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.schema import BY_NAME, SENSORS
+
+VALIDATION = "data/raw/validation_and_Measured_Data_cleaned_BRT_.csv"
+# INMET column per quantity (instantaneous readings, as the log's)
+REFERENCE = {"temperature": "Temp. Ins. (C)", "humidity": "Umi. Ins. (%)",
+             "pressure": "Pressao Ins. (hPa)"}
+METHODS = ("huber", "ols")
+DEGREE = 1         # straight line: gain and offset
+HUBER = 1.345      # Huber threshold, in robust deviations (95% efficiency)
+MAD_SCALE = 1.4826
+ITERATIONS = 20
+TOLERANCE = 1e-9   # largest coefficient change that ends the iterations
+
+
+def _setting(table, column, default=None):
+    """Per-column setting: a plain value, or {column or quantity: value}."""
+    if not isinstance(table, dict):
+        return table
+    if column in table:
+        return table[column]
+    return table.get(BY_NAME[column].quantity if column in BY_NAME else None, default)
+
+
+def _solve(U, Y, valid, degree, method, iterations):
+    """
+    Weighted polynomial fits of every column of Y on the same column of U.
+
+    Returns:
+        (channels, degree + 1) coefficients, highest power first
+    """
+    A = U[..., None] ** np.arange(degree, -1, -1)                      # (rows, ch, d + 1)
+    A = np.where(valid[..., None], A, 0.0)
+    Y = np.where(valid, Y, 0.0)
+    w = valid.astype(np.float64)
+    ridge = 1e-12 * np.eye(degree + 1)
+    coef = None
+    for _ in range(iterations if method == "huber" else 1):
+        G = np.einsum("nc,nci,ncj->cij", w, A, A) + ridge
+        b = np.einsum("nc,nci,nc->ci", w, A, Y)
+        new = np.linalg.solve(G, b[..., None])[..., 0]
+        done = coef is not None and np.nanmax(np.abs(new - coef)) <= TOLERANCE
+        coef = new
+        if done:
+            break
+        r = np.where(valid, Y - np.einsum("nci,ci->nc", A, coef), np.nan)
+        with np.errstate(invalid="ignore"):
+            # floored, or a channel fitted exactly on half its rows drops the rest
+            scale = np.maximum(MAD_SCALE * np.nanmedian(np.abs(r), axis=0), 1e-6)
+            z = np.abs(r) / (HUBER * scale)
+            w = np.where(valid, np.where(z > 1, 1 / z, 1.0), 0.0)
+    return coef
+
+
+def _rmse(residuals):
+    with np.errstate(invalid="ignore"):
+        return np.sqrt(np.nanmean(residuals ** 2, axis=0))
+
+
+class Calibration:
+    """
+    Per-channel polynomial corrections.
+
+    Attributes:
+        table: DataFrame per channel: center, degree, c0 .. c<d> (c<k>
+            multiplies (x - center)^k), and, from fit(), reference, rows,
+            rmse_raw and rmse (against the reference)
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def coefficients(self, channel):
+        """Highest power first, as lib/calibration.py takes them."""
+        row = self.table.loc[channel]
+        return [float(row["c%d" % k]) for k in range(int(row["degree"]), -1, -1)]
+
+    def apply(self, df):
+        """Copy of ``df`` with every calibrated column corrected."""
+        out = df.copy()
+        for channel in self.table.index:
+            if channel in out.columns:
+                u = out[channel].to_numpy(dtype=np.float64) - self.table.at[channel, "center"]
+                out[channel] = np.polyval(self.coefficients(channel), u).astype(out[channel].dtype)
+        return out
+
+    def save(self, path):
+        """Write the table lib/calibration.py loads at boot (a path or an open file)."""
+        lines = ["# channel,center,coefficients of (x - center), highest power first\n"]
+        for channel in self.table.index:
+            values = [self.table.at[channel, "center"]] + self.coefficients(channel)
+            lines.append(",".join([channel] + ["%.8g" % v for v in values]) + "\n")
+        if hasattr(path, "write"):
+            path.writelines(lines)
+            return
+        with open(path, "w") as f:
+            f.writelines(lines)
+
+    @classmethod
+    def load(cls, path):
+        """Read a saved table; lines that do not parse are skipped, as on the card."""
+        rows = {}
+        with open(path) as f:
+            for line in f:
+                fields = line.strip().split(",")
+                if len(fields) < 3 or fields[0].startswith("#"):
+                    continue
+                try:
+                    values = [float(v) for v in fields[1:]]
+                except ValueError:
+                    continue
+                row = {"center": values[0], "degree": len(values) - 2}
+                row.update({"c%d" % k: c for k, c in enumerate(reversed(values[1:]))})
+                rows[fields[0]] = row
+        return cls(pd.DataFrame.from_dict(rows, orient="index").rename_axis("channel"))
+
+
+def fit(df, columns=None, reference=None, degree=DEGREE, method="huber", iterations=ITERATIONS):
+    """
+    Fit the correction of every sensor channel against its reference.
+
+    Args:
+        df: Frame with the channels and the reference columns, row-aligned
+            (e.g. the validation CSV, or polysense.io.align.align())
+        columns: Channels (default: every schema sensor present)
+        reference: {column or quantity: reference column} on top of REFERENCE
+        degree: Polynomial degree, or {column or quantity: degree} (others DEGREE)
+        method: "huber" (robust) or "ols"
+        iterations: Most reweighting passes of the Huber fit
+
+    Returns:
+        Calibration
+    """
+    if method not in METHODS:
+        raise ValueError("unknown method %r (one of %s)" % (method, ", ".join(METHODS)))
+    if columns is None:
+        columns = [c for c in SENSORS if c in df.columns]
+    references = dict(REFERENCE, **(reference or {}))
+    pairs = [(c, _setting(references, c)) for c in columns]
+    for column, ref in pairs:
+        if ref not in df.columns:
+            raise ValueError("no reference column for %r (set reference=)" % column)
+    X = df[[c for c, _ in pairs]].to_numpy(dtype=np.float64)
+    Y = df[[r for _, r in pairs]].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(X) & ~np.isnan(Y)
+    with np.errstate(invalid="ignore"):
+        center = np.nanmean(np.where(valid, X, np.nan), axis=0)
+    U = X - center
+
+    degrees = np.array([_setting(degree, c, DEGREE) for c, _ in pairs], dtype=int)
+    table = pd.DataFrame({"reference": [r for _, r in pairs], "center": center,
+                          "degree": degrees, "rows": valid.sum(axis=0)},
+                         index=pd.Index([c for c, _ in pairs], name="channel"))
+    corrected = np.full(X.shape, np.nan)
+    for d in np.unique(degrees):
+        picked = np.flatnonzero(degrees == d)
+        coef = _solve(U[:, picked], Y[:, picked], valid[:, picked], int(d), method, iterations)
+        for k in range(d + 1):
+            table.loc[table.index[picked], "c%d" % k] = coef[:, d - k]
+        corrected[:, picked] = np.einsum("nci,ci->nc", U[:, picked, None] ** np.arange(d, -1, -1),
+                                         coef)
+    table["rmse_raw"] = _rmse(np.where(valid, X - Y, np.nan))
+    table["rmse"] = _rmse(np.where(valid, corrected - Y, np.nan))
+    return Calibration(table)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit sensor calibrations against INMET")
+    parser.add_argument("path", nargs="?", default=VALIDATION,
+                        help="joined station / INMET CSV (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="calibration table for the SD card (default: stdout)")
+    parser.add_argument("--degree", type=int, default=DEGREE, help="polynomial degree (default: %(default)s)")
+    parser.add_argument("--method", choices=METHODS, default="huber")
+    args = parser.parse_args()
+
+    calibration = fit(pd.read_csv(args.path, index_col=0), degree=args.degree, method=args.method)
+    print(calibration.table[["reference", "rows", "rmse_raw", "rmse"]].to_string(),
+          file=sys.stderr)
+    calibration.save(args.output or sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Additive seasonal decomposition of many sensors in one pass.
+
+Computes what statsmodels' seasonal_decompose(model="additive") does for
+each column of a frame, for all columns at once on a 2-D array:
+
+    trend      centred moving average over one period (2 x period-MA for an
+               even period), from cumulative sums: O(rows) whatever the period
+    seasonal   mean of the detrended series at each phase of the period,
+               centred, one reshape + nanmean for every channel
+    resid      observed - trend - seasonal
+
+Like the notebooks' ``df[col].dropna()``, each column is decomposed over its
+own valid rows: they are packed to the front of the column first, so
+sensors with different gaps still share one array. extrapolate=True
+extends the trend over the first / last half period by a straight-line fit
+(statsmodels' extrapolate_trend="freq").
+
+decimate=q decomposes q-row block means with period / q and interpolates
+trend and seasonal back to every row (honouring extrapolate), q times less
+work for the daily cycle of 30 s data. Results are cached, so the plotting and metrics cells
+of notebook 06 share one decomposition.
+
+Usage:
+    from polysense.analysis.decompose import decompose
+    result = decompose(df, TEMPERATURE, period=2880)
+    result["Temp_AHT20_C"].trend.plot()
+    result.metrics("°C")
+"""
+
+import hashlib
+import warnings
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.schema import TIMESTAMP
+
+PERIOD = 2880     # one day of 30 s rows
+CACHE_SIZE = 8    # decompositions kept
+
+DecomposeResult = namedtuple("DecomposeResult", "observed trend seasonal resid")
+
+_cache = OrderedDict()
+
+
+def _pack(values):
+    """Each column's valid rows moved to the front, in order: (packed, lengths, positions)."""
+    valid = ~np.isnan(values)
+    order = np.argsort(~valid, axis=0, kind="stable")
+    return np.take_along_axis(values, order, axis=0), valid.sum(axis=0), order
+
+
+def _rows(n, lengths):
+    """(n, channels) mask of the rows within each column's length."""
+    return np.arange(n)[:, None] < lengths[None, :]
+
+
+def _trend(x, lengths, period):
+    """Centred moving average of each column over its first ``lengths`` rows."""
+    n = len(x)
+    half = period // 2
+    trend = np.full(x.shape, np.nan)
+    if n <= 2 * half:
+        return trend
+    c = np.zeros((n + 1, x.shape[1]))
+    np.cumsum(np.nan_to_num(x), axis=0, out=c[1:])
+    t = np.arange(half, n - half)
+    if period % 2:
+        trend[t] = (c[t + half + 1] - c[t - half]) / period
+    else:
+        # weights 1/2, 1, ..., 1, 1/2 over period + 1 rows
+        trend[t] = (c[t + half] - c[t - half + 1] + 0.5 * (x[t - half] + x[t + half])) / period
+    inside = (np.arange(n)[:, None] >= half) & (np.arange(n)[:, None] < lengths - half)
+    trend[~inside] = np.nan
+    return trend
+
+
+def _extrapolate(trend, lengths, period):
+    """Fill the trend's NaN ends with a least-squares line through the nearest ``period`` values."""
+    half = period // 2
+    for j, n in enumerate(lengths):
+        front, back = half, n - half - 1
+        if back <= front:
+            continue
+        for lo, hi, fill in ((front, min(front + period, back), np.arange(0, front)),
+                             (max(front, back - period), back, np.arange(back + 1, n))):
+            slope, intercept = np.polyfit(np.arange(lo, hi), trend[lo:hi, j], 1)
+            trend[fill, j] = slope * fill + intercept
+    return trend
+
+
+def _seasonal(detrended, lengths, period):
+    """Centred per-phase means, tiled over each column."""
+    n, channels = detrended.shape
+    rows = -(-n // period) * period
+    padded = np.full((rows, channels), np.nan)
+    padded[:n] = detrended
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # a phase with no value
+        means = np.nanmean(padded.reshape(-1, period, channels), axis=0)
+    means -= means.mean(axis=0)
+    seasonal = np.tile(means, (rows // period, 1))[:n]
+    seasonal[~_rows(n, lengths)] = np.nan
+    return seasonal, means
+
+
+def _decompose(x, lengths, period, extrapolate):
+    trend = _trend(x, lengths, period)
+    if extrapolate:
+        trend = _extrapolate(trend, lengths, period)
+    detrended = x - trend
+    seasonal, means = _seasonal(detrended, lengths, period)
+    return trend, seasonal, means
+
+
+def _decimated(x, lengths, period, q, extrapolate):
+    """Decompose q-row block means, then interpolate back to every row."""
+    if period % q:
+        raise ValueError("decimate=%d does not divide the period %d" % (q, period))
+    n, channels = x.shape
+    blocks = -(-n // q)
+    padded = np.full((blocks * q, channels), np.nan)
+    padded[:n] = x
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        small = np.nanmean(padded.reshape(blocks, q, channels), axis=1)
+    short = -(-lengths // q)
+    trend_small, _, means = _decompose(small, short, period // q, extrapolate)
+
+    centres = np.arange(blocks) * q + (q - 1) / 2
+    trend = np.full(x.shape, np.nan)
+    # phases of the full period, on the block grid, wrapping around
+    phase = (np.arange(period) - (q - 1) / 2) / q
+    cyclic = np.arange(period // q + 1)
+    seasonal_means = np.empty((period, channels))
+    # without extrapolation, rows outside the block trend's centres stay NaN
+    edges = {} if extrapolate else {"left": np.nan, "right": np.nan}
+    for j in range(channels):
+        m = short[j]
+        if m:
+            trend[:lengths[j], j] = np.interp(np.arange(lengths[j]), centres[:m], trend_small[:m, j],
+                                               **edges)
+        seasonal_means[:, j] = np.interp(phase % (period // q), cyclic,
+                                         np.append(means[:, j], means[0, j]))
+    seasonal_means -= seasonal_means.mean(axis=0)
+    seasonal = np.tile(seasonal_means, (-(-n // period), 1))[:n]
+    seasonal[~_rows(n, lengths)] = np.nan
+    return trend, seasonal
+
+
+class Decomposition:
+    """
+    Decomposition of several columns (each over its own valid rows).
+
+    Index a column to get its DecomposeResult of Series (observed, trend,
+    seasonal, resid), indexed like the input rows it came from.
+    """
+
+    def __init__(self, columns, index, order, lengths, observed, trend, seasonal, period):
+        self.columns = list(columns)
+        self.index = index
+        self.order = order
+        self.lengths = lengths
+        self.observed = observed
+        self.trend = trend
+        self.seasonal = seasonal
+        self.resid = observed - trend - seasonal
+        self.period = period
+
+    def __getitem__(self, column):
+        j = self.columns.index(column)
+        n = self.lengths[j]
+        index = self.index[self.order[:n, j]]
+        parts = [pd.Series(a[:n, j], index=index, name=name) for a, name in
+                 ((self.observed, column), (self.trend, "trend"), (self.seasonal, "seasonal"),
+                  (self.resid, "resid"))]
+        return DecomposeResult(*parts)
+
+    def metrics(self, unit=None):
+        """
+        Notebook 06's table: level, amplitudes and the share of the variance
+        in trend, seasonal and residual, per column with at least two periods.
+        """
+        suffix = "_" + unit if unit else ""
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            obs, trend, season, resid = self.observed, self.trend, self.seasonal, self.resid
+            var = np.nanvar(obs, axis=0, ddof=1)
+            table = pd.DataFrame({
+                "Sensor": self.columns,
+                "Mean" + suffix: np.nanmean(obs, axis=0),
+                "Std" + suffix: np.nanstd(obs, axis=0, ddof=1),
+                "Total_Amplitude": np.nanmax(obs, axis=0) - np.nanmin(obs, axis=0),
+                "Trend_Var": np.nanmax(trend, axis=0) - np.nanmin(trend, axis=0),
+                "Seasonal_Amplitude": np.nanmax(season, axis=0) - np.nanmin(season, axis=0),
+                "Residual_Std": np.nanstd(resid, axis=0, ddof=1),
+                "Residual_Max": np.nanmax(np.abs(resid), axis=0),
+                "%_Trend_Var": 100 * np.nanvar(trend, axis=0, ddof=1) / var,
+                "%_Seasonal_Var": 100 * np.nanvar(season, axis=0, ddof=1) / var,
+                "%_Residual_Var": 100 * np.nanvar(resid, axis=0, ddof=1) / var,
+            })
+        return table[self.lengths >= 2 * self.period].reset_index(drop=True)
+
+
+def _key(values, index, columns, period, extrapolate, decimate):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(values).view(np.uint8))
+    h.update(np.ascontiguousarray(index).view(np.uint8) if index.dtype != object
+             else repr(list(index)).encode())
+    return h.hexdigest(), tuple(columns), period, extrapolate, decimate
+
+
+def decompose(data, columns=None, period=PERIOD, extrapolate=True, decimate=1):
+    """
+    Additive decomposition of ``columns`` of ``data``, all in one pass.
+
+    Args:
+        data: DataFrame; a Timestamp column, if any, indexes the results
+        columns: Columns to decompose (default: all numeric ones)
+        period: Rows per seasonal cycle
+        extrapolate: Extend the trend over both ends (extrapolate_trend="freq")
+        decimate: Decompose means of this many rows, then interpolate back
+
+    Returns:
+        Decomposition
+    """
+    if columns is None:
+        columns = [c for c in data.columns if c != TIMESTAMP and pd.api.types.is_numeric_dtype(data[c])]
+    columns = list(columns)
+    values = data[columns].to_numpy(dtype=np.float64)
+    index = pd.DatetimeIndex(data[TIMESTAMP]) if TIMESTAMP in data.columns else data.index
+    index = np.asarray(index)
+    key = _key(values, index, columns, period, extrapolate, decimate)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    x, lengths, order = _pack(values)
+    if decimate > 1:
+        trend, seasonal = _decimated(x, lengths, period, decimate, extrapolate)
+    else:
+        trend, seasonal, _ = _decompose(x, lengths, period, extrapolate)
+    result = Decomposition(columns, index, order, lengths, x, trend, seasonal, period)
+
+    _cache[key] = result
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
@@ -0,0 +1,216 @@
+"""
+Downsampling of long time series for plotting.
+
+A month of 30 s rows is ~86k points per line, far more than the pixels of
+a plot; drawing them is slow and looks the same as drawing a few per
+pixel column:
+
+    minmax   first, min, max and last point of each pixel column: the drawn
+             envelope is the raw line's, extremes included
+    lttb     Largest-Triangle-Three-Buckets (Steinarsson 2013): one point per
+             bucket, the one forming the largest triangle with the point
+             chosen before it and the next bucket's average; keeps the
+             visual shape with fewer points. Candidates are narrowed to each
+             bucket's first/min/max/last (MinMaxLTTB), so the sequential pass
+             looks at 4 points per bucket, not all of them
+
+Buckets split the x range evenly and are found and reduced with NumPy in
+one pass. The points returned are samples of the input; a bucket with no
+rows (a gap in the log) or only NaN leaves a gap in the line. Results are
+cached per (series, range, width, method). Time-zone aware datetimes are
+bucketed by their UTC instants and returned as wall-clock datetime64.
+
+Usage:
+    from polysense.analysis.downsample import plot
+    plot(ax, df.index, df["Temp_AHT20_C"], color="C0", linewidth=0.8)   # as ax.plot
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+WIDTH = 2000        # buckets when the pixel width is unknown
+CACHE_SIZE = 128    # downsampled series kept
+METHODS = ("minmax", "lttb")
+
+_cache = OrderedDict()
+
+
+def _numeric(x):
+    """x as float64 (datetimes as nanoseconds) for arithmetic."""
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def _first(hit, bucket, n):
+    """Position of the first True of each bucket (-1 where none)."""
+    pos = np.flatnonzero(hit)
+    b = bucket[pos]
+    keep = np.flatnonzero(np.diff(b, prepend=-1))
+    out = np.full(n, -1)
+    out[b[keep]] = pos[keep]
+    return out
+
+
+def _extremes(y, edges):
+    """(buckets, 4) positions of the first, min, max and last row of each bucket (-1: empty)."""
+    counts = np.diff(edges)
+    n = len(counts)
+    y = y[edges[0]:edges[-1]]
+    bucket = np.repeat(np.arange(n), counts)
+    full = counts > 0
+    starts = edges[:-1][full] - edges[0]
+    big = np.where(np.isnan(y), np.inf, y)
+    small = np.where(np.isnan(y), -np.inf, y)
+    lo = np.full(n, np.inf)
+    hi = np.full(n, -np.inf)
+    lo[full] = np.minimum.reduceat(big, starts)
+    hi[full] = np.maximum.reduceat(small, starts)
+    # an all-NaN bucket's "extremes" are NaN rows, which draw as a gap
+    out = np.stack([np.where(full, edges[:-1] - edges[0], -1),
+                    _first(big == lo[bucket], bucket, n),
+                    _first(small == hi[bucket], bucket, n),
+                    np.where(full, edges[1:] - edges[0] - 1, -1)], axis=1)
+    return np.where(out >= 0, out + edges[0], -1)
+
+
+def _lttb(xs, y, candidates, edges):
+    """One position per non-empty bucket, chosen among ``candidates``."""
+    counts = np.diff(edges)
+    n = len(counts)
+    y0 = y[edges[0]:edges[-1]]
+    valid = ~np.isnan(y0)
+    x0 = xs[edges[0]:edges[-1]]
+    bucket = np.repeat(np.arange(n), counts)
+    # average of each bucket, and of the next bucket with data after each
+    weight = np.bincount(bucket, valid, n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = np.bincount(bucket, np.where(valid, x0, 0.0), n) / weight
+        my = np.bincount(bucket, np.where(valid, y0, 0.0), n) / weight
+    has = np.flatnonzero(weight > 0)
+    if not has.size:
+        # no reading at all: each bucket's first (NaN) row, a gap
+        return candidates[candidates[:, 0] >= 0, 0]
+    after = np.searchsorted(has, np.arange(n), side="right")
+    nxt = np.where(after < len(has), has[np.minimum(after, len(has) - 1)], -1)
+    cx, cy = xs[np.maximum(candidates, 0)], y[np.maximum(candidates, 0)]
+
+    chosen = []
+    ax = ay = None
+    for i, (row, px, py) in enumerate(zip(candidates.tolist(), cx.tolist(), cy.tolist())):
+        if row[0] < 0:
+            continue
+        if ax is None or nxt[i] < 0 or weight[i] == 0:
+            # first and last bucket keep their end points; NaN buckets a NaN row
+            k = 0 if ax is None else 3
+            if weight[i] == 0:
+                k = 0
+        else:
+            bx, by = mx[nxt[i]], my[nxt[i]]
+            best, k = -1.0, 0
+            for j in range(4):
+                if py[j] != py[j]:
+                    continue
+                area = abs((ax - bx) * (py[j] - ay) - (ax - px[j]) * (by - ay))
+                if area > best:
+                    best, k = area, j
+        chosen.append(row[k])
+        if py[k] == py[k]:
+            ax, ay = px[k], py[k]
+    return np.array(chosen, dtype=np.int64)
+
+
+def _key(x, y, start, end, width, method, tz=None):
+    h = hashlib.blake2b(digest_size=16)
+    for a in (x, y):
+        h.update(str(a.dtype).encode())
+        h.update(np.ascontiguousarray(a).view(np.uint8))
+    return h.hexdigest(), str(tz), start, end, width, method
+
+
+def _instant(stamp, tz):
+    """A bound of a tz-aware range as UTC datetime64 (naive bounds are wall clock in ``tz``)."""
+    stamp = pd.Timestamp(stamp)
+    if stamp.tzinfo is None:
+        stamp = stamp.tz_localize(tz)
+    return stamp.tz_convert(None).to_datetime64()
+
+
+def downsample(x, y, width=WIDTH, method="minmax", start=None, end=None):
+    """
+    Points of (x, y) to draw at ``width`` pixel columns.
+
+    Args:
+        x: Sorted x values (numbers or datetimes, time-zone aware or not),
+            e.g. a DatetimeIndex
+        y: Values (NaN draws as a gap)
+        width: Buckets across [start, end]: the plot's width in pixels
+        method: "minmax" (up to 4 points per bucket) or "lttb" (1 per bucket)
+        start, end: x range to keep (default: all of x)
+
+    Returns:
+        (x, y) NumPy arrays
+    """
+    if method not in METHODS:
+        raise ValueError("unknown method %r (one of %s)" % (method, ", ".join(METHODS)))
+    tz = getattr(getattr(x, "dtype", None), "tz", None)
+    if tz is not None:
+        # an aware index is an object array to NumPy: bucket the UTC instants
+        # (sorted even across DST changes), return the wall-clock times
+        stamps = pd.DatetimeIndex(x)
+        x = stamps.tz_localize(None).to_numpy()
+        instants = stamps.tz_convert(None).to_numpy()
+        start = None if start is None else _instant(start, tz)
+        end = None if end is None else _instant(end, tz)
+    else:
+        x = instants = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    key = _key(instants, y, start, end, width, method, tz)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    xs = _numeric(instants)
+    lo = xs[0] if start is None else _numeric(np.asarray([start], dtype=instants.dtype))[0]
+    hi = xs[-1] if end is None else _numeric(np.asarray([end], dtype=instants.dtype))[0]
+    edges = np.searchsorted(xs, np.linspace(lo, hi, int(width) + 1), side="left")
+    edges[-1] = np.searchsorted(xs, hi, side="right")
+    if edges[-1] - edges[0] <= 4 * width:
+        pos = np.arange(edges[0], edges[-1])
+        out = x[pos], y[pos]
+    else:
+        candidates = _extremes(y, edges)
+        if method == "minmax":
+            pos = np.unique(candidates[candidates >= 0])
+        else:
+            pos = _lttb(xs, y, candidates, edges)
+        # break the line across empty buckets
+        bucket = np.searchsorted(edges, pos, side="right") - 1
+        gaps = np.flatnonzero(np.diff(bucket) > 1) + 1
+        out = (np.insert(x[pos], gaps, x[pos[gaps - 1]]),
+               np.insert(y[pos], gaps, np.nan))
+
+    _cache[key] = out
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return out
+
+
+def plot(ax, x, y, *args, width=None, method="minmax", **kwargs):
+    """
+    ax.plot(x, y, ...) of the downsampled series.
+
+    Args:
+        width: Buckets (default: the axes' width in pixels)
+        method: As for downsample()
+
+    Returns:
+        The lines of ax.plot()
+    """
+    if width is None:
+        width = max(int(ax.get_window_extent().width), 1)
+    dx, dy = downsample(x, y, width, method)
+    return ax.plot(dx, dy, *args, **kwargs)
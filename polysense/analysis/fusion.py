@@ -0,0 +1,261 @@
+"""
+One temperature, humidity and pressure channel from the redundant sensors.
+
+Instead of the plain mean of every sensor of a quantity, each sensor gets a
+bias and a noise variance:
+
+    against a reference (a column, a Series such as an aligned INMET
+    channel, or by default the row median of the group when it has three
+    sensors or more): bias = median(x - reference), variance = variance of
+    what is left, so self-heating drift and coarse resolution count as noise
+    two sensors, no reference: bias against their mean, and the variance of
+    each sensor's own sample-to-sample changes less the part the other
+    sensor shares (the common signal), which needs no reference
+
+The readings are then combined, vectorised over the whole history:
+
+    weighted  inverse-variance mean of the bias-corrected readings present
+              in each row, with its variance 1 / sum(1 / var_i)
+    kalman    the same rows through a scalar Kalman filter with a random-walk
+              state (lib/fusion.py: the filter the firmware can run per
+              sample), smoothing the noise the sensors do not share
+
+fuse() caches its result, so notebooks 08-11 share one pass.
+
+Usage:
+    from polysense.analysis.fusion import fuse, estimate, parameters, export
+    fused = fuse(df)                           # temperature, humidity, pressure (+ _std)
+    estimate(df, TEMPERATURE)                  # bias, noise_var, weight per sensor
+    export("fusion.json", parameters(df))      # for lib/fusion.py on the card
+"""
+
+import hashlib
+import json
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.schema import HUMIDITY, PRESSURE, TEMPERATURE, TIMESTAMP
+
+GROUPS = {"temperature": TEMPERATURE, "humidity": HUMIDITY, "pressure": PRESSURE}
+METHODS = ("kalman", "weighted")
+MIN_VAR = 1e-4     # smallest noise variance (units^2), so no sensor takes all the weight
+CACHE_SIZE = 8
+
+_cache = OrderedDict()
+
+
+def _reference(df, reference):
+    if isinstance(reference, str):
+        return df[reference].to_numpy(dtype=np.float64)
+    if isinstance(reference, pd.Series):
+        return reference.reindex(df.index).to_numpy(dtype=np.float64)
+    return np.asarray(reference, dtype=np.float64)
+
+
+def _difference_noise(X):
+    """Per column: (var of own changes - median covariance with the others' changes) / 2."""
+    D = np.diff(X, axis=0)
+    var = np.nanvar(D, axis=0)
+    k = X.shape[1]
+    shared = np.zeros(k)
+    for i in range(k):
+        covs = []
+        for j in range(k):
+            both = ~np.isnan(D[:, i]) & ~np.isnan(D[:, j])
+            if i != j and both.sum() > 1:
+                covs.append(np.cov(D[both, i], D[both, j])[0, 1])
+        shared[i] = np.median(covs) if covs else 0.0
+    return (var - shared) / 2
+
+
+def estimate(df, columns, reference=None):
+    """
+    Bias and noise variance of each sensor of one quantity.
+
+    Args:
+        df: Frame with the sensor columns
+        columns: The sensors
+        reference: Column name, Series (indexed like ``df``) or array; None
+            uses the group's row median (three sensors or more) or the two
+            sensors' own changes
+
+    Returns:
+        DataFrame per sensor: bias, noise_var, weight (share of the
+        inverse-variance mean), rows (readings used)
+    """
+    columns = list(columns)
+    X = df[columns].to_numpy(dtype=np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # rows with no reading
+        if reference is not None or len(columns) >= 3:
+            ref = _reference(df, reference) if reference is not None else np.nanmedian(X, axis=1)
+            r = X - ref[:, None]
+            bias = np.nanmedian(r, axis=0)
+            var = np.nanvar(r - bias, axis=0, ddof=1)
+            rows = (~np.isnan(r)).sum(axis=0)
+        else:
+            bias = np.nanmedian(X - np.nanmean(X, axis=1, keepdims=True), axis=0)
+            var = _difference_noise(X)
+            rows = (~np.isnan(X)).sum(axis=0)
+    var = np.maximum(np.nan_to_num(var, nan=np.inf), MIN_VAR)
+    weight = (1 / var) / (1 / var).sum()
+    return pd.DataFrame({"bias": bias, "noise_var": var, "weight": weight, "rows": rows},
+                        index=pd.Index(columns, name="sensor"))
+
+
+def combine(X, bias, var):
+    """
+    Inverse-variance mean of each row's bias-corrected readings.
+
+    Returns:
+        (values, variances); NaN where a row has no reading
+    """
+    X = np.asarray(X, dtype=np.float64)
+    w = np.where(np.isnan(X), 0.0, 1.0 / np.asarray(var, dtype=np.float64))
+    info = w.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (np.nan_to_num(X - bias) * w).sum(axis=1) / info
+        return np.where(info > 0, z, np.nan), 1.0 / info
+
+
+def process_variance(z, R):
+    """
+    Random-walk variance per sample, for combine()'s values and variances.
+
+    For a random walk seen through white noise, consecutive changes dz share
+    the noise of the row between them: cov(dz[t], dz[t+1]) = -noise and
+    var(dz) = process + 2 noise. Their ratio, applied to the median of R
+    (the noise the filter is told about), keeps the filter's gain right even
+    when the per-sensor variances are off by a common factor.
+    """
+    dz = np.diff(np.asarray(z, dtype=np.float64))
+    both = ~np.isnan(dz[:-1]) & ~np.isnan(dz[1:])
+    finite = np.isfinite(R)
+    if both.sum() < 2 or not finite.any():
+        return MIN_VAR
+    var = float(np.nanvar(dz))
+    noise = -float(np.cov(dz[:-1][both], dz[1:][both])[0, 1])
+    if noise <= 0:
+        return max(var, MIN_VAR)
+    # never zero, or the filter would stop following the readings
+    return max((var - 2 * noise) / noise * float(np.median(R[finite])), 1e-3 * MIN_VAR)
+
+
+def kalman(z, R, process_var):
+    """
+    Scalar Kalman filter of combined readings (as lib/fusion.Consensus).
+
+    Args:
+        z, R: Per row, combine()'s value and variance (NaN / inf: no reading)
+        process_var: Variance of the true value's change per row
+
+    Returns:
+        (estimates, variances)
+    """
+    n = len(z)
+    x_out = np.full(n, np.nan)
+    p_out = np.full(n, np.nan)
+    # plain floats: this loop is the one sequential step
+    info = np.where(np.isfinite(R) & ~np.isnan(z), 1.0 / np.where(R > 0, R, np.inf), 0.0).tolist()
+    zs = np.nan_to_num(z).tolist()
+    x = p = None
+    q = float(process_var)
+    for t in range(n):
+        i = info[t]
+        if x is None:
+            if i:
+                p = 1.0 / i
+                x = zs[t]
+            else:
+                continue
+        else:
+            p += q
+            if i:
+                prior = p
+                p = 1.0 / (1.0 / prior + i)
+                x = p * (x / prior + zs[t] * i)
+        x_out[t] = x
+        p_out[t] = p
+    return x_out, p_out
+
+
+def parameters(df, groups=None, reference=None):
+    """
+    Per quantity: channels, bias, var and process_var (lib/fusion.py's spec).
+
+    Args:
+        groups: {name: columns} (default: temperature, humidity, pressure)
+        reference: {name: reference} for estimate(), per quantity
+    """
+    groups = GROUPS if groups is None else groups
+    reference = reference or {}
+    spec = {}
+    for name, columns in groups.items():
+        columns = [c for c in columns if c in df.columns]
+        if not columns:
+            continue
+        table = estimate(df, columns, reference.get(name))
+        z, R = combine(df[columns].to_numpy(dtype=np.float64), table["bias"].to_numpy(),
+                       table["noise_var"].to_numpy())
+        spec[name] = {"channels": columns, "bias": table["bias"].tolist(),
+                      "var": table["noise_var"].tolist(), "process_var": process_variance(z, R)}
+    return spec
+
+
+def export(path, spec):
+    """Write parameters() for lib/fusion.load()."""
+    with open(path, "w") as f:
+        json.dump(spec, f, indent=1)
+
+
+def _key(df, groups, method, reference, process_var):
+    h = hashlib.blake2b(digest_size=16)
+    columns = sorted({c for cols in groups.values() for c in cols if c in df.columns})
+    h.update(np.ascontiguousarray(df[columns].to_numpy(dtype=np.float64)).view(np.uint8))
+    h.update(repr((columns, sorted(groups.items()), method, process_var)).encode())
+    for name, ref in sorted((reference or {}).items()):
+        h.update(name.encode())
+        h.update(ref.encode() if isinstance(ref, str) else
+                 np.ascontiguousarray(_reference(df, ref)).view(np.uint8))
+    return h.hexdigest()
+
+
+def fuse(df, method="kalman", groups=None, reference=None, process_var=None):
+    """
+    Consensus channel of every quantity, computed once and cached.
+
+    Args:
+        method: "kalman" or "weighted"
+        groups: {name: columns} (default: temperature, humidity, pressure)
+        reference: {name: column / Series} to estimate biases against
+        process_var: {name: variance} overriding the estimated random walk
+
+    Returns:
+        DataFrame indexed like ``df`` (by its Timestamp column, if any):
+        <name> and <name>_std per quantity
+    """
+    if method not in METHODS:
+        raise ValueError("unknown method %r (one of %s)" % (method, ", ".join(METHODS)))
+    groups = GROUPS if groups is None else groups
+    key = _key(df, groups, method, reference, process_var)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key].copy()
+
+    index = pd.DatetimeIndex(df[TIMESTAMP]) if TIMESTAMP in df.columns else df.index
+    out = pd.DataFrame(index=index)
+    for name, spec in parameters(df, groups, reference).items():
+        z, R = combine(df[spec["channels"]].to_numpy(dtype=np.float64), spec["bias"], spec["var"])
+        if method == "kalman":
+            q = (process_var or {}).get(name, spec["process_var"])
+            z, R = kalman(z, R, q)
+        out[name] = z
+        out[name + "_std"] = np.sqrt(R)
+
+    _cache[key] = out
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return out.copy()
@@ -0,0 +1,248 @@
+"""
+NumPy inference for the LSTM regressor of notebook 11, without TensorFlow.
+
+export() writes a trained Keras model (stacked LSTM layers, then Dense
+layers; Dropout is skipped, as at inference) and the MinMaxScaler
+parameters of its inputs and output to one .npz. LSTMRegressor loads it in
+milliseconds and runs the forward pass on a whole batch of windows at once:
+one time step of every window per iteration, all layers advanced together,
+each step a single matrix product per layer ([input, h] @ [kernel;
+recurrent]). It reproduces model.predict() to float32 rounding.
+
+Gates follow Keras (kernel columns i, f, c, o; recurrent activation
+sigmoid, activation tanh by default).
+
+Usage (export once, where TensorFlow is installed):
+    from polysense.analysis.lstm import export
+    export(best_model, "lstm.npz", norm_X=norm_X, norm_y=norm_y, window=WINDOW)
+
+Scoring anywhere:
+    from polysense.analysis.lstm import LSTMRegressor
+    model = LSTMRegressor.load("lstm.npz")
+    temp = model.predict_series(df[["humidity_mean", "pressure_mean"]].to_numpy())
+
+    python -m polysense.analysis.bench_lstm --model lstm.npz --keras best_model.keras
+"""
+
+import numpy as np
+
+from polysense.analysis.windows import windows
+
+BATCH_SIZE = 4096  # windows advanced together (memory ~ batch x units)
+
+
+def _sigmoid(x):
+    # 1 / (1 + exp(-x)) through tanh: no overflow, in place
+    x *= 0.5
+    np.tanh(x, out=x)
+    x *= 0.5
+    x += 0.5
+    return x
+
+
+def _linear(x):
+    return x
+
+
+def _tanh(x):
+    return np.tanh(x, out=x)
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+ACTIVATIONS = {"sigmoid": _sigmoid, "tanh": _tanh, "relu": _relu, "linear": _linear}
+
+
+def _activation(name):
+    if name not in ACTIVATIONS:
+        raise ValueError("unsupported activation %r (one of %s)" % (name, ", ".join(ACTIVATIONS)))
+    return ACTIVATIONS[name]
+
+
+def _name(activation):
+    """Keras activation (function or name) as a name."""
+    name = activation if isinstance(activation, str) else getattr(activation, "__name__", "")
+    return name or "linear"
+
+
+def export(model, path, norm_X=None, norm_y=None, window=None):
+    """
+    Write the weights of a trained Keras model, and its scalers, to ``path``.
+
+    Args:
+        model: Keras model of LSTM, Dropout and Dense layers
+        norm_X, norm_y: Fitted MinMaxScaler of the inputs / the output (optional)
+        window: Time steps per window (default: the model's input length)
+    """
+    arrays = {}
+    kinds = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in ("Dropout", "InputLayer"):
+            continue
+        config = layer.get_config()
+        weights = [np.asarray(w, dtype=np.float32) for w in layer.get_weights()]
+        key = "%d." % len(kinds)
+        if kind == "LSTM":
+            if not config.get("use_bias", True):
+                weights.append(np.zeros(weights[0].shape[1], np.float32))
+            for name, w in zip(("kernel", "recurrent", "bias"), weights):
+                arrays[key + name] = w
+            arrays[key + "activation"] = np.array(_name(config["activation"]))
+            arrays[key + "recurrent_activation"] = np.array(_name(config["recurrent_activation"]))
+            arrays[key + "return_sequences"] = np.array(config["return_sequences"])
+        elif kind == "Dense":
+            if not config.get("use_bias", True):
+                weights.append(np.zeros(weights[0].shape[1], np.float32))
+            arrays[key + "kernel"], arrays[key + "bias"] = weights
+            arrays[key + "activation"] = np.array(_name(config["activation"]))
+        else:
+            raise ValueError("unsupported layer %s (%s)" % (layer.name, kind))
+        kinds.append(kind.lower())
+    arrays["kinds"] = np.array(kinds)
+    if window is None:
+        window = model.input_shape[1]
+    if window is not None:
+        arrays["window"] = np.array(window)
+    for prefix, scaler in (("x", norm_X), ("y", norm_y)):
+        if scaler is not None:
+            # MinMaxScaler: scaled = raw * scale_ + min_
+            arrays[prefix + "_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+            arrays[prefix + "_min"] = np.asarray(scaler.min_, dtype=np.float64)
+    np.savez_compressed(path, **arrays)
+
+
+class _LSTMLayer:
+    def __init__(self, kernel, recurrent, bias, activation, recurrent_activation):
+        units = recurrent.shape[0]
+        # gate columns reordered i, f, o, c so one call applies the recurrent activation
+        order = np.r_[0:2 * units, 3 * units:4 * units, 2 * units:3 * units]
+        self.units = units
+        self.inputs = kernel.shape[0]
+        self.weights = np.ascontiguousarray(np.vstack((kernel, recurrent))[:, order], np.float32)
+        self.bias = np.ascontiguousarray(bias[order], np.float32)
+        self.activation = _activation(activation)
+        self.recurrent_activation = _activation(recurrent_activation)
+
+
+class LSTMRegressor:
+    """
+    Stacked LSTM + Dense forward pass.
+
+    Args:
+        lstm: _LSTMLayer list (all but the last return sequences)
+        dense: (kernel, bias, activation) list
+        window: Time steps per window, if known
+        x_scale, x_min, y_scale, y_min: MinMaxScaler parameters, if known
+    """
+
+    def __init__(self, lstm, dense, window=None, x_scale=None, x_min=None, y_scale=None,
+                 y_min=None):
+        self.lstm = lstm
+        self.dense = dense
+        self.window = window
+        self.x_scale, self.x_min = x_scale, x_min
+        self.y_scale, self.y_min = y_scale, y_min
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            lstm, dense = [], []
+            for i, kind in enumerate(f["kinds"].tolist()):
+                key = "%d." % i
+                if kind == "lstm":
+                    if dense:
+                        raise ValueError("%s: LSTM after Dense" % path)
+                    if lstm and not lstm[-1][1]:
+                        raise ValueError("%s: LSTM after one that returns a single state" % path)
+                    layer = _LSTMLayer(f[key + "kernel"], f[key + "recurrent"], f[key + "bias"],
+                                       str(f[key + "activation"]),
+                                       str(f[key + "recurrent_activation"]))
+                    lstm.append((layer, bool(f[key + "return_sequences"])))
+                else:
+                    dense.append((f[key + "kernel"].astype(np.float32),
+                                  f[key + "bias"].astype(np.float32),
+                                  _activation(str(f[key + "activation"]))))
+            if not lstm or lstm[-1][1]:
+                raise ValueError("%s: expected LSTM layers ending in a single state" % path)
+            extra = {name: f[name] for name in ("x_scale", "x_min", "y_scale", "y_min")
+                     if name in f.files}
+            window = int(f["window"]) if "window" in f.files else None
+        return cls([layer for layer, _ in lstm], dense, window, **extra)
+
+    def _forward(self, x):
+        """Outputs of a batch of scaled windows (batch, steps, features)."""
+        n, steps, features = x.shape
+        # per layer: [input, h] side by side, so a step is one product
+        state = [np.zeros((n, layer.inputs + layer.units), np.float32) for layer in self.lstm]
+        cells = [np.zeros((n, layer.units), np.float32) for layer in self.lstm]
+        gates = [np.empty((n, 4 * layer.units), np.float32) for layer in self.lstm]
+        scratch = [np.empty((n, layer.units), np.float32) for layer in self.lstm]
+        for t in range(steps):
+            state[0][:, :features] = x[:, t, :]
+            for j, layer in enumerate(self.lstm):
+                u = layer.units
+                z = gates[j]
+                np.matmul(state[j], layer.weights, out=z)
+                z += layer.bias
+                layer.recurrent_activation(z[:, :3 * u])
+                layer.activation(z[:, 3 * u:])
+                c, tmp = cells[j], scratch[j]
+                c *= z[:, u:2 * u]                                   # forget
+                np.multiply(z[:, :u], z[:, 3 * u:], out=tmp)         # input * candidate
+                c += tmp
+                np.copyto(tmp, c)
+                layer.activation(tmp)
+                tmp *= z[:, 2 * u:3 * u]                             # output gate
+                h = state[j][:, layer.inputs:]
+                h[...] = tmp
+                if j + 1 < len(self.lstm):
+                    state[j + 1][:, :u] = tmp
+        y = state[-1][:, self.lstm[-1].inputs:]
+        for kernel, bias, activation in self.dense:
+            y = activation(y @ kernel + bias)
+        return y
+
+    def predict(self, x, batch_size=BATCH_SIZE):
+        """
+        model.predict() of scaled windows.
+
+        Args:
+            x: (windows, steps, features), e.g. a windows() view
+
+        Returns:
+            (windows, outputs) float32, scaled as the model's targets
+        """
+        x = np.asarray(x) if not isinstance(x, np.ndarray) else x
+        if not len(x):
+            return np.empty((0, self.dense[-1][0].shape[1] if self.dense else self.lstm[-1].units),
+                            np.float32)
+        return np.concatenate([self._forward(x[a:a + batch_size].astype(np.float32, copy=False))
+                               for a in range(0, len(x), batch_size)])
+
+    def predict_series(self, X, window=None, batch_size=BATCH_SIZE, scaled=False):
+        """
+        Predictions for every window of a series, in the output's units.
+
+        Args:
+            X: (rows, features) inputs; raw units (scaled with the exported
+               scaler) unless ``scaled``
+            window: Steps per window (default: the exported one)
+
+        Returns:
+            (rows - window, outputs): the target after each window, i.e.
+            rows window .. rows - 1, as notebook 11's y_test_seq
+        """
+        window = window or self.window
+        if window is None:
+            raise ValueError("window unknown: pass window=")
+        X = np.asarray(X, dtype=np.float32)
+        if not scaled and self.x_scale is not None:
+            X = (X * self.x_scale + self.x_min).astype(np.float32)
+        # the last window has no target row after it; leave it out as windows() does
+        y = self.predict(windows(X, None, window)[0], batch_size)
+        if not scaled and self.y_scale is not None:
+            y = (y - self.y_min) / self.y_scale
+        return y
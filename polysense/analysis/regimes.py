@@ -0,0 +1,250 @@
+"""
+Weather-regime assignment from a saved cluster model, without refitting.
+
+export() writes the fitted StandardScaler and GaussianMixture or KMeans of
+notebooks 09 / 10 to a small .npz. RegimeModel loads it and assigns
+regimes to new rows:
+
+    GMM      highest posterior: every component's Mahalanobis term comes
+             from one product with the stacked precision Cholesky factors
+             (features x components*features), for a batch or a single row
+    KMeans   nearest centroid, from one product with the centroids
+
+update() moves the model with the data (mini-batch k-means / a stochastic
+EM step on the GMM means and weights; covariances stay fixed); ``decay``
+sets how quickly old data is forgotten. drift() compares a batch with the
+training data summarised at export (mean fit score, regime proportions and
+how far the centroids have moved), and needs_refit() turns that into a
+yes / no, so the notebooks only re-cluster when the data has moved away.
+
+Usage:
+    from polysense.analysis.regimes import export, RegimeModel
+    export("regimes_gmm.npz", scaler, gmm, features_cols, X=df_features)   # notebook 09
+    model = RegimeModel.load("regimes_gmm.npz")
+    month["regime"] = model.predict(month[model.features])
+    if model.needs_refit(month[model.features]):
+        ...
+"""
+
+import numpy as np
+
+KINDS = ("gmm", "kmeans")
+DECAY = 0.99           # weight kept by the past at each update()
+PSI_LIMIT = 0.25       # population stability index of the regime shares
+SCORE_LIMIT = 1.0      # change of the mean fit score (log-likelihood / distance^2)
+SHIFT_LIMIT = 0.5      # centroid movement since export, in standard deviations
+
+_LOG_2PI = np.log(2 * np.pi)
+
+
+def _precision_cholesky(gmm):
+    """Per-component precision Cholesky factors (k, d, d) for any covariance type."""
+    factors = np.asarray(gmm.precisions_cholesky_, dtype=np.float64)
+    k, d = gmm.means_.shape
+    kind = gmm.covariance_type
+    if kind == "full":
+        return factors
+    if kind == "tied":
+        return np.broadcast_to(factors, (k, d, d)).copy()
+    if kind == "diag":
+        return factors[:, :, None] * np.eye(d)
+    if kind == "spherical":
+        return factors[:, None, None] * np.eye(d)
+    raise ValueError("unknown covariance type %r" % kind)
+
+
+def export(path, scaler, model, features=None, X=None):
+    """
+    Write a fitted scaler and cluster model to ``path``.
+
+    Args:
+        scaler: Fitted StandardScaler (mean_, scale_)
+        model: Fitted GaussianMixture or KMeans
+        features: Column names, in the scaler's order
+        X: Training rows (raw units): their fit score and regime shares are
+            stored as the reference for drift()
+    """
+    arrays = {"mean": np.asarray(scaler.mean_, np.float64),
+              "scale": np.asarray(scaler.scale_, np.float64)}
+    if hasattr(model, "means_"):
+        arrays.update(kind=np.array("gmm"), centers=np.asarray(model.means_, np.float64),
+                      weights=np.asarray(model.weights_, np.float64),
+                      precision_cholesky=_precision_cholesky(model))
+    elif hasattr(model, "cluster_centers_"):
+        arrays.update(kind=np.array("kmeans"),
+                      centers=np.asarray(model.cluster_centers_, np.float64))
+    else:
+        raise ValueError("expected a fitted GaussianMixture or KMeans")
+    if features is not None:
+        arrays["features"] = np.array(list(features))
+    if X is not None:
+        regimes = RegimeModel(**{k: (v.item() if v.ndim == 0 else v) for k, v in arrays.items()})
+        labels, score = regimes._assign(regimes.scale_rows(X))
+        arrays["reference_score"] = np.array(score.mean())
+        arrays["reference_shares"] = np.bincount(labels, minlength=len(regimes.centers)) / len(labels)
+        arrays["counts"] = arrays["reference_shares"] * len(labels)
+    np.savez_compressed(path, **arrays)
+
+
+class RegimeModel:
+    """
+    A saved scaler + GMM / KMeans.
+
+    Args:
+        kind: "gmm" or "kmeans"
+        mean, scale: StandardScaler parameters
+        centers: (regimes, features) in scaled units
+        weights, precision_cholesky: GMM mixture weights and factors
+        features: Column names
+        counts: Rows behind each centroid (the mini-batch learning rate)
+        reference_centers: Centroids at export (default: ``centers``)
+        reference_score, reference_shares: Summary of the training rows
+    """
+
+    def __init__(self, kind, mean, scale, centers, weights=None, precision_cholesky=None,
+                 features=None, counts=None, reference_centers=None, reference_score=None,
+                 reference_shares=None):
+        if kind not in KINDS:
+            raise ValueError("unknown model kind %r (one of %s)" % (kind, ", ".join(KINDS)))
+        self.kind = kind
+        self.mean = np.asarray(mean, np.float64)
+        self.scale = np.asarray(scale, np.float64)
+        self.centers = np.array(centers, np.float64)
+        self.reference_centers = self.centers.copy() if reference_centers is None else \
+            np.asarray(reference_centers, np.float64)
+        self.weights = None if weights is None else np.array(weights, np.float64)
+        self.features = None if features is None else [str(f) for f in features]
+        k, d = self.centers.shape
+        self.counts = np.ones(k) if counts is None else np.array(counts, np.float64)
+        self.reference_score = None if reference_score is None else float(reference_score)
+        self.reference_shares = reference_shares
+        if kind == "gmm":
+            factors = np.asarray(precision_cholesky, np.float64)
+            self.precision_cholesky = factors
+            # all components in one product: z @ stacked - offsets -> (k, d) per row
+            self._stacked = np.ascontiguousarray(factors.transpose(1, 0, 2).reshape(d, k * d))
+            self._log_det = np.log(np.diagonal(factors, axis1=1, axis2=2)).sum(axis=1)
+        self._refresh()
+
+    def _refresh(self):
+        k, d = self.centers.shape
+        if self.kind == "gmm":
+            self._offsets = np.einsum("kd,kde->ke", self.centers, self.precision_cholesky).ravel()
+            self._constant = np.log(self.weights) + self._log_det - 0.5 * d * _LOG_2PI
+        else:
+            self._norms = (self.centers ** 2).sum(axis=1)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            args = {name: (f[name].item() if f[name].ndim == 0 else f[name]) for name in f.files}
+        return cls(**args)
+
+    def save(self, path):
+        """Write the (updated) model; the drift reference is kept."""
+        arrays = {"kind": np.array(self.kind), "mean": self.mean, "scale": self.scale,
+                  "centers": self.centers, "counts": self.counts,
+                  "reference_centers": self.reference_centers}
+        if self.kind == "gmm":
+            arrays.update(weights=self.weights, precision_cholesky=self.precision_cholesky)
+        if self.features is not None:
+            arrays["features"] = np.array(self.features)
+        if self.reference_score is not None:
+            arrays["reference_score"] = np.array(self.reference_score)
+            arrays["reference_shares"] = np.asarray(self.reference_shares)
+        np.savez_compressed(path, **arrays)
+
+    # --- assignment ---
+    def scale_rows(self, X):
+        """Rows (DataFrame with the model's features, or array) standardised."""
+        if hasattr(X, "columns") and self.features is not None:
+            X = X[self.features]
+        X = np.asarray(X, dtype=np.float64)
+        return (X.reshape(-1, len(self.mean)) - self.mean) / self.scale
+
+    def _log_components(self, Z):
+        """log(weight * density) of every component, (rows, k)."""
+        k, d = self.centers.shape
+        y = Z @ self._stacked - self._offsets
+        return self._constant - 0.5 * (y * y).reshape(len(Z), k, d).sum(axis=2)
+
+    def _distances(self, Z):
+        """Squared distances to every centroid, (rows, k)."""
+        return np.maximum((Z * Z).sum(axis=1)[:, None] - 2 * Z @ self.centers.T + self._norms, 0)
+
+    def _assign(self, Z):
+        """(labels, per-row score): log-likelihood (GMM) or squared distance (KMeans)."""
+        if self.kind == "gmm":
+            log = self._log_components(Z)
+            top = log.max(axis=1)
+            return log.argmax(axis=1), top + np.log(np.exp(log - top[:, None]).sum(axis=1))
+        d2 = self._distances(Z)
+        labels = d2.argmin(axis=1)
+        return labels, d2[np.arange(len(Z)), labels]
+
+    def predict(self, X):
+        """Regime of each row (one row: a scalar)."""
+        labels = self._assign(self.scale_rows(X))[0]
+        return labels if np.ndim(X) > 1 else int(labels[0])
+
+    def predict_proba(self, X):
+        """Posterior of each regime (GMM), (rows, regimes)."""
+        if self.kind != "gmm":
+            raise ValueError("probabilities need a GMM")
+        log = self._log_components(self.scale_rows(X))
+        log -= log.max(axis=1, keepdims=True)
+        p = np.exp(log)
+        return p / p.sum(axis=1, keepdims=True)
+
+    # --- adaptation and drift ---
+    def update(self, X, decay=DECAY):
+        """
+        Move the centroids (and GMM weights) towards a batch of rows.
+
+        Each centroid moves by its share of the batch over the rows behind
+        it, the latter multiplied by ``decay`` first (1: never forget).
+        """
+        Z = self.scale_rows(X)
+        if not len(Z):
+            return self
+        k = len(self.centers)
+        if self.kind == "gmm":
+            resp = self.predict_proba(X)
+        else:
+            resp = np.zeros((len(Z), k))
+            resp[np.arange(len(Z)), self._assign(Z)[0]] = 1
+        mass = resp.sum(axis=0)
+        self.counts = self.counts * decay + mass
+        self.centers += (resp.T @ Z - mass[:, None] * self.centers) / self.counts[:, None]
+        if self.kind == "gmm":
+            self.weights = self.counts / self.counts.sum()
+        self._refresh()
+        return self
+
+    def drift(self, X):
+        """
+        How a batch of rows compares with the training data.
+
+        Returns:
+            dict: score (mean log-likelihood, GMM, or squared distance,
+            KMeans), score_change (against the training mean; positive is
+            worse), psi (population stability index of the regime shares),
+            shares, shift (largest centroid movement since export, in
+            standard deviations)
+        """
+        labels, score = self._assign(self.scale_rows(X))
+        shares = np.bincount(labels, minlength=len(self.centers)) / max(len(labels), 1)
+        out = {"score": float(score.mean()) if len(score) else np.nan, "shares": shares,
+               "shift": float(np.sqrt(((self.centers - self.reference_centers) ** 2).sum(1)).max())}
+        if self.reference_score is not None:
+            change = out["score"] - self.reference_score
+            out["score_change"] = -change if self.kind == "gmm" else change
+            p = np.clip(shares, 1e-4, None)
+            q = np.clip(self.reference_shares, 1e-4, None)
+            out["psi"] = float(((p - q) * np.log(p / q)).sum())
+        return out
+
+    def needs_refit(self, X, psi=PSI_LIMIT, score=SCORE_LIMIT, shift=SHIFT_LIMIT):
+        """Whether drift() of ``X`` passes any of the limits."""
+        d = self.drift(X)
+        return bool(d["shift"] > shift or d.get("psi", 0) > psi or d.get("score_change", 0) > score)
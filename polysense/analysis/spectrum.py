@@ -0,0 +1,219 @@
+"""
+Spectra of all sensors at once, with gaps handled.
+
+Every function takes the channel matrix (rows, channels) and returns one
+spectrum per column:
+
+    amplitude     one-sided |rfft| / n of each whole column, missing rows set
+                  to the column mean (notebook 13's magnitude plots)
+    welch         Welch PSD: the average periodogram of overlapping, windowed
+                  segments (as scipy.signal.welch), batched over segments and
+                  channels; a segment with more than ``max_gap`` of a
+                  channel's rows missing is left out of that channel's average,
+                  so gaps cost segments, not the whole spectrum, and a year of
+                  data is many short FFTs instead of one giant one
+    lomb_scargle  Lomb-Scargle periodogram of irregularly sampled rows (each
+                  channel at its own valid timestamps), O(rows x frequencies)
+
+dominant() tabulates the strongest periods of every channel from any of
+the three.
+
+Usage:
+    from polysense.analysis.spectrum import dominant, welch
+    dominant(df, TEMPERATURE)                        # period_h of the daily cycle
+    freqs, psd, segments = welch(df[HUMIDITY].to_numpy(), window="hamming")
+"""
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.schema import TIMESTAMP
+
+TIMESTEP = 30                # seconds between rows
+SEGMENT = 4 * 24 * 120       # Welch segment: four days of 30 s rows
+WINDOWS = ("hann", "hamming", "blackman", "bartlett", "boxcar")
+METHODS = ("welch", "fft", "lombscargle")
+BATCH = 2 ** 22              # values per block of segments / frequencies
+
+
+def _window(name, n):
+    """Periodic window of ``n`` points (as scipy.signal.get_window)."""
+    if name not in WINDOWS:
+        raise ValueError("unknown window %r (one of %s)" % (name, ", ".join(WINDOWS)))
+    if name == "boxcar":
+        return np.ones(n)
+    return getattr(np, "hanning" if name == "hann" else name)(n + 1)[:-1]
+
+
+def _matrix(X):
+    X = np.asarray(X, dtype=np.float64)
+    return X[:, None] if X.ndim == 1 else X
+
+
+def amplitude(X, timestep=TIMESTEP):
+    """
+    One-sided amplitude spectrum of each whole column.
+
+    Returns:
+        (frequencies in Hz, (frequencies, channels) |rfft| / rows)
+    """
+    X = _matrix(X)
+    n = len(X)
+    mean = np.nanmean(X, axis=0) if n else np.zeros(X.shape[1])
+    filled = np.where(np.isnan(X), mean, X)
+    return np.fft.rfftfreq(n, d=timestep), np.abs(np.fft.rfft(filled, axis=0)) / n
+
+
+def welch(X, timestep=TIMESTEP, segment=SEGMENT, overlap=0.5, window="hann",
+          max_gap=0.0, detrend=True):
+    """
+    Welch power spectral density of each column.
+
+    Args:
+        X: (rows, channels) samples at a regular ``timestep`` (NaN: missing)
+        segment: Rows per segment (frequency resolution 1 / (segment * timestep))
+        overlap: Fraction of a segment shared with the next
+        window: One of WINDOWS
+        max_gap: Largest fraction of missing rows a segment may have; missing
+            rows of a kept segment are set to its mean
+        detrend: Remove each segment's mean first
+
+    Returns:
+        (frequencies in Hz, (frequencies, channels) PSD in units^2 / Hz,
+        segments averaged per channel); a channel with no usable segment is NaN
+    """
+    X = _matrix(X)
+    n, channels = X.shape
+    segment = min(segment, n)
+    step = max(1, int(round(segment * (1 - overlap))))
+    w = _window(window, segment)
+    scale = 1.0 / ((1.0 / timestep) * (w * w).sum())
+    freqs = np.fft.rfftfreq(segment, d=timestep)
+    total = np.zeros((len(freqs), channels))
+    used = np.zeros(channels, dtype=np.int64)
+    if segment:
+        views = np.lib.stride_tricks.sliding_window_view(X, segment, axis=0)[::step]  # (k, ch, seg)
+        per = max(1, BATCH // (segment * channels))
+        for a in range(0, len(views), per):
+            block = np.array(views[a:a + per])
+            missing = np.isnan(block)
+            keep = missing.mean(axis=2) <= max_gap                          # (k, ch)
+            with np.errstate(invalid="ignore"):
+                mean = np.nanmean(np.where(keep[..., None], block, 0.0), axis=2, keepdims=True)
+            block = np.where(missing, mean, block)
+            if detrend:
+                block -= mean
+            block *= w
+            power = np.abs(np.fft.rfft(block, axis=2)) ** 2                # (k, ch, f)
+            power[~keep] = 0
+            total += power.sum(axis=0).T
+            used += keep.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        psd = total * scale / used
+    # one-sided: double every bin but DC and (even segments) Nyquist
+    psd[1:len(freqs) - (segment % 2 == 0)] *= 2
+    return freqs, psd, used
+
+
+def lomb_scargle(t, X, freqs):
+    """
+    Lomb-Scargle periodogram of each column at its own valid samples.
+
+    Args:
+        t: (rows,) sample times in seconds, in any spacing
+        X: (rows, channels) values (NaN: missing)
+        freqs: Frequencies in Hz
+
+    Returns:
+        (frequencies, channels) power, in units^2 (scipy.signal.lombscargle of
+        the mean-removed samples, at angular frequencies 2 pi f)
+    """
+    t = np.asarray(t, dtype=np.float64)
+    X = _matrix(X)
+    freqs = np.asarray(freqs, dtype=np.float64)
+    power = np.full((len(freqs), X.shape[1]), np.nan)
+    for j in range(X.shape[1]):
+        valid = ~np.isnan(X[:, j])
+        tj = t[valid] - t[valid].mean() if valid.any() else t[valid]
+        y = X[valid, j] - X[valid, j].mean() if valid.any() else X[valid, j]
+        if len(y) < 2:
+            continue
+        per = max(1, BATCH // len(y))
+        for a in range(0, len(freqs), per):
+            w = 2 * np.pi * freqs[a:a + per, None]
+            tau = np.arctan2(np.sin(2 * w * tj).sum(1), np.cos(2 * w * tj).sum(1)) / (2 * w[:, 0])
+            phase = w * (tj - tau[:, None])
+            c, s = np.cos(phase), np.sin(phase)
+            power[a:a + per, j] = 0.5 * ((c @ y) ** 2 / (c * c).sum(1) + (s @ y) ** 2 / (s * s).sum(1))
+    return power
+
+
+def _seconds(data, timestep):
+    if TIMESTAMP in data.columns:
+        stamps = pd.DatetimeIndex(data[TIMESTAMP])
+    elif isinstance(data.index, pd.DatetimeIndex):
+        stamps = data.index
+    else:
+        return np.arange(len(data)) * float(timestep)
+    return (stamps - stamps[0]).total_seconds().to_numpy()
+
+
+def dominant(data, columns=None, timestep=TIMESTEP, method="welch", top=1, min_period=None,
+             max_period=None, freqs=None, **kwargs):
+    """
+    Strongest periods of every channel, in one table.
+
+    Args:
+        data: DataFrame; Lomb-Scargle takes its times from the Timestamp
+            column (or DatetimeIndex), the others assume ``timestep``
+        columns: Channels (default: all numeric ones)
+        method: "welch", "fft" (amplitude()) or "lombscargle"
+        top: Peaks (local maxima) per channel
+        min_period, max_period: Period range searched, in seconds
+        freqs: Lomb-Scargle frequencies in Hz (default: 2000 log-spaced from
+            one cycle per record to the Nyquist frequency)
+        **kwargs: Passed to welch()
+
+    Returns:
+        DataFrame (channel, rank): frequency_hz, period_h, power (PSD for
+        Welch, amplitude for FFT, periodogram for Lomb-Scargle)
+    """
+    if method not in METHODS:
+        raise ValueError("unknown method %r (one of %s)" % (method, ", ".join(METHODS)))
+    if columns is None:
+        columns = [c for c in data.columns if c != TIMESTAMP and pd.api.types.is_numeric_dtype(data[c])]
+    columns = list(columns)
+    X = data[columns].to_numpy(dtype=np.float64)
+    if method == "welch":
+        freqs, power, _ = welch(X, timestep, **kwargs)
+    elif method == "fft":
+        freqs, power = amplitude(X, timestep)
+    else:
+        t = _seconds(data, timestep)
+        if freqs is None:
+            span = t[-1] - t[0] if len(t) > 1 else timestep
+            freqs = np.geomspace(1.0 / span, 0.5 / np.median(np.diff(t)) if len(t) > 1
+                                 else 0.5 / timestep, 2000)
+        freqs = np.asarray(freqs, dtype=np.float64)
+        power = lomb_scargle(t, X, freqs)
+
+    searched = freqs > 0
+    if min_period:
+        searched &= freqs <= 1.0 / min_period
+    if max_period:
+        searched &= freqs >= 1.0 / max_period
+    power = np.where(searched[:, None] & ~np.isnan(power), power, -np.inf)
+    # local maxima only, so the bins beside a peak do not rank after it
+    left = np.vstack((np.full((1, power.shape[1]), -np.inf), power[:-1]))
+    right = np.vstack((power[1:], np.full((1, power.shape[1]), -np.inf)))
+    peaks = np.where((power > left) & (power >= right), power, -np.inf)
+    order = np.argsort(-peaks, axis=0, kind="stable")[:top]                # (top, ch)
+    rows = []
+    for j, column in enumerate(columns):
+        for rank, i in enumerate(order[:, j], 1):
+            found = np.isfinite(peaks[i, j])
+            rows.append({"channel": column, "rank": rank,
+                         "frequency_hz": freqs[i] if found else np.nan,
+                         "period_h": 1.0 / freqs[i] / 3600 if found else np.nan,
+                         "power": power[i, j] if found else np.nan})
+    return pd.DataFrame(rows).set_index(["channel", "rank"])
@@ -0,0 +1,290 @@
+"""
+Out-of-core summary statistics of datalogger logs.
+
+A Summary is built chunk by chunk and two Summaries of disjoint data merge
+into the Summary of their union, so a log of any length is summarised in
+bounded memory and the chunks can be processed in parallel:
+
+    count, missing, mean, std, min, max   exact (mergeable moments, Chan et al.)
+    median, quantiles                     approximate (merging t-digest), with
+                                          exact extremes and tail quantiles
+                                          far more accurate than the median
+
+summarize() splits CSV logs into byte ranges at row boundaries and
+summarises them in worker processes; a DataFrame (e.g. a memory-mapped
+load()) is split into row slices summarised in threads.
+
+Usage:
+    from polysense.analysis.stats import summarize
+    s = summarize(["station_a/datalog_final.csv", "station_b/datalog_final.csv"])
+    s.describe()                 # as DataFrame.describe()
+    s.table(TEMPERATURE)         # Mean / Median / Std Dev / Min / Max per sensor
+    s.missing_pct()
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.ingest import parse_rows
+
+DELTA = 1000            # t-digest compression: at most ~DELTA/2 centroids
+CHUNK_BYTES = 32 << 20  # CSV bytes parsed at once by a worker
+CHUNK_ROWS = 1 << 18    # rows of a DataFrame summarised at once
+
+
+class TDigest:
+    """
+    Merging t-digest of one variable (Dunning & Ertl, arcsine scale).
+
+    Centroids are regrouped so that each spans at most one unit of
+    k(q) = delta / (2 pi) * asin(2q - 1): tiny near q = 0 and 1, widest
+    at the median.
+    """
+
+    def __init__(self, delta=DELTA):
+        self.delta = delta
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._absorb(values, np.ones(len(values)))
+        return self
+
+    def merge(self, other):
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._absorb(other.means, other.weights)
+        return self
+
+    def _absorb(self, means, weights):
+        m = np.concatenate((self.means, means))
+        w = np.concatenate((self.weights, weights))
+        order = np.argsort(m, kind="stable")
+        m, w = m[order], w[order]
+        cum = np.cumsum(w)
+        left = (cum - w) / cum[-1]
+        k = self.delta / (2 * np.pi) * np.arcsin(np.clip(2 * left - 1, -1, 1))
+        group = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.diff(group, prepend=-1))
+        self.weights = np.add.reduceat(w, starts)
+        self.means = np.add.reduceat(m * w, starts) / self.weights
+
+    def quantile(self, q):
+        """Estimated quantile(s) ``q`` in [0, 1] (NaN when empty)."""
+        q = np.asarray(q, dtype=np.float64)
+        if not len(self.means):
+            return np.full(q.shape, np.nan)
+        # rank of each centroid's middle on pandas' 0 .. n-1 scale, so that
+        # a digest of singletons interpolates exactly like DataFrame.quantile
+        cum = np.cumsum(self.weights)
+        centers = cum - (self.weights + 1) / 2
+        x = np.concatenate(([0.0], centers, [cum[-1] - 1]))
+        y = np.concatenate(([self.min], self.means, [self.max]))
+        return np.interp(q * (cum[-1] - 1), x, y)
+
+
+class Summary:
+    """
+    Mergeable summary of the float columns of a log.
+
+    Args:
+        columns: Column names
+        delta: t-digest compression (accuracy of the quantiles)
+        quantiles: Keep t-digests (False: moments only, cheaper)
+    """
+
+    def __init__(self, columns, delta=DELTA, quantiles=True):
+        self.columns = list(columns)
+        n = len(self.columns)
+        self.rows = 0
+        self.count = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.digests = [TDigest(delta) for _ in range(n)] if quantiles else None
+
+    def update(self, values):
+        """Add rows: a DataFrame with these columns, or a (rows, columns) array."""
+        if isinstance(values, pd.DataFrame):
+            values = values[self.columns].to_numpy(dtype=np.float64)
+        else:
+            values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return self
+        present = ~np.isnan(values)
+        count = present.sum(axis=0).astype(np.float64)
+        safe = np.where(present, values, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = safe.sum(axis=0) / count
+            m2 = (np.where(present, values - mean, 0.0) ** 2).sum(axis=0)
+        lo = np.where(present, values, np.inf).min(axis=0)
+        hi = np.where(present, values, -np.inf).max(axis=0)
+        self._combine(len(values), count, np.nan_to_num(mean), m2, lo, hi)
+        if self.digests is not None:
+            for i, digest in enumerate(self.digests):
+                digest.update(values[:, i])
+        return self
+
+    def merge(self, other):
+        """Add another Summary of the same columns (disjoint rows)."""
+        if other.columns != self.columns:
+            raise ValueError("summaries of different columns")
+        self._combine(other.rows, other.count, other.mean, other.m2, other.min, other.max)
+        if self.digests is not None and other.digests is not None:
+            for mine, theirs in zip(self.digests, other.digests):
+                mine.merge(theirs)
+        elif other.digests is None:
+            self.digests = None
+        return self
+
+    def _combine(self, rows, count, mean, m2, lo, hi):
+        total = self.count + count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * count / total, 0.0)
+            self.m2 = self.m2 + m2 + np.where(total > 0, delta ** 2 * self.count * count / total, 0.0)
+        self.count = total
+        self.rows += rows
+        self.min = np.minimum(self.min, lo)
+        self.max = np.maximum(self.max, hi)
+
+    # --- results ---
+    def _series(self, values, name=None):
+        return pd.Series(values, index=self.columns, name=name)
+
+    def std(self, ddof=1):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+        return self._series(np.sqrt(var))
+
+    def quantile(self, q):
+        """Quantile ``q`` per column (approximate), as DataFrame.quantile(q)."""
+        if self.digests is None:
+            raise ValueError("summary built without quantiles")
+        values = [d.quantile(q) for d in self.digests]
+        if np.ndim(q) == 0:
+            return self._series(np.array(values, dtype=np.float64), q)
+        return pd.DataFrame(np.array(values).T, index=list(q), columns=self.columns)
+
+    def missing_pct(self):
+        """Percentage of rows without a value, per column."""
+        return self._series(100 * (self.rows - self.count) / max(self.rows, 1))
+
+    def describe(self, percentiles=(0.25, 0.5, 0.75)):
+        """The table of DataFrame.describe()."""
+        empty = self.count == 0
+        rows = {"count": self.count,
+                "mean": np.where(empty, np.nan, self.mean),
+                "std": self.std().to_numpy(),
+                "min": np.where(empty, np.nan, self.min)}
+        if self.digests is not None:
+            for p in percentiles:
+                rows["%g%%" % (100 * p)] = [float(d.quantile(p)) for d in self.digests]
+        rows["max"] = np.where(empty, np.nan, self.max)
+        return pd.DataFrame(rows, index=self.columns).T
+
+    def table(self, columns=None, unit=None):
+        """Mean / Median / Std Dev / Min / Max per sensor, as the notebooks print it."""
+        d = self.describe(percentiles=(0.5,)).T
+        d = d.loc[columns] if columns is not None else d
+        suffix = " (%s)" % unit if unit else ""
+        out = pd.DataFrame({"Mean" + suffix: d["mean"], "Median" + suffix: d["50%"],
+                            "Std Dev" + suffix: d["std"], "Min" + suffix: d["min"],
+                            "Max" + suffix: d["max"]})
+        out.index.name = "Sensor"
+        return out
+
+
+# --- chunked, parallel sources ---
+
+def _ranges(path, chunk_bytes):
+    """(start, stop) byte ranges of ``path`` split at row boundaries, and its columns."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        cuts = [len(header)]
+        while cuts[-1] + chunk_bytes < size:
+            f.seek(cuts[-1] + chunk_bytes)
+            f.readline()
+            cuts.append(f.tell())
+    cuts.append(size)
+    columns = header.decode().rstrip("\r\n").split(",")[1:]
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a], columns
+
+
+def _summarize_range(path, start, stop, header, columns, delta, quantiles):
+    with open(path, "rb") as f:
+        f.seek(start)
+        chunk = f.read(stop - start)
+    if not chunk.endswith(b"\n"):
+        chunk += b"\n"
+    values, _, _ = parse_rows(chunk, header)
+    keep = [header.index(c) for c in columns]
+    return Summary(columns, delta, quantiles).update(values[:, keep])
+
+
+def _summarize_rows(frame, start, stop, columns, delta, quantiles):
+    return Summary(columns, delta, quantiles).update(frame.iloc[start:stop])
+
+
+def summarize(source, columns=None, workers=None, delta=DELTA, quantiles=True,
+              chunk_bytes=CHUNK_BYTES, chunk_rows=CHUNK_ROWS):
+    """
+    Summary of one or more logs, computed in chunks and merged.
+
+    Args:
+        source: CSV path, list of CSV paths (stations, months), or a DataFrame
+        columns: Columns to summarise (default: all columns of the first log)
+        workers: Parallel workers (default: CPU count; 1 runs inline)
+        delta, quantiles: As for Summary
+        chunk_bytes, chunk_rows: Chunk size, i.e. the memory bound per worker
+
+    Returns:
+        Summary
+    """
+    workers = workers or os.cpu_count() or 1
+    if isinstance(source, pd.DataFrame):
+        columns = list(source.columns if columns is None else columns)
+        jobs = [(_summarize_rows, source, a, min(a + chunk_rows, len(source)), columns)
+                for a in range(0, len(source), chunk_rows)]
+        pool = ThreadPoolExecutor
+    else:
+        paths = [source] if isinstance(source, (str, os.PathLike)) else list(source)
+        jobs = []
+        for path in paths:
+            ranges, header = _ranges(path, chunk_bytes)
+            if columns is None:
+                columns = header
+            missing = [c for c in columns if c not in header]
+            if missing:
+                raise KeyError("%s: no column %s" % (path, ", ".join(missing)))
+            jobs += [(_summarize_range, path, a, b, header, list(columns)) for a, b in ranges]
+        pool = ProcessPoolExecutor
+
+    total = Summary(columns or [], delta, quantiles)
+    if workers == 1 or len(jobs) <= 1:
+        for fn, *args in jobs:
+            total.merge(fn(*args, delta, quantiles))
+        return total
+    with pool(max_workers=workers) as executor:
+        futures = [executor.submit(fn, *args, delta, quantiles) for fn, *args in jobs]
+        for future in futures:
+            total.merge(future.result())
+    return total
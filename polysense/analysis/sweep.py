@@ -0,0 +1,255 @@
+"""
+Model-selection sweeps of KMeans / GaussianMixture over the number of clusters.
+
+Notebooks 09 and 10 fit every k with n_init=10 in a serial loop and score
+each with silhouette_score, which is O(n^2). sweep() instead:
+
+    - runs the (k, init) grid in a process pool, the scaled features
+      shared between the workers (multiprocessing.shared_memory), not
+      pickled to each job
+    - warm-starts every init: it is first fitted on a random subsample of
+      ``warm_size`` rows, then refined on all rows from that solution, so
+      most iterations cost a subsample and the full data needs a few
+    - keeps the best init of each k (lowest inertia / highest likelihood)
+      and scores it: BIC and AIC (GMM), inertia (KMeans), Davies-Bouldin
+      (O(n k)) and the silhouette, either exact on a stratified subsample
+      (default), centroid-based ("simplified", O(n k)) or exact on all rows
+
+Usage:
+    from polysense.analysis.sweep import sweep
+    scores = sweep(features_scaled, range(2, 11), model="gmm", n_init=10, random_state=42)
+    scores[["bic", "aic", "silhouette"]]
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+MODELS = ("kmeans", "gmm")
+SILHOUETTE = ("sample", "simplified", "full")
+SAMPLE_SIZE = 5000   # rows of the stratified silhouette subsample
+WARM_SIZE = 20000    # rows each init is first fitted on
+CHUNK = 1024         # rows per block of pairwise distances
+
+_X = None
+_shm = None
+
+
+def _attach(name, shape, dtype):
+    """Worker initializer: map the shared features, one thread per worker."""
+    global _X, _shm
+    try:
+        _shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        _shm = shared_memory.SharedMemory(name=name)
+    _X = np.ndarray(shape, dtype, buffer=_shm.buf)
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+
+# --- metrics ---
+
+def _centers(X, labels, k):
+    counts = np.bincount(labels, minlength=k).astype(np.float64)
+    sums = np.stack([np.bincount(labels, X[:, j], minlength=k) for j in range(X.shape[1])], axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts[:, None], counts
+
+
+def _distances(A, B):
+    """Euclidean distances between the rows of A and B."""
+    d = (A * A).sum(1)[:, None] + (B * B).sum(1)[None, :] - 2 * A @ B.T
+    return np.sqrt(np.maximum(d, 0, out=d), out=d)
+
+
+def _silhouette_values(X, labels, k, chunk=CHUNK):
+    """Exact silhouette of every row (0 for rows alone in their cluster), as sklearn."""
+    counts = np.bincount(labels, minlength=k).astype(np.float64)
+    onehot = np.zeros((len(X), k))
+    onehot[np.arange(len(X)), labels] = 1
+    out = np.empty(len(X))
+    for a in range(0, len(X), chunk):
+        own = labels[a:a + chunk]
+        rows = np.arange(len(own))
+        sums = _distances(X[a:a + chunk], X) @ onehot
+        inner = sums[rows, own] / np.maximum(counts[own] - 1, 1)
+        sums[rows, own] = np.inf
+        with np.errstate(invalid="ignore", divide="ignore"):
+            nearest = (sums / counts).min(axis=1)
+            s = (nearest - inner) / np.maximum(inner, nearest)
+        out[a:a + chunk] = np.where(counts[own] > 1, np.nan_to_num(s), 0.0)
+    return out
+
+
+def stratified_sample(labels, size, rng):
+    """Row positions of a random subsample with each cluster in proportion."""
+    n = len(labels)
+    if size >= n:
+        return np.arange(n)
+    k = labels.max() + 1
+    counts = np.bincount(labels, minlength=k)
+    take = np.maximum(np.round(counts * size / n).astype(np.int64), np.minimum(counts, 1))
+    # random order within each cluster, then the first take[c] of cluster c
+    order = rng.permutation(n)
+    order = order[np.argsort(labels[order], kind="stable")]
+    rank = np.arange(n) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.sort(order[rank < np.repeat(take, counts)])
+
+
+def silhouette(X, labels, method="sample", sample_size=SAMPLE_SIZE, random_state=None):
+    """
+    Mean silhouette coefficient of a clustering.
+
+    Args:
+        method: "sample" (exact on a stratified subsample of ``sample_size``
+            rows), "simplified" (distances to cluster centroids, O(n k)) or
+            "full" (exact, O(n^2) time)
+    """
+    if method not in SILHOUETTE:
+        raise ValueError("unknown silhouette %r (one of %s)" % (method, ", ".join(SILHOUETTE)))
+    X = np.asarray(X, dtype=np.float64)
+    labels = np.unique(labels, return_inverse=True)[1]
+    k = labels.max() + 1 if len(labels) else 0
+    if k < 2:
+        return np.nan
+    if method == "simplified":
+        centers, _ = _centers(X, labels, k)
+        d = _distances(X, centers)
+        rows = np.arange(len(X))
+        inner = d[rows, labels].copy()
+        d[rows, labels] = np.inf
+        nearest = d.min(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return float(np.nan_to_num((nearest - inner) / np.maximum(inner, nearest)).mean())
+    if method == "sample":
+        keep = stratified_sample(labels, sample_size, np.random.default_rng(random_state))
+        X, labels = X[keep], labels[keep]
+    return float(_silhouette_values(X, labels, k).mean())
+
+
+def davies_bouldin(X, labels):
+    """Davies-Bouldin index (lower is better), as sklearn's davies_bouldin_score."""
+    X = np.asarray(X, dtype=np.float64)
+    labels = np.unique(labels, return_inverse=True)[1]
+    k = labels.max() + 1
+    centers, counts = _centers(X, labels, k)
+    spread = np.bincount(labels, np.sqrt(((X - centers[labels]) ** 2).sum(1)), minlength=k) / counts
+    apart = _distances(centers, centers)
+    if np.allclose(spread, 0) or np.allclose(apart, 0):
+        return 0.0
+    with np.errstate(divide="ignore"):
+        ratio = (spread[:, None] + spread[None, :]) / apart
+    ratio[np.isinf(ratio)] = np.nan
+    np.fill_diagonal(ratio, np.nan)
+    return float(np.nanmax(ratio, axis=1).mean())
+
+
+# --- fitting ---
+
+def _estimator(model, k, seed, max_iter, covariance_type, init=None):
+    if model == "kmeans":
+        from sklearn.cluster import KMeans
+        if init is not None:
+            return KMeans(k, init=init.cluster_centers_, n_init=1, max_iter=max_iter,
+                          random_state=seed)
+        return KMeans(k, n_init=1, max_iter=max_iter, random_state=seed)
+    from sklearn.mixture import GaussianMixture
+    if init is not None:
+        return GaussianMixture(k, covariance_type=covariance_type, max_iter=max_iter,
+                               random_state=seed, weights_init=init.weights_,
+                               means_init=init.means_, precisions_init=init.precisions_)
+    return GaussianMixture(k, covariance_type=covariance_type, max_iter=max_iter, random_state=seed)
+
+
+def _fit(model, k, seed, max_iter, covariance_type, warm_size):
+    X = _X
+    if warm_size and len(X) > 2 * warm_size:
+        rows = np.random.default_rng(seed).choice(len(X), warm_size, replace=False)
+        first = _estimator(model, k, seed, max_iter, covariance_type).fit(X[np.sort(rows)])
+        fitted = _estimator(model, k, seed, max_iter, covariance_type, first).fit(X)
+    else:
+        fitted = _estimator(model, k, seed, max_iter, covariance_type).fit(X)
+    if model == "kmeans":
+        objective = fitted.inertia_
+        del fitted.labels_  # one per row: not worth sending back
+    else:
+        objective = -fitted.lower_bound_
+    return k, objective, fitted
+
+
+def _score(model, k, fitted, silhouette_method, sample_size, seed):
+    X = _X
+    labels = fitted.predict(X)
+    row = {"k": k}
+    if model == "gmm":
+        row.update(bic=fitted.bic(X), aic=fitted.aic(X), log_likelihood=fitted.score(X) * len(X))
+    else:
+        row["inertia"] = fitted.inertia_
+    row["silhouette"] = silhouette(X, labels, silhouette_method, sample_size, seed)
+    row["davies_bouldin"] = davies_bouldin(X, labels)
+    row["n_iter"] = fitted.n_iter_
+    row["clusters"] = int(len(np.unique(labels)))
+    return row
+
+
+def sweep(X, ks=range(2, 11), model="kmeans", n_init=10, random_state=None, workers=None,
+          silhouette="sample", sample_size=SAMPLE_SIZE, warm_size=WARM_SIZE, max_iter=300,
+          covariance_type="full", return_models=False):
+    """
+    Fit ``model`` for every k in ``ks`` and tabulate the selection criteria.
+
+    Args:
+        X: (rows, features) scaled features
+        model: "kmeans" or "gmm"
+        n_init: Initialisations per k (the best is kept)
+        workers: Processes (default: CPU count; 1 runs inline)
+        silhouette: As for silhouette() ("sample", "simplified", "full")
+        warm_size: Subsample each init is fitted on first (0: fit all rows directly)
+        covariance_type: GaussianMixture covariance type
+
+    Returns:
+        DataFrame indexed by k: bic, aic, log_likelihood (gmm) or inertia
+        (kmeans), silhouette, davies_bouldin, n_iter, clusters (non-empty);
+        with ``return_models``, also a dict k -> best fitted estimator
+    """
+    global _X
+    if model not in MODELS:
+        raise ValueError("unknown model %r (one of %s)" % (model, ", ".join(MODELS)))
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    ks = list(ks)
+    seeds = np.random.RandomState(random_state).randint(np.iinfo(np.int32).max, size=n_init)
+    fits = [(model, k, int(seed), max_iter, covariance_type, warm_size) for k in ks for seed in seeds]
+    workers = workers or os.cpu_count() or 1
+
+    def run(map_):
+        best = {}
+        for k, objective, fitted in map_(_fit, fits):
+            if k not in best or objective < best[k][0]:
+                best[k] = (objective, fitted)
+        models = {k: best[k][1] for k in ks}
+        rows = map_(_score, [(model, k, models[k], silhouette, sample_size, random_state)
+                             for k in ks])
+        return rows, models
+
+    if workers == 1:
+        previous, _X = _X, X
+        try:
+            rows, models = run(lambda fn, jobs: [fn(*job) for job in jobs])
+        finally:
+            _X = previous
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        try:
+            np.ndarray(X.shape, X.dtype, buffer=shm.buf)[:] = X
+            with ProcessPoolExecutor(workers, initializer=_attach,
+                                     initargs=(shm.name, X.shape, X.dtype.str)) as pool:
+                rows, models = run(lambda fn, jobs: list(pool.map(fn, *zip(*jobs))))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    table = pd.DataFrame(list(rows)).set_index("k")
+    return (table, models) if return_models else table
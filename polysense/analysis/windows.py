@@ -0,0 +1,142 @@
+"""
+Sliding-window training inputs without copying the series.
+
+A model fed the last ``window`` rows to predict the next value needs every
+window of the series; stacking them materialises ``window`` copies of each
+row (240 x the series for 2 h at 30 s). windows() returns them as a strided
+view of the series instead, and batches() / dataset() gather one batch at a
+time from that view, so memory is the series plus a few batches however
+long the history grows:
+
+    windows()   (samples, window, features) view and the matching targets
+    batches()   (X, y) batches, optionally shuffled, prepared in a
+                background thread
+    dataset()   the same batches as a prefetching tf.data.Dataset, for
+                model.fit() / predict()
+
+Window i is rows i .. i+window-1 and its target is row i+window+horizon-1
+(horizon 1: the row right after the window).
+
+Usage:
+    from polysense.analysis.windows import dataset
+    model.fit(dataset(X_train, y_train, 240, shuffle=True, seed=42),
+              validation_data=dataset(X_val, y_val, 240), epochs=100)
+"""
+
+import queue
+import threading
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+BATCH_SIZE = 64
+PREFETCH = 2  # batches prepared ahead of the consumer
+
+
+def windows(X, y=None, window=240, horizon=1):
+    """
+    All windows of ``X`` and their targets, as views (no copy).
+
+    Args:
+        X: (rows, features) or (rows,) array
+        y: Targets aligned with the rows of X, or None
+        window: Rows per window
+        horizon: Rows from the end of a window to its target
+
+    Returns:
+        (X windows (samples, window, features), y targets (samples, ...) or None)
+    """
+    X = np.asarray(X)
+    if X.ndim == 1:
+        X = X[:, None]
+    n = max(len(X) - window - horizon + 1, 0)
+    # sliding_window_view adds the window axis last: (rows, features, window)
+    Xw = sliding_window_view(X, window, axis=0)[:n].transpose(0, 2, 1)
+    if y is None:
+        return Xw, None
+    first = window + horizon - 1
+    return Xw, np.asarray(y)[first:first + n]
+
+
+def _prefetch(iterable, depth):
+    """Iterate ``iterable`` in a thread, ``depth`` items ahead."""
+    items = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def run():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                items.put(item)
+        except BaseException as e:  # re-raised in the consumer
+            items.put(e)
+        items.put(done)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        while worker.is_alive():
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                worker.join(0.01)
+
+
+def batches(X, y=None, window=240, batch_size=BATCH_SIZE, shuffle=False, seed=None,
+            horizon=1, dtype=np.float32, prefetch=PREFETCH):
+    """
+    Yield batches of windows: X (batch, window, features), or (X, y) with targets.
+
+    Each batch is gathered from the windows() view, so only ``prefetch`` + 1
+    batches exist at a time. ``seed`` may be a numpy Generator, so that
+    successive calls draw successive shuffles (one per epoch).
+    """
+    Xw, yw = windows(X, y, window, horizon)
+    order = np.arange(len(Xw))
+    if shuffle:
+        np.random.default_rng(seed).shuffle(order)
+
+    def gather():
+        for a in range(0, len(order), batch_size):
+            # runs of the unshuffled order are slices: one contiguous copy
+            pick = order[a:a + batch_size] if shuffle else slice(a, a + batch_size)
+            xb = np.asarray(Xw[pick], dtype=dtype)
+            yield xb if yw is None else (xb, np.asarray(yw[pick], dtype=dtype))
+
+    return _prefetch(gather(), prefetch) if prefetch else gather()
+
+
+def dataset(X, y=None, window=240, batch_size=BATCH_SIZE, shuffle=False, seed=None,
+            horizon=1):
+    """
+    batches() as a tf.data.Dataset, reshuffled every epoch when ``shuffle``.
+
+    Returns:
+        tf.data.Dataset of float32 batches, prefetched (tf.data.AUTOTUNE)
+    """
+    try:
+        import tensorflow as tf
+    except ImportError:
+        raise ImportError("dataset() needs tensorflow; batches() works without it") from None
+    X = np.asarray(X)
+    features = X.shape[1] if X.ndim > 1 else 1
+    rng = np.random.default_rng(seed)
+    spec = tf.TensorSpec((None, window, features), tf.float32)
+    if y is not None:
+        y = np.asarray(y)
+        spec = (spec, tf.TensorSpec((None,) + y.shape[1:], tf.float32))
+    data = tf.data.Dataset.from_generator(
+        lambda: batches(X, y, window, batch_size, shuffle, rng, horizon, prefetch=0),
+        output_signature=spec)
+    return data.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,47 @@
+"""
+Loading PolySense data on the host.
+
+schema   Column registry of the datalogger CSV (mirrors csv_header in main.py)
+loader   load(): typed parsing with a memory-mapped columnar cache
+ingest   load_log(): a growing datalogger CSV, parsing only the rows added since
+         the last run
+rollup   rollups(): 1 min / 10 min / 1 h / 1 day aggregates of such a log,
+         kept up to date with it, for views of long time ranges
+validity ValidityIndex: runs of missing readings per channel, for completeness,
+         gap and co-missing queries over any time range without scanning rows
+logindex read_range(): one time window of a large log, through the sparse
+         timestamp index shared with the firmware (lib/logindex.py)
+inmet    INMET reference-station exports, in BRT, through the same cache
+align    Aggregation of the 30 s log to the reference's resolution and the join
+
+Usage:
+    from polysense.io import load, TEMPERATURE, HUMIDITY, PRESSURE
+    df = load()                          # Kaggle dataset
+    df = load("datalog_final.csv")       # a card's log
+    df = load_log("datalog_final.csv")   # the same, incrementally as it grows
+    month = rollups("datalog_final.csv").query("2025-09-01", "2025-10-01", max_points=1000)
+    gaps = validity("datalog_final.csv").gaps("Temp_DHT11_C", "2025-09-15", "2025-09-22")
+    day = read_range("datalog_final.csv", "2025-09-10", "2025-09-11")
+    ref = load_inmet("data/raw/inmet_weather_station_data_sep_2025_utc.csv")
+    joined = align(df, ref, how={"Temp_AHT20_C": ["nearest", "max", "min"]}, default="mean")
+"""
+
+from polysense.io.align import aggregate, align
+from polysense.io.ingest import load_log, read_store
+from polysense.io.loader import cache_path, cached, dataset_path, default_cache_dir, load, read_csv
+from polysense.io.logindex import read_range
+from polysense.io.rollup import RollupStore, rollups
+from polysense.io.schema import (COLUMNS, HEADER, HUMIDITY, PRESSURE, SENSORS, TEMPERATURE,
+                                 TIMESTAMP, Column, columns)
+from polysense.io.validity import ValidityIndex, validity
+
+# inmet is also a command (python -m polysense.io.inmet); importing it here
+# would load it before runpy runs it as __main__
+_LAZY = {"load_inmet": "polysense.io.inmet", "read_inmet": "polysense.io.inmet"}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
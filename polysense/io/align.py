@@ -0,0 +1,167 @@
+"""
+Alignment of the 30-second station log to a coarser reference (INMET).
+
+aggregate() reduces the log to a regular grid with one or more
+aggregations per column; align() does that at the reference's resolution
+and joins the result to the reference rows. Bins follow the INMET
+convention by default: the value stamped hh:00 covers (hh-1:00, hh:00], so
+"max"/"min" of a station column compare with INMET's "Max."/"Min." and
+"nearest" (the sample closest to the stamp) with its instantaneous "Ins.".
+
+Aggregations:
+    mean, median, min, max, std, first, last, count   over each bin
+    nearest   the sample closest to the bin stamp, within ``tolerance``
+
+Frames indexed by (Station, Timestamp), as returned by load_inmet() for
+several files, are aligned per station.
+
+Usage:
+    from polysense.io import load, load_inmet
+    from polysense.io.align import align
+    joined = align(load("datalog_final.csv"),
+                   load_inmet("data/raw/inmet_weather_station_data_sep_2025_utc.csv"),
+                   how={"Temp_AHT20_C": ["nearest", "max", "min"]}, default="mean")
+"""
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.schema import TIMESTAMP
+
+STATION = "Station"
+
+AGGREGATIONS = ("mean", "median", "min", "max", "std", "first", "last", "count", "nearest")
+
+
+def sample_period(index):
+    """Typical spacing of a DatetimeIndex (median difference)."""
+    stamps = index.get_level_values(TIMESTAMP) if isinstance(index, pd.MultiIndex) else index
+    steps = stamps.to_series().diff()
+    steps = steps[steps > pd.Timedelta(0)]
+    if steps.empty:
+        raise ValueError("need at least two distinct timestamps")
+    return steps.median()
+
+
+def _spec(columns, how, default):
+    """{column: [aggregation, ...]} for the columns to keep."""
+    if isinstance(how, str) or isinstance(how, (list, tuple)):
+        how, default = {}, how
+    spec = {}
+    for name in columns:
+        aggs = how.get(name, default)
+        if aggs is None:
+            continue
+        aggs = [aggs] if isinstance(aggs, str) else list(aggs)
+        for agg in aggs:
+            if agg not in AGGREGATIONS:
+                raise ValueError("unknown aggregation %r (one of %s)" % (agg, ", ".join(AGGREGATIONS)))
+        spec[name] = aggs
+    missing = set(how) - set(columns)
+    if missing:
+        raise KeyError("not in the frame: %s" % ", ".join(sorted(missing)))
+    return spec
+
+
+def _names(spec):
+    """Output column per (column, aggregation): the bare name when it has only one."""
+    return {(name, agg): name if len(aggs) == 1 else "%s_%s" % (name, agg)
+            for name, aggs in spec.items() for agg in aggs}
+
+
+def _nearest(df, columns, stamps, tolerance):
+    """Sample of ``df`` closest to each row of ``stamps`` (a frame of keys)."""
+    by = STATION if STATION in stamps.columns else None
+    left = stamps.reset_index(drop=True).reset_index().sort_values(TIMESTAMP, kind="stable")
+    right = df[columns].reset_index().sort_values(TIMESTAMP, kind="stable")
+    left[TIMESTAMP] = left[TIMESTAMP].astype(right[TIMESTAMP].dtype)
+    out = pd.merge_asof(left, right, on=TIMESTAMP, by=by, direction="nearest",
+                        tolerance=tolerance)
+    return out.sort_values("index")[columns].to_numpy()
+
+
+def aggregate(df, freq, how="mean", default=None, label="right", coverage=None,
+              tolerance=None):
+    """
+    Reduce a time-indexed frame to a regular grid.
+
+    Args:
+        df: Frame indexed by Timestamp, or by (Station, Timestamp)
+        freq: Grid step ("1h", "10min", a Timedelta, ...)
+        how: Aggregation(s) for every column, or {column: aggregation(s)}
+        default: With a dict ``how``, aggregation(s) of the other columns
+                 (None drops them)
+        label: "right" stamps a bin with its end (INMET), "left" with its start
+        coverage: Minimum fraction of the expected samples a bin needs;
+                  bins with fewer (gaps, outages) come out NaN
+        tolerance: Furthest sample "nearest" may pick (default: half a step)
+
+    Returns:
+        DataFrame on the grid; a column aggregated several ways becomes
+        one column per aggregation, named "<column>_<aggregation>"
+    """
+    freq = pd.Timedelta(freq)
+    spec = _spec(df.columns, how, default)
+    names = _names(spec)
+    by_station = isinstance(df.index, pd.MultiIndex)
+    keys = [pd.Grouper(level=STATION)] if by_station else []
+    keys.append(pd.Grouper(level=TIMESTAMP, freq=freq, label=label, closed=label))
+    grouped = df.groupby(keys if by_station else keys[0], sort=True)
+
+    reduce = {name: [a for a in aggs if a != "nearest"] for name, aggs in spec.items()}
+    reduce = {name: aggs for name, aggs in reduce.items() if aggs}
+    if reduce:
+        out = grouped.agg(reduce)
+        out.columns = [names[key] for key in out.columns]
+    else:
+        out = grouped.size().to_frame("_size").drop(columns="_size")
+
+    near = [name for name, aggs in spec.items() if "nearest" in aggs]
+    if near:
+        values = _nearest(df, near, out.index.to_frame(index=False),
+                          freq / 2 if tolerance is None else pd.Timedelta(tolerance))
+        for i, name in enumerate(near):
+            out[names[(name, "nearest")]] = values[:, i]
+
+    if coverage:
+        expected = freq / sample_period(df.index)
+        size = grouped.size().reindex(out.index, fill_value=0)
+        short = (size.to_numpy() < coverage * expected)[:, None]
+        out = out.where(~np.broadcast_to(short, out.shape))
+    return out[[names[key] for key in names]]
+
+
+def align(station, reference, how="mean", default=None, freq=None, label="right",
+          coverage=None, tolerance=None, suffix="_station"):
+    """
+    Join the station log, aggregated to the reference's resolution, to the reference.
+
+    Args:
+        station: Station frame (Timestamp or (Station, Timestamp) index)
+        reference: Reference frame, e.g. from load_inmet(); a (Station,
+                   Timestamp) reference joins per station, a Timestamp one
+                   is matched by time only
+        freq: Resolution to aggregate to (default: the reference's spacing)
+        suffix: Appended to station columns whose name the reference uses
+        how, default, label, coverage, tolerance: As for aggregate()
+
+    Returns:
+        The reference rows, in their order, with the aggregated station
+        columns after their own (NaN where the log has no data)
+    """
+    freq = pd.Timedelta(freq) if freq is not None else sample_period(reference.index)
+    agg = aggregate(station, freq, how, default, label, coverage, tolerance)
+    agg.columns = [c + suffix if c in reference.columns else c for c in agg.columns]
+
+    per_station = isinstance(reference.index, pd.MultiIndex) and isinstance(agg.index, pd.MultiIndex)
+    if isinstance(agg.index, pd.MultiIndex) and not per_station:
+        raise ValueError("a multi-station log needs a (Station, Timestamp) reference")
+    keys = reference.index.to_frame(index=False)
+    if not per_station and isinstance(reference.index, pd.MultiIndex):
+        keys = keys[[TIMESTAMP]]
+    # reference stamps off the grid (e.g. 10:00:12) snap to the nearest bin
+    values = _nearest(agg, list(agg.columns), keys, freq / 2)
+    joined = reference.copy()
+    for i, name in enumerate(agg.columns):
+        joined[name] = values[:, i]
+    return joined
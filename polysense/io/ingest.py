@@ -0,0 +1,200 @@
+"""
+Incremental ingestion of a datalogger CSV that only grows by appends.
+
+datalog_final.csv is never rewritten by the firmware, only appended to, so
+a store keyed by the log's path (not its contents, unlike load()'s cache)
+can keep the rows already parsed and take just the new tail:
+
+    <store>/values.f32   rows x columns float32, row-major, appended in place
+    <store>/index.i64    row timestamps, microseconds since the epoch
+    <store>/meta.json    columns, header, rows, byte offset parsed up to,
+                         last row and last timestamp
+
+Each ingest() checks that the header is unchanged and that the last row it
+consumed is still at the same offset (i.e. the file was appended to, not
+replaced or edited); otherwise the store is rebuilt from the start. Only
+complete lines are consumed, so a row the logger is still writing is left
+for the next run. Lines torn by a power cut (a timestamp that does not
+parse, or two rows run together) are skipped and counted.
+
+Usage:
+    from polysense.io.ingest import load_log
+    df = load_log("/media/sd/datalog_final.csv")   # time ~ new rows only
+"""
+
+import hashlib
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.loader import default_cache_dir
+from polysense.io.schema import DTYPE, TIMESTAMP, TIMESTAMP_FORMAT
+
+META = "meta.json"
+VALUES = "values.f32"
+INDEX = "index.i64"
+
+
+def store_path(path, cache_dir=None):
+    """Store directory of a log (one per absolute path)."""
+    key = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=8).hexdigest()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir or default_cache_dir(), "%s-%s.store" % (stem, key))
+
+
+def _read_meta(store):
+    try:
+        with open(os.path.join(store, META)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(store, meta):
+    tmp = os.path.join(store, META + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(store, META))
+
+
+def _reset(store, header, columns, offset):
+    if os.path.isdir(store):
+        shutil.rmtree(store)
+    os.makedirs(store)
+    for name in (VALUES, INDEX):
+        open(os.path.join(store, name), "wb").close()
+    meta = {"header": header, "columns": columns, "rows": 0, "offset": offset,
+            "last_row": "", "last_timestamp": None, "skipped": 0}
+    _write_meta(store, meta)
+    return meta
+
+
+def _unchanged(f, meta):
+    """The last consumed row is still where it was."""
+    last = meta["last_row"].encode()
+    if not last:
+        return True
+    f.seek(meta["offset"] - len(last))
+    return f.read(len(last)) == last
+
+
+def parse_rows(chunk, columns):
+    """(values, microseconds, skipped) of complete CSV lines."""
+    names = [TIMESTAMP] + columns
+    # lines with extra fields (two rows merged by a torn write) are dropped
+    options = dict(header=None, names=names, on_bad_lines="skip", engine="c")
+    try:
+        df = pd.read_csv(io.BytesIO(chunk), dtype={name: DTYPE for name in names[1:]},
+                         **options)
+    except ValueError:
+        # a torn line merged with the next one leaves text in a number column
+        df = pd.read_csv(io.BytesIO(chunk), dtype=str, **options)
+        for name in columns:
+            df[name] = pd.to_numeric(df[name], errors="coerce").astype(DTYPE)
+    df[TIMESTAMP] = df[TIMESTAMP].astype(str)
+    stamps = pd.to_datetime(df.pop(TIMESTAMP), format=TIMESTAMP_FORMAT, errors="coerce")
+    good = stamps.notna().to_numpy()
+    micros = stamps.to_numpy()[good].astype("datetime64[us]").astype(np.int64)
+    skipped = chunk.count(b"\n") - len(micros)
+    return np.ascontiguousarray(df.to_numpy(dtype=DTYPE)[good]), micros, skipped
+
+
+def ingest(path, store=None, cache_dir=None):
+    """
+    Bring the store of ``path`` up to date with the file.
+
+    Args:
+        path: Datalogger CSV
+        store: Store directory (default: store_path(path, cache_dir))
+
+    Returns:
+        dict: rows (new), bytes (parsed), total (rows in the store),
+        skipped (unparseable lines), rebuilt (and why), backwards (new rows
+        stamped before the previous last row: RTC reset)
+    """
+    store = store or store_path(path, cache_dir)
+    stats = {"rows": 0, "bytes": 0, "skipped": 0, "backwards": 0, "rebuilt": None}
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        header = header_line.decode().rstrip("\r\n")
+        columns = header.split(",")[1:]
+        size = os.fstat(f.fileno()).st_size
+
+        meta = _read_meta(store)
+        if meta is None:
+            stats["rebuilt"] = "new store"
+        elif meta["header"] != header:
+            stats["rebuilt"] = "header changed"
+        elif size < meta["offset"] or not _unchanged(f, meta):
+            stats["rebuilt"] = "file rewritten"
+        if stats["rebuilt"]:
+            meta = _reset(store, header, columns, len(header_line))
+        else:
+            # drop anything a previous run wrote past its last committed row
+            for name, width in ((VALUES, 4 * len(columns)), (INDEX, 8)):
+                with open(os.path.join(store, name), "r+b") as data:
+                    data.truncate(meta["rows"] * width)
+
+        f.seek(meta["offset"])
+        chunk = f.read(size - meta["offset"])
+    end = chunk.rfind(b"\n") + 1
+    chunk = chunk[:end]
+    if chunk:
+        values, micros, skipped = parse_rows(chunk, meta["columns"])
+        last = meta["last_timestamp"]
+        if len(micros):
+            latest = np.maximum.accumulate(micros)
+            if last is not None:
+                latest = np.maximum(latest, last)
+            stats["backwards"] = int((micros[1:] < latest[:-1]).sum())
+            if last is not None:
+                stats["backwards"] += int(micros[0] < last)
+        with open(os.path.join(store, VALUES), "ab") as data:
+            data.write(values.tobytes())
+        with open(os.path.join(store, INDEX), "ab") as data:
+            data.write(micros.tobytes())
+        lines = chunk[:-1].rsplit(b"\n", 1)
+        meta.update(rows=meta["rows"] + len(micros), offset=meta["offset"] + end,
+                    last_row=lines[-1].decode() + "\n", skipped=meta["skipped"] + skipped)
+        if len(micros):
+            meta["last_timestamp"] = int(latest[-1])
+        _write_meta(store, meta)
+        stats.update(rows=len(micros), bytes=end, skipped=skipped)
+    stats["total"] = meta["rows"]
+    return stats
+
+
+def _frame(values, micros, columns):
+    index = pd.DatetimeIndex(micros.view("datetime64[us]"), name=TIMESTAMP)
+    # A row-major (rows, columns) matrix: pandas keeps its transpose as the
+    # float block, so the frame is a view of the mapping
+    return pd.DataFrame(values, index=index, columns=columns, copy=False)
+
+
+def read_store(store, memory_map=True):
+    """DataFrame of a store (indexed by Timestamp, float32 columns)."""
+    meta = _read_meta(store)
+    if meta is None:
+        raise FileNotFoundError("no store at %s" % store)
+    rows, columns = meta["rows"], meta["columns"]
+    if not rows:
+        return _frame(np.empty((0, len(columns)), DTYPE), np.empty(0, np.int64), columns)
+    if memory_map:
+        values = np.memmap(os.path.join(store, VALUES), DTYPE, "c", shape=(rows, len(columns)))
+        micros = np.memmap(os.path.join(store, INDEX), np.int64, "r", shape=(rows,))
+    else:
+        values = np.fromfile(os.path.join(store, VALUES), DTYPE, rows * len(columns))
+        values = values.reshape(rows, len(columns))
+        micros = np.fromfile(os.path.join(store, INDEX), np.int64, rows)
+    return _frame(values, micros, columns)
+
+
+def load_log(path, cache_dir=None, memory_map=True):
+    """ingest() the log, then return its full frame."""
+    store = store_path(path, cache_dir)
+    ingest(path, store)
+    return read_store(store, memory_map)
@@ -0,0 +1,193 @@
+"""
+INMET automatic-station CSVs, parsed into BRT-indexed float32 frames.
+
+Two export layouts are recognised from the first lines of the file:
+
+    table   Station table of the INMET portal (the file in data/raw/): UTF-8
+            with a BOM, quoted fields, "Data" as dd/mm/yyyy and
+            "Hora (UTC)" as "0000"
+    bdmep   Yearly BDMEP archive: Latin-1, a "KEY:;value" preamble (region,
+            state, station, WMO code, ...), "Data" as yyyy/mm/dd and
+            "Hora UTC" as "0000 UTC", -9999 for missing values
+
+Both are read in a single pass of the C parser (";" separator, "," decimal
+mark, float32 columns); timestamps are built from the distinct dates and
+hours only, so the cost per row is independent of the date format. INMET
+reports in UTC; the index is converted to local time (BRT by default),
+naive like the datalogger's, so the two join directly.
+
+Usage:
+    from polysense.io.inmet import load_inmet
+    ref = load_inmet("data/raw/inmet_weather_station_data_sep_2025_utc.csv")
+    ref.dropna()   # the rows of data/raw/validation_data_cleaned_BRT.csv
+
+    python -m polysense.io.inmet IN.csv [-o OUT.csv] [--complete] [--utc]
+"""
+
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.loader import cached
+from polysense.io.schema import DTYPE, TIMESTAMP, TIMESTAMP_FORMAT
+
+# Vitória da Conquista (Bahia): UTC-3, no daylight saving since 2012
+BRT = "America/Bahia"
+
+MISSING = ("", "-9999", "-9999,0")
+
+_SNIFF_BYTES = 1 << 14
+
+
+def _decode(raw):
+    if raw.startswith(b"\xef\xbb\xbf"):
+        return raw[3:].decode("utf-8", "replace"), "utf-8-sig"
+    try:
+        return raw.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        return raw.decode("latin-1"), "latin-1"
+
+
+def sniff(path):
+    """
+    Layout of an INMET export.
+
+    Returns:
+        dict: encoding, header (line number of the column names), layout
+        ("table" or "bdmep"), columns and the preamble metadata
+    """
+    with open(path, "rb") as f:
+        text, encoding = _decode(f.read(_SNIFF_BYTES))
+    meta = {}
+    for number, line in enumerate(text.splitlines()):
+        fields = [field.strip().strip('"') for field in line.split(";")]
+        if fields[0].endswith(":"):
+            meta[fields[0][:-1].strip()] = fields[1] if len(fields) > 1 else ""
+        elif fields[0].lower().startswith("data"):
+            return {
+                "encoding": encoding,
+                "header": number,
+                "layout": "bdmep" if meta else "table",
+                "columns": fields,
+                "meta": meta,
+            }
+    raise ValueError("%s: no INMET header (a line starting with 'Data')" % path)
+
+
+def station_id(path):
+    """WMO code from the BDMEP preamble, else the file name."""
+    meta = sniff(path)["meta"]
+    for key, value in meta.items():
+        if key.upper().startswith("CODIGO") and value:
+            return value
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _date_format(sample):
+    if re.fullmatch(r"\d{2}/\d{2}/\d{4}", sample):
+        return "%d/%m/%Y"
+    if re.fullmatch(r"\d{4}/\d{2}/\d{2}", sample):
+        return "%Y/%m/%d"
+    return "%Y-%m-%d"
+
+
+def _timestamps(dates, hours):
+    """UTC datetime64 from the date and hour columns, parsing distinct values only."""
+    date_codes, date_values = pd.factorize(dates)
+    if not len(date_values):
+        return np.array([], dtype="datetime64[us]")
+    days = pd.to_datetime(pd.Series(date_values, dtype=str),
+                          format=_date_format(str(date_values[0]))).to_numpy()
+    hour_codes, hour_values = pd.factorize(hours)
+    # "0000", "0000 UTC", "00:00" -> hhmm
+    hhmm = pd.Series(hour_values, dtype=str).str.replace(r"\D", "", regex=True).str[:4]
+    hhmm = hhmm.astype(int).to_numpy()
+    offsets = ((hhmm // 100) * 60 + hhmm % 100).astype("timedelta64[m]")
+    return days[date_codes] + offsets[hour_codes]
+
+
+def read_inmet(path, tz=BRT):
+    """
+    Parse an INMET export, without caching.
+
+    Args:
+        path: CSV file in the table or bdmep layout
+        tz: Zone of the returned index (naive local time); None keeps UTC
+
+    Returns:
+        DataFrame indexed by Timestamp, one float32 column per INMET
+        variable under its original name, NaN where the cell is empty
+    """
+    info = sniff(path)
+    date_col, hour_col = info["columns"][:2]
+    dtypes = {name: DTYPE for name in info["columns"][2:] if name}
+    dtypes[date_col] = dtypes[hour_col] = str
+    df = pd.read_csv(path, sep=";", decimal=",", encoding=info["encoding"],
+                     skiprows=info["header"], dtype=dtypes, na_values=list(MISSING),
+                     keep_default_na=False, engine="c")
+    # a trailing ";" on every line adds an empty column
+    df = df.drop(columns=[c for c in df.columns if c.startswith("Unnamed:")])
+    df = df.dropna(subset=[date_col, hour_col])
+    stamps = _timestamps(df.pop(date_col).to_numpy(), df.pop(hour_col).to_numpy())
+    index = pd.DatetimeIndex(stamps, name=TIMESTAMP)
+    if tz is not None:
+        index = index.tz_localize("UTC").tz_convert(tz).tz_localize(None)
+    df.index = index.rename(TIMESTAMP)
+    return df
+
+
+def load_inmet(paths, tz=BRT, cache_dir=None, fmt=None, memory_map=True, refresh=False):
+    """
+    Load INMET exports through the columnar cache (see polysense.io.loader).
+
+    Args:
+        paths: One CSV, or several (stations and/or years)
+        tz: As for read_inmet()
+
+    Returns:
+        For one path, the frame of read_inmet(). For several, the frames
+        concatenated per station (WMO code or file name) with a
+        (Station, Timestamp) index, each station's years in time order
+    """
+    kind = "inmet-%s" % (tz or "UTC").replace("/", "_")
+
+    def parse(path):
+        return read_inmet(path, tz)
+
+    if isinstance(paths, (str, os.PathLike)):
+        return cached(paths, parse, kind, cache_dir, fmt, memory_map, refresh)
+    frames = {}
+    for path in paths:
+        frames.setdefault(station_id(path), []).append(
+            cached(path, parse, kind, cache_dir, fmt, memory_map, refresh))
+    stations = {name: pd.concat(parts).sort_index() if len(parts) > 1 else parts[0]
+                for name, parts in frames.items()}
+    return pd.concat(stations, names=["Station"])
+
+
+def write_cleaned(df, path):
+    """Write a frame in the layout of data/raw/*_cleaned_BRT.csv."""
+    df.to_csv(path, date_format=TIMESTAMP_FORMAT, float_format="%.6g")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an INMET export to a cleaned BRT CSV")
+    parser.add_argument("path")
+    parser.add_argument("-o", "--output", help="CSV to write (default: stdout)")
+    parser.add_argument("--complete", action="store_true",
+                        help="keep only hours with every variable present")
+    parser.add_argument("--utc", action="store_true", help="keep the UTC timestamps")
+    args = parser.parse_args()
+
+    df = read_inmet(args.path, tz=None if args.utc else BRT)
+    if args.complete:
+        df = df[np.isfinite(df.to_numpy()).all(axis=1)]
+    write_cleaned(df, args.output or sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Typed loading of datalogger CSVs with a columnar, memory-mapped cache.
+
+The first load() of a file parses it with the schema dtypes (float32
+measurements, datetime64 index) and writes a cache named after a hash of
+its contents; later calls, from any notebook, map the cache instead of
+parsing the CSV again, and an edited file simply gets a new cache.
+
+Cache formats:
+    feather  Arrow IPC, uncompressed, memory-mapped (needs pyarrow)
+    parquet  Compressed, smallest on disk, decoded on load (needs pyarrow)
+    npy      NumPy arrays, memory-mapped copy-on-write (no extra dependency;
+             the default when pyarrow is not installed)
+
+Frames backed by a Feather cache are read-only: assign new columns rather
+than editing cells in place, or load with ``memory_map=False``.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.schema import BY_NAME, DTYPE, TIMESTAMP, TIMESTAMP_FORMAT, VERSION
+
+KAGGLE_DATASET = "jonassouza872/vitoria-da-conquista-weather-data-september"
+KAGGLE_FILE = "temp.csv"
+
+FORMATS = ("feather", "parquet", "npy")
+
+
+def _have_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def default_cache_dir():
+    """$POLYSENSE_CACHE, else ~/.cache/polysense."""
+    return os.environ.get("POLYSENSE_CACHE") or os.path.join(
+        os.path.expanduser("~"), ".cache", "polysense")
+
+
+def dataset_path(dataset=KAGGLE_DATASET):
+    """Local copy of the published Kaggle dataset (downloaded once by kagglehub)."""
+    try:
+        import kagglehub
+    except ImportError:
+        raise ImportError("load() without a path needs kagglehub: pip install kagglehub") from None
+    return kagglehub.dataset_download(dataset)
+
+
+def file_hash(path, chunk=1 << 20):
+    """BLAKE2b digest of the file contents (hex, 32 chars)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def read_csv(path):
+    """
+    Parse a datalogger CSV with the schema dtypes, without caching.
+
+    Measurement columns are float32 (empty cells -> NaN) and the timestamp
+    becomes a DatetimeIndex. Columns outside the schema are kept when they
+    are numeric (as float32); text columns and saved pandas indexes are
+    dropped.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {name: DTYPE for name in header if name in BY_NAME}
+    df = pd.read_csv(path, dtype=dtypes)
+    df = df.drop(columns=[c for c in df.columns if c.startswith("Unnamed:")])
+    stamps = df.pop(TIMESTAMP)
+    try:
+        index = pd.to_datetime(stamps, format=TIMESTAMP_FORMAT)
+    except ValueError:
+        index = pd.to_datetime(stamps, format="ISO8601")
+    for name in df.columns:
+        if name in dtypes:
+            continue
+        if pd.api.types.is_numeric_dtype(df[name]):
+            df[name] = df[name].astype(DTYPE)
+        else:
+            df = df.drop(columns=name)
+    df.index = pd.DatetimeIndex(index, name=TIMESTAMP)
+    return df
+
+
+# --- cache formats ---
+
+def _arrow_table(df):
+    import pyarrow as pa
+    arrays = [pa.array(df.index.values)]
+    # from_pandas=False keeps NaN as a float value instead of an Arrow null,
+    # so float columns convert back to NumPy without copying
+    arrays += [pa.array(df[c].to_numpy(), from_pandas=False) for c in df.columns]
+    return pa.Table.from_arrays(arrays, names=[TIMESTAMP] + list(df.columns))
+
+
+def _frame_from_arrow(table):
+    df = table.to_pandas(split_blocks=True)
+    return df.set_index(TIMESTAMP)
+
+
+def _write_feather(df, path):
+    from pyarrow import feather
+    feather.write_feather(_arrow_table(df), path, compression="uncompressed")
+
+
+def _read_feather(path, memory_map):
+    import pyarrow as pa
+    if memory_map:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+    else:
+        from pyarrow import feather
+        table = feather.read_table(path, memory_map=False)
+    return _frame_from_arrow(table)
+
+
+def _write_parquet(df, path):
+    import pyarrow.parquet as pq
+    pq.write_table(_arrow_table(df), path)
+
+
+def _read_parquet(path, memory_map):
+    import pyarrow.parquet as pq
+    return _frame_from_arrow(pq.read_table(path, memory_map=memory_map))
+
+
+def _write_npy(df, path):
+    os.makedirs(path)
+    # One (columns, rows) matrix: each column is contiguous, which is the
+    # layout of a pandas float block, so the frame is built without copying
+    values = np.ascontiguousarray(df.to_numpy(dtype=DTYPE).T)
+    np.save(os.path.join(path, "values.npy"), values)
+    np.save(os.path.join(path, "index.npy"), df.index.values)
+    with open(os.path.join(path, "columns.json"), "w") as f:
+        json.dump(list(df.columns), f)
+
+
+def _read_npy(path, memory_map):
+    mode = "c" if memory_map else None
+    values = np.load(os.path.join(path, "values.npy"), mmap_mode=mode)
+    index = np.load(os.path.join(path, "index.npy"), mmap_mode=mode)
+    with open(os.path.join(path, "columns.json")) as f:
+        names = json.load(f)
+    return pd.DataFrame(values.T, index=pd.DatetimeIndex(index, name=TIMESTAMP),
+                        columns=names, copy=False)
+
+
+_WRITERS = {"feather": _write_feather, "parquet": _write_parquet, "npy": _write_npy}
+_READERS = {"feather": _read_feather, "parquet": _read_parquet, "npy": _read_npy}
+
+
+def cache_path(path, cache_dir=None, fmt=None, kind=None):
+    """
+    Where load() caches ``path`` (depends on its contents, not its name or mtime).
+
+    ``kind`` tags caches of other parsers (e.g. "inmet") so they never
+    collide with the datalogger cache of the same file.
+    """
+    fmt = fmt or ("feather" if _have_pyarrow() else "npy")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if kind:
+        stem = "%s-%s" % (stem, kind)
+    name = "%s-%s-v%d.%s" % (stem, file_hash(path), VERSION, fmt)
+    return os.path.join(cache_dir or default_cache_dir(), name)
+
+
+def cached(path, parse, kind=None, cache_dir=None, fmt=None, memory_map=True, refresh=False):
+    """
+    ``parse(path)`` through the columnar cache.
+
+    ``parse`` must return a DataFrame with a DatetimeIndex named Timestamp
+    and float32 columns; the other arguments are those of load().
+    """
+    if fmt is not None and fmt not in FORMATS:
+        raise ValueError("fmt must be one of %s" % ", ".join(FORMATS))
+    fmt = fmt or ("feather" if _have_pyarrow() else "npy")
+    cache = cache_path(path, cache_dir, fmt, kind)
+    if refresh or not os.path.exists(cache):
+        df = parse(path)
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        tmp = "%s.tmp%d" % (cache, os.getpid())
+        _WRITERS[fmt](df, tmp)
+        if os.path.isdir(cache):
+            shutil.rmtree(cache)
+        os.replace(tmp, cache)
+    return _READERS[fmt](cache, memory_map)
+
+
+def load(path=None, cache_dir=None, fmt=None, memory_map=True, refresh=False):
+    """
+    Load a datalogger CSV as a typed DataFrame, through the columnar cache.
+
+    Args:
+        path: CSV file; None loads temp.csv from the Kaggle dataset
+        cache_dir: Cache directory (default: default_cache_dir())
+        fmt: "feather", "parquet" or "npy" (default: feather if pyarrow is
+             installed, else npy)
+        memory_map: Map the cache instead of reading it into memory
+        refresh: Re-parse the CSV even if a cache exists
+
+    Returns:
+        DataFrame indexed by Timestamp (datetime64), float32 columns
+    """
+    if path is None:
+        path = os.path.join(dataset_path(), KAGGLE_FILE)
+    return cached(path, read_csv, None, cache_dir, fmt, memory_map, refresh)
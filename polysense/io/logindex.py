@@ -0,0 +1,182 @@
+"""
+Sparse timestamp index of a datalogger CSV, and time-range reads through it.
+
+Writes and reads the sidecar format of lib/logindex.py (an entry with the
+timestamp and byte offset of every ``stride``-th row), so an index built
+here is used unchanged by the firmware or `python lib/logindex.py`, and
+one kept up to date on the card is used here. Building is one streaming,
+vectorised pass over the log (newlines found with NumPy, only the indexed
+rows' timestamps decoded); update() continues from where the index stops.
+
+read_range() binary-searches the entries, seeks to the nearest indexed row
+before ``start`` and parses only the bytes up to the first indexed row
+after ``end``.
+
+Usage:
+    from polysense.io.logindex import read_range
+    day = read_range("datalog_final.csv", "2025-09-10", "2025-09-11")
+"""
+
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.ingest import parse_rows
+from polysense.io.schema import TIMESTAMP
+
+# Format of lib/logindex.py
+MAGIC = b"PSIX"
+VERSION = 1
+HEADER_SIZE = 16
+_HEADER_FMT = "<4sHHII"  # magic, version, stride, rows, covered bytes
+ENTRY = np.dtype([("t", "<u4"), ("offset", "<u4")])
+EPOCH = np.datetime64("2000-01-01T00:00:00", "s")
+
+DEFAULT_STRIDE = 120  # one entry per hour at 30 s
+
+_BLOCK = 1 << 24
+
+# digit and separator positions of "YYYY-MM-DD HH:MM:SS"
+_DIGITS = np.array([0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18])
+_SEPARATORS = {4: ord("-"), 7: ord("-"), 10: ord(" "), 13: ord(":"), 16: ord(":")}
+
+
+def sidecar(path):
+    """Index path of a log: the same name with the extension .idx."""
+    return os.path.splitext(path)[0] + ".idx"
+
+
+def _seconds(block, starts):
+    """Seconds since 2000-01-01 of the timestamps at ``starts`` (-1 where torn)."""
+    ok = starts + 19 <= len(block)
+    at = np.clip(starts[:, None] + np.arange(19), 0, max(len(block) - 1, 0))
+    chars = block[at].astype(np.int64) if len(block) else np.zeros(at.shape, np.int64)
+    for i, sep in _SEPARATORS.items():
+        ok &= chars[:, i] == sep
+    digits = chars[:, _DIGITS] - ord("0")
+    ok &= ((digits >= 0) & (digits <= 9)).all(axis=1)
+    d = digits
+    y = d[:, 0] * 1000 + d[:, 1] * 100 + d[:, 2] * 10 + d[:, 3]
+    mo, day = d[:, 4] * 10 + d[:, 5], d[:, 6] * 10 + d[:, 7]
+    h, mi, s = d[:, 8] * 10 + d[:, 9], d[:, 10] * 10 + d[:, 11], d[:, 12] * 10 + d[:, 13]
+    # days from 2000-01-01, as _days() in lib/logindex.py
+    y = y - (mo < 3)
+    mo = mo + 12 * (mo < 3)
+    days = 365 * y + y // 4 - y // 100 + y // 400 + (153 * (mo - 3) + 2) // 5 + day - 730426
+    t = ((days * 24 + h) * 60 + mi) * 60 + s
+    return np.where(ok, t, -1)
+
+
+def read_header(index_path):
+    """(stride, rows, covered) of an index, or None if missing or not an index."""
+    try:
+        with open(index_path, "rb") as f:
+            magic, version, stride, rows, covered = struct.unpack(_HEADER_FMT, f.read(HEADER_SIZE))
+    except (OSError, struct.error):
+        return None
+    if magic != MAGIC or version != VERSION:
+        return None
+    return stride, rows, covered
+
+
+def entries(index_path):
+    """Entries of an index as a structured array (fields t, offset)."""
+    size = os.path.getsize(index_path) - HEADER_SIZE
+    return np.fromfile(index_path, ENTRY, size // ENTRY.itemsize, offset=HEADER_SIZE)
+
+
+def _consistent(path, index_path, covered):
+    if os.path.getsize(path) < covered:
+        return False
+    last = entries(index_path)[-1:]
+    if not len(last):
+        return True
+    with open(path, "rb") as f:
+        f.seek(int(last["offset"][0]))
+        stamp = np.frombuffer(f.read(19), np.uint8)
+    return _seconds(stamp, np.array([0]))[0] == last["t"][0]
+
+
+def update(path, index_path=None, stride=DEFAULT_STRIDE):
+    """
+    Build the index of ``path``, or extend it with the rows appended since.
+
+    An index whose log was replaced or edited (its last entry no longer
+    matches) is rebuilt; ``stride`` applies only when (re)building.
+
+    Returns:
+        int: Rows read
+    """
+    index_path = index_path or sidecar(path)
+    header = read_header(index_path)
+    if header is not None and header[2] and _consistent(path, index_path, header[2]):
+        stride, rows, covered = header
+    else:
+        with open(path, "rb") as f:
+            covered = len(f.readline())
+        rows = 0
+        with open(index_path, "wb") as f:
+            f.write(struct.pack(_HEADER_FMT, MAGIC, VERSION, stride, 0, covered))
+    start_rows = rows
+    with open(path, "rb") as log, open(index_path, "r+b") as out:
+        out.seek(0, os.SEEK_END)
+        log.seek(covered)
+        while True:
+            block = np.frombuffer(log.read(_BLOCK), np.uint8)
+            ends = np.flatnonzero(block == 10) + 1
+            if not len(ends):
+                break  # nothing, or a row still being written
+            starts = np.concatenate(([0], ends[:-1]))
+            numbers = rows + np.arange(len(starts))
+            pick = numbers % stride == 0
+            t = _seconds(block, starts[pick])
+            found = np.zeros(int((t >= 0).sum()), ENTRY)
+            found["t"] = t[t >= 0]
+            found["offset"] = covered + starts[pick][t >= 0]
+            out.write(found.tobytes())
+            rows += len(starts)
+            covered += int(ends[-1])
+            log.seek(covered)
+        out.seek(0)
+        out.write(struct.pack(_HEADER_FMT, MAGIC, VERSION, stride, rows, covered))
+    return rows - start_rows
+
+
+def _stamp(value):
+    return int((np.datetime64(pd.Timestamp(value), "s") - EPOCH).astype(np.int64))
+
+
+def read_range(path, start, end, index_path=None, refresh=True):
+    """
+    Rows of a datalogger CSV stamped in [start, end), read through its index.
+
+    Args:
+        path: Datalogger CSV
+        start, end: Anything pandas.Timestamp accepts
+        index_path: Sidecar (default: sidecar(path)); built if missing
+        refresh: update() the index first (rows after it are read anyway)
+
+    Returns:
+        DataFrame indexed by Timestamp, float32 columns, as load()
+    """
+    index_path = index_path or sidecar(path)
+    if refresh or read_header(index_path) is None:
+        update(path, index_path)
+    t0, t1 = _stamp(start), _stamp(end)
+    marks = entries(index_path)
+    with open(path, "rb") as f:
+        header = f.readline()
+        first = np.searchsorted(marks["t"], t0, side="right") - 1
+        begin = int(marks["offset"][first]) if first >= 0 else len(header)
+        after = np.searchsorted(marks["t"], t1, side="left")
+        stop = int(marks["offset"][after]) if after < len(marks) else os.path.getsize(path)
+        f.seek(begin)
+        chunk = f.read(stop - begin)
+    chunk = chunk[:chunk.rfind(b"\n") + 1]
+    columns = header.decode().rstrip("\r\n").split(",")[1:]
+    values, micros, _ = parse_rows(chunk, columns)
+    index = pd.DatetimeIndex(micros.view("datetime64[us]"), name=TIMESTAMP)
+    df = pd.DataFrame(values, index=index, columns=columns, copy=False)
+    return df[(index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))]
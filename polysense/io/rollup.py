@@ -0,0 +1,224 @@
+"""
+Multi-resolution rollups of a datalogger log, for fast time-range views.
+
+Per channel and per bin, count / sum / sum of squares / min / max are kept
+at 1-minute, 10-minute, 1-hour and 1-day resolution (bins on local time,
+days from midnight), from which mean, std, min and max of any bin follow.
+Levels are stored sparse (bins with data only), sorted, as flat files next
+to the ingest store of the log (polysense.io.ingest):
+
+    <store>/rollup/<level>.t     bin start, int64 seconds since the epoch
+    <store>/rollup/<level>.v     bins x 5 x channels float64
+    <store>/rollup/meta.json     columns, bins per level, store rows included
+
+rollups() brings them up to date with the rows the ingest store gained
+since the last call: only bins from the first one the new rows touch are
+rewritten, so the cost follows the new data. A store rebuilt by ingest (the
+log was replaced) takes its rollups with it and they are rebuilt too.
+
+query() answers from the finest level that fits a point budget, so a
+month or a year is a few hundred to a few thousand bins read from a
+memory map.
+
+Usage:
+    from polysense.io.rollup import rollups
+    r = rollups("datalog_final.csv")
+    hourly = r.query("2025-09-01", "2025-10-01", max_points=1000)
+    hourly["Temp_AHT20_C", "mean"]
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.ingest import ingest, read_store, store_path
+from polysense.io.schema import TIMESTAMP
+
+LEVELS = (("1min", 60), ("10min", 600), ("1h", 3600), ("1d", 86400))
+STATS = ("count", "sum", "sumsq", "min", "max")
+DERIVED = ("count", "mean", "std", "min", "max")
+
+_COUNT, _SUM, _SUMSQ, _MIN, _MAX = range(5)
+
+
+def _reduce(bins, values):
+    """Aggregate rows (sorted by bin) into one (5, channels) record per bin."""
+    starts = np.flatnonzero(np.diff(bins, prepend=bins[0] - 1))
+    present = ~np.isnan(values)
+    zero = np.where(present, values, 0.0)
+    out = np.empty((len(starts), 5, values.shape[1]))
+    out[:, _COUNT] = np.add.reduceat(present.astype(np.float64), starts)
+    out[:, _SUM] = np.add.reduceat(zero, starts)
+    out[:, _SUMSQ] = np.add.reduceat(zero * zero, starts)
+    out[:, _MIN] = np.minimum.reduceat(np.where(present, values, np.inf), starts)
+    out[:, _MAX] = np.maximum.reduceat(np.where(present, values, -np.inf), starts)
+    return bins[starts], out
+
+
+def _combine(bins, records):
+    """Merge records of equal bins (``bins`` sorted)."""
+    starts = np.flatnonzero(np.diff(bins, prepend=bins[0] - 1))
+    if len(starts) == len(bins):
+        return bins, records
+    out = np.empty((len(starts),) + records.shape[1:])
+    out[:, _COUNT:_SUMSQ + 1] = np.add.reduceat(records[:, _COUNT:_SUMSQ + 1], starts)
+    out[:, _MIN] = np.minimum.reduceat(records[:, _MIN], starts)
+    out[:, _MAX] = np.maximum.reduceat(records[:, _MAX], starts)
+    return bins[starts], out
+
+
+class RollupStore:
+    """
+    The rollup levels of one log.
+
+    Args:
+        path: Rollup directory (created on first add())
+        columns: Channel names; required to create the store
+    """
+
+    def __init__(self, path, columns=None):
+        self.path = path
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            if columns is None:
+                raise FileNotFoundError("no rollups at %s" % path) from None
+            self.meta = {"columns": list(columns), "source_rows": 0,
+                         "bins": {name: 0 for name, _ in LEVELS}}
+        self.columns = self.meta["columns"]
+
+    def _files(self, name):
+        return os.path.join(self.path, name + ".t"), os.path.join(self.path, name + ".v")
+
+    def level(self, name):
+        """(bin starts in seconds, records (bins, 5, channels)) of a level, memory-mapped."""
+        n = self.meta["bins"][name]
+        if not n:
+            return np.empty(0, np.int64), np.empty((0, 5, len(self.columns)))
+        times, values = self._files(name)
+        return (np.memmap(times, np.int64, "r", shape=(n,)),
+                np.memmap(values, np.float64, "r", shape=(n, 5, len(self.columns))))
+
+    def add(self, seconds, values):
+        """
+        Fold rows into every level.
+
+        Args:
+            seconds: Row timestamps, int64 seconds since the epoch
+            values: (rows, channels) array
+        """
+        if not len(seconds):
+            return
+        os.makedirs(self.path, exist_ok=True)
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(seconds, kind="stable")
+        seconds, values = seconds[order], values[order]
+        width = 5 * len(self.columns)
+        for name, step in LEVELS:
+            bins, records = _reduce(seconds - seconds % step, values)
+            old_times, old_records = self.level(name)
+            # rows are normally newer than every stored bin: only the tail from
+            # the first bin they touch is merged and rewritten
+            keep = int(np.searchsorted(old_times, bins[0]))
+            bins = np.concatenate((old_times[keep:], bins))
+            records = np.concatenate((old_records[keep:], records))
+            order = np.argsort(bins, kind="stable")
+            bins, records = _combine(bins[order], records[order])
+            del old_times, old_records
+            times_path, values_path = self._files(name)
+            for path, data, size in ((times_path, bins, 8), (values_path, records, 8 * width)):
+                with open(path, "ab") as f:
+                    f.truncate(keep * size)
+                    f.write(np.ascontiguousarray(data).tobytes())
+            self.meta["bins"][name] = keep + len(bins)
+
+    def save(self, source_rows):
+        """Record that the first ``source_rows`` rows of the log are included."""
+        self.meta["source_rows"] = source_rows
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def resolution(self, start, end, max_points):
+        """Finest level with at most ``max_points`` bins over [start, end) (else the coarsest)."""
+        span = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+        for name, step in LEVELS:
+            if span / step <= max_points:
+                return name
+        return LEVELS[-1][0]
+
+    def query(self, start, end, max_points=2000, columns=None, stats=DERIVED, level=None):
+        """
+        Bins of [start, end) at the finest level within the point budget.
+
+        Args:
+            start, end: Anything pandas.Timestamp accepts
+            max_points: Bins the view may hold
+            columns: Channels (default: all)
+            stats: Any of count, mean, std, min, max, sum, sumsq
+            level: Force a level ("1min", "10min", "1h", "1d")
+
+        Returns:
+            DataFrame indexed by bin start, columns (channel, stat); the
+            level used is in ``.attrs["resolution"]``
+        """
+        level = level or self.resolution(start, end, max_points)
+        times, records = self.level(level)
+        lo = np.searchsorted(times, pd.Timestamp(start).value // 10 ** 9)
+        hi = np.searchsorted(times, pd.Timestamp(end).value // 10 ** 9)
+        columns = list(columns) if columns is not None else self.columns
+        picks = [self.columns.index(c) for c in columns]
+        rec = np.asarray(records[lo:hi][:, :, picks])
+        count = rec[:, _COUNT]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = rec[:, _SUM] / count
+            var = (rec[:, _SUMSQ] - count * mean ** 2) / (count - 1)
+        empty = count == 0
+        derived = {
+            "count": count,
+            "sum": rec[:, _SUM],
+            "sumsq": rec[:, _SUMSQ],
+            "mean": mean,
+            "std": np.sqrt(np.maximum(np.where(count > 1, var, np.nan), 0.0)),
+            "min": np.where(empty, np.nan, rec[:, _MIN]),
+            "max": np.where(empty, np.nan, rec[:, _MAX]),
+        }
+        index = pd.DatetimeIndex(np.asarray(times[lo:hi]).astype("datetime64[s]"), name=TIMESTAMP)
+        data = {(c, s): derived[s][:, i] for i, c in enumerate(columns) for s in stats}
+        out = pd.DataFrame(data, index=index)
+        out.columns = pd.MultiIndex.from_tuples(out.columns, names=["channel", "stat"])
+        out.attrs["resolution"] = level
+        return out
+
+
+def rollup_path(store):
+    """Rollup directory of an ingest store."""
+    return os.path.join(store, "rollup")
+
+
+def rollups(path, cache_dir=None):
+    """
+    Ingest the log (polysense.io.ingest) and bring its rollups up to date.
+
+    Returns:
+        RollupStore
+    """
+    store = store_path(path, cache_dir)
+    ingest(path, store)
+    frame = read_store(store)
+    rollup = RollupStore(rollup_path(store), list(frame.columns))
+    if rollup.columns != list(frame.columns) or rollup.meta["source_rows"] > len(frame):
+        shutil.rmtree(rollup.path, ignore_errors=True)
+        rollup = RollupStore(rollup.path, list(frame.columns))
+    done = rollup.meta["source_rows"]
+    if done < len(frame):
+        new = frame.iloc[done:]
+        seconds = new.index.values.astype("datetime64[s]").astype(np.int64)
+        rollup.add(seconds, new.to_numpy(dtype=np.float64))
+        rollup.save(len(frame))
+    return rollup
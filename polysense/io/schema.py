@@ -0,0 +1,50 @@
+"""
+Column registry of the PolySense datalogger CSV.
+
+Mirrors ``csv_header`` in main.py (and the header stored in ring logs):
+keep both in the same order when a sensor is added or renamed. Every
+measurement column is float32, the timestamp becomes a datetime64 index.
+"""
+
+from collections import namedtuple
+
+Column = namedtuple("Column", "name quantity sensor unit")
+
+TIMESTAMP = "Timestamp"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DTYPE = "float32"
+
+COLUMNS = (
+    Column("Temp_MPU6050_C", "temperature", "MPU6050", "C"),
+    Column("Temp_AHT20_C", "temperature", "AHT20", "C"),
+    Column("Umid_AHT20_pct", "humidity", "AHT20", "%"),
+    Column("Temp_BMP280_C", "temperature", "BMP280", "C"),
+    Column("Press_BMP280_hPa", "pressure", "BMP280", "hPa"),
+    Column("Temp_BMP180_C", "temperature", "BMP180", "C"),
+    Column("Press_BMP180_hPa", "pressure", "BMP180", "hPa"),
+    Column("Temp_DS18B20_C", "temperature", "DS18B20", "C"),
+    Column("Temp_NTC_C", "temperature", "NTC", "C"),
+    Column("Temp_DHT11_C", "temperature", "DHT11", "C"),
+    Column("Umid_DHT11_pct", "humidity", "DHT11", "%"),
+)
+
+BY_NAME = {c.name: c for c in COLUMNS}
+
+# The header line main.py writes (without the newline)
+HEADER = ",".join((TIMESTAMP,) + tuple(c.name for c in COLUMNS))
+
+# Bump when the parsed representation changes, to invalidate caches
+VERSION = 1
+
+
+def columns(quantity=None, sensor=None):
+    """Names of the measurement columns, optionally of one quantity and/or sensor."""
+    return [c.name for c in COLUMNS
+            if (quantity is None or c.quantity == quantity)
+            and (sensor is None or c.sensor == sensor)]
+
+
+TEMPERATURE = columns("temperature")
+HUMIDITY = columns("humidity")
+PRESSURE = columns("pressure")
+SENSORS = TEMPERATURE + HUMIDITY + PRESSURE
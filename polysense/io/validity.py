@@ -0,0 +1,245 @@
+"""
+Run-length validity index of a log: completeness and gaps without scanning rows.
+
+Per channel, the runs of missing readings are kept as sorted row intervals
+[start, stop), with a running total of their lengths. Any question about a
+time range then costs two binary searches (row timestamps -> rows, rows ->
+runs) plus the runs inside the range, not the rows:
+
+    completeness()  % of readings present per channel
+    gaps()          the missing runs of a channel (start, end, rows), clipped
+    co_missing()    rows missing in both of each pair of channels
+    patterns()      which channels are missing together, and for how long
+
+It is built once (from_frame(), or validity() for a growing log, next to
+its ingest store as <store>/validity.npz) and extended with the new rows
+only. Row timestamps are assumed to grow, as in the ingest store.
+
+Usage:
+    from polysense.io.validity import ValidityIndex, validity
+    index = ValidityIndex.from_frame(df)           # or validity("datalog_final.csv")
+    index.completeness("2025-09-15", "2025-09-22")
+    index.gaps("Temp_DHT11_C", "2025-09-15", "2025-09-22").nlargest(1, "rows")
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from polysense.io.ingest import ingest, read_store, store_path
+from polysense.io.schema import TIMESTAMP
+
+INDEX_FILE = "validity.npz"
+
+
+def runs(mask):
+    """Start positions and lengths of the runs of True in a 1-D boolean array."""
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def _micros(stamp):
+    return pd.Timestamp(stamp).value // 1000
+
+
+class ValidityIndex:
+    """
+    Missing-reading runs of every channel of a log.
+
+    Args:
+        columns: Channel names
+        times: Row timestamps, int64 microseconds (may be a memory map)
+        starts, stops: Per channel, sorted int64 arrays of missing runs
+    """
+
+    def __init__(self, columns, times=None, starts=None, stops=None):
+        self.columns = list(columns)
+        self.times = np.empty(0, np.int64) if times is None else times
+        empty = [np.empty(0, np.int64) for _ in self.columns]
+        self.starts = list(starts) if starts is not None else empty
+        self.stops = list(stops) if stops is not None else list(empty)
+        self._totals()
+
+    def _totals(self):
+        # missing rows in runs 0 .. k-1, per channel
+        self.cumulative = [np.concatenate(([0], np.cumsum(b - a))) for a, b in
+                           zip(self.starts, self.stops)]
+
+    @property
+    def rows(self):
+        return len(self.times)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """Index of a frame (Timestamp column or DatetimeIndex)."""
+        columns = [c for c in df.columns if c != TIMESTAMP] if columns is None else list(columns)
+        index = cls(columns)
+        index.extend(_stamps(df), df[columns].to_numpy())
+        return index
+
+    def extend(self, times, values):
+        """Add rows (timestamps in int64 microseconds, (rows, channels) values)."""
+        offset = self.rows
+        missing = np.isnan(np.asarray(values, dtype=np.float64).reshape(len(times), len(self.columns)))
+        for j in range(len(self.columns)):
+            a, n = runs(missing[:, j])
+            a = a + offset
+            b = a + n
+            if len(a) and len(self.stops[j]) and self.stops[j][-1] == offset and a[0] == offset:
+                # the new rows continue the last run
+                self.stops[j] = self.stops[j].copy()
+                self.stops[j][-1] = b[0]
+                a, b = a[1:], b[1:]
+            self.starts[j] = np.concatenate((self.starts[j], a))
+            self.stops[j] = np.concatenate((self.stops[j], b))
+        self.times = np.concatenate((np.asarray(self.times, np.int64), np.asarray(times, np.int64)))
+        self._totals()
+
+    # --- queries ---
+    def _row(self, stamp, default):
+        if stamp is None:
+            return default
+        return int(np.searchsorted(self.times, _micros(stamp)))
+
+    def _span(self, start, end):
+        return self._row(start, 0), self._row(end, self.rows)
+
+    def _missing_before(self, j, row):
+        """Missing rows of channel j before ``row``."""
+        k = int(np.searchsorted(self.stops[j], row, side="right"))
+        count = int(self.cumulative[j][k])
+        if k < len(self.starts[j]) and self.starts[j][k] < row:
+            count += row - int(self.starts[j][k])
+        return count
+
+    def missing(self, start=None, end=None):
+        """Missing readings per channel in [start, end) (Series)."""
+        lo, hi = self._span(start, end)
+        counts = [self._missing_before(j, hi) - self._missing_before(j, lo) if hi > lo else 0
+                  for j in range(len(self.columns))]
+        return pd.Series(counts, index=self.columns, name="missing")
+
+    def completeness(self, start=None, end=None):
+        """% of readings present per channel in [start, end) (Series)."""
+        lo, hi = self._span(start, end)
+        missing = self.missing(start, end)
+        total = max(hi - lo, 0)
+        out = 100.0 * (total - missing) / total if total else missing * np.nan
+        return out.rename("complete_pct")
+
+    def _clipped(self, j, lo, hi):
+        a = int(np.searchsorted(self.stops[j], lo, side="right"))
+        b = int(np.searchsorted(self.starts[j], hi, side="left"))
+        return (np.clip(self.starts[j][a:b], lo, hi), np.clip(self.stops[j][a:b], lo, hi))
+
+    def gaps(self, column, start=None, end=None, min_rows=1):
+        """
+        Missing runs of ``column`` within [start, end).
+
+        Returns:
+            DataFrame: start, end (timestamps of the first / last missing
+            row), rows
+        """
+        lo, hi = self._span(start, end)
+        a, b = self._clipped(self.columns.index(column), lo, hi)
+        keep = b - a >= min_rows
+        a, b = a[keep], b[keep]
+        return pd.DataFrame({"start": self._stamps(a), "end": self._stamps(b - 1), "rows": b - a})
+
+    def _stamps(self, rows):
+        return pd.DatetimeIndex(np.asarray(self.times)[rows].astype("datetime64[us]"))
+
+    def _segments(self, lo, hi, columns):
+        """Row segments of [lo, hi) between run edges: (lengths, (segments, channels) missing)."""
+        picked = [self.columns.index(c) for c in columns]
+        clipped = [self._clipped(j, lo, hi) for j in picked]
+        edges = np.unique(np.concatenate([[lo, hi]] + [np.concatenate(c) for c in clipped]))
+        left = edges[:-1]
+        inside = np.zeros((len(left), len(picked)), dtype=bool)
+        for i, (a, b) in enumerate(clipped):
+            k = np.searchsorted(a, left, side="right") - 1
+            inside[:, i] = (k >= 0) & (left < b[np.maximum(k, 0)]) if len(a) else False
+        return np.diff(edges), inside
+
+    def co_missing(self, start=None, end=None, columns=None):
+        """Rows missing in both channels, for every pair (DataFrame; diagonal: per channel)."""
+        columns = self.columns if columns is None else list(columns)
+        lo, hi = self._span(start, end)
+        lengths, inside = self._segments(lo, hi, columns)
+        weighted = inside.T.astype(np.int64) * lengths
+        return pd.DataFrame(weighted @ inside.astype(np.int64), index=columns, columns=columns)
+
+    def patterns(self, start=None, end=None, columns=None):
+        """
+        Combinations of channels missing at the same rows.
+
+        Returns:
+            DataFrame, one row per combination (most rows first): missing
+            (channel names), rows, segments (separate stretches)
+        """
+        columns = self.columns if columns is None else list(columns)
+        lo, hi = self._span(start, end)
+        lengths, inside = self._segments(lo, hi, columns)
+        some = inside.any(axis=1)
+        if not some.any():
+            return pd.DataFrame({"missing": [], "rows": [], "segments": []})
+        keys, inverse = np.unique(inside[some], axis=0, return_inverse=True)
+        rows = np.bincount(inverse.ravel(), lengths[some])
+        segments = np.bincount(inverse.ravel())
+        names = [", ".join(c for c, m in zip(columns, key) if m) for key in keys]
+        out = pd.DataFrame({"missing": names, "rows": rows.astype(np.int64), "segments": segments})
+        return out.sort_values("rows", ascending=False, ignore_index=True)
+
+    # --- storage ---
+    def save(self, path):
+        counts = np.array([len(a) for a in self.starts], np.int64)
+        np.savez(path, columns=np.array([str(c) for c in self.columns]), rows=np.array(self.rows),
+                 counts=counts, starts=np.concatenate(self.starts or [np.empty(0, np.int64)]),
+                 stops=np.concatenate(self.stops or [np.empty(0, np.int64)]))
+
+    @classmethod
+    def load(cls, path, times):
+        """Index saved at ``path``, for rows stamped ``times``."""
+        with np.load(path) as f:
+            if int(f["rows"]) > len(times):
+                raise ValueError("%s covers more rows than given" % path)
+            splits = np.cumsum(f["counts"])[:-1]
+            return cls([str(c) for c in f["columns"]], np.asarray(times)[:int(f["rows"])],
+                       np.split(f["starts"], splits), np.split(f["stops"], splits))
+
+
+def _stamps(df):
+    stamps = pd.DatetimeIndex(df[TIMESTAMP]) if TIMESTAMP in df.columns else df.index
+    return np.asarray(stamps, dtype="datetime64[us]").astype(np.int64)
+
+
+def validity(path, cache_dir=None):
+    """
+    Ingest the log (polysense.io.ingest) and bring its validity index up to date.
+
+    Returns:
+        ValidityIndex
+    """
+    store = store_path(path, cache_dir)
+    ingest(path, store)
+    frame = read_store(store)
+    file = os.path.join(store, INDEX_FILE)
+    times = _stamps(frame)
+    index = None
+    if os.path.exists(file):
+        try:
+            index = ValidityIndex.load(file, times)
+        except ValueError:
+            index = None
+        if index is not None and index.columns != list(frame.columns):
+            index = None
+    if index is None:
+        index = ValidityIndex(list(frame.columns))
+    done = index.rows
+    if done < len(frame):
+        index.extend(times[done:], frame.iloc[done:].to_numpy())
+        index.save(file)
+    index.times = times
+    return index
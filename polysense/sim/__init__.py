@@ -0,0 +1,22 @@
+"""
+Simulated hardware for the PolySense firmware.
+
+hil         Runs the unmodified main.py and lib/ against the models below
+            and benchmarks cycle time, bus traffic and SD writes per record
+board       Simulated RP2040: GPIO nets, I2C/SPI buses, ADC, RTC, soft
+            timers on an accelerated virtual clock
+devices     Register- and pulse-level sensor, display and button models
+sdcard      SPI-mode SD card backed by a memory-mapped disk image, with
+            per-block counters and a latency model
+fat         FAT32 over a block device (stands in for VfsFat), mkfs, and
+            a map of image blocks to FAT regions
+bench_sdwrite
+            Card traffic per row of the logging strategies (append,
+            buffered, synced, ring)
+pins        Virtual microsecond clock, open-drain lines and a pin-level I2C
+            target, for benchmarking bit-banged buses
+collector   Stub HTTP collector for lib/uplink.py
+run_uplink  Runs lib/uplink.py against a local collector or MQTT broker
+stubs/      Fake MicroPython modules (machine, micropython, framebuf,
+            network); put on sys.path, not imported as a package
+"""
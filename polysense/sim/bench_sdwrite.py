@@ -0,0 +1,179 @@
+"""
+Benchmark SD write patterns of the logger on the emulated card.
+
+Each strategy runs the firmware's own lib/sdcard.py (and lib/ringlog.py)
+over the SPI card model on a freshly formatted image, appends the same
+rows, and reports the card traffic per row: blocks written and read, the
+write amplification (bytes programmed per payload byte), where the writes
+land (FAT, root directory, data; see fat.RegionMap), the most rewritten
+block, and the card busy and total time per row under the latency model in
+polysense/sim/sdcard.py.
+
+Strategies:
+    append    open('a') / write / close per row (main.py, LOG_MODE "csv")
+    buffered  rows kept in RAM, one open/append/close every --buffer rows
+    synced    file kept open, flush() (f_sync) after every row
+    ring      preallocated ring log, LOG_MODE "ring" (lib/ringlog.py)
+
+Usage:
+    python -m polysense.sim.bench_sdwrite [--rows 1000] [--buffer 16] [--json]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from polysense.sim.board import Board
+from polysense.sim.fat import RegionMap, mkfs
+from polysense.sim.hil import Firmware
+from polysense.sim.sdcard import SDCard
+
+CSV_HEADER = (
+    "Timestamp,Temp_MPU6050_C,Temp_AHT20_C,Umid_AHT20_pct,"
+    "Temp_BMP280_C,Press_BMP280_hPa,Temp_BMP180_C,Press_BMP180_hPa,"
+    "Temp_DS18B20_C,Temp_NTC_C,Temp_DHT11_C,Umid_DHT11_pct\n"
+)
+
+
+def make_rows(n):
+    """``n`` rows shaped like main.py's, 30 s apart."""
+    rows = []
+    for i in range(n):
+        s = i * 30
+        rows.append("2025-09-01 %02d:%02d:%02d,18.%02d,17.07,77.44,17.36,909.02,16.39,908.01,"
+                    "16.62,16.56,17.08,84.00\n" % (s // 3600 % 24, s // 60 % 60, s % 60, i % 100))
+    return rows
+
+
+def _append(fw, rows, buffer):
+    for row in rows:
+        with fw.os.open("/sd/datalog_final.csv", "a") as f:
+            f.write(row)
+
+
+def _buffered(fw, rows, buffer):
+    pending = []
+    for row in rows:
+        pending.append(row)
+        if len(pending) == buffer:
+            with fw.os.open("/sd/datalog_final.csv", "a") as f:
+                f.write("".join(pending))
+            pending = []
+    if pending:
+        with fw.os.open("/sd/datalog_final.csv", "a") as f:
+            f.write("".join(pending))
+
+
+def _synced(fw, rows, buffer):
+    with fw.os.open("/sd/datalog_final.csv", "a") as f:
+        for row in rows:
+            f.write(row)
+            f.flush()
+
+
+def _ring(fw, rows, buffer):
+    ring = fw.ring
+    for row in rows:
+        ring.append(row)
+
+
+STRATEGIES = {
+    "append": _append,
+    "buffered": _buffered,
+    "synced": _synced,
+    "ring": _ring,
+}
+
+
+def run(strategy, rows, buffer=16, ring_records=4096, image_mb=64, latency=None):
+    """
+    Log ``rows`` with one strategy on a fresh image.
+
+    Returns:
+        dict: Per-row card traffic (mounting and file creation excluded)
+    """
+    tmpdir = tempfile.mkdtemp(prefix="polysense-sd-")
+    image = os.path.join(tmpdir, "sd.img")
+    try:
+        mkfs(image, image_mb << 20)
+        board = Board()
+        card = board.spi_bus(1).attach(SDCard(board, image, latency=latency), board.net(13))
+        fw = Firmware(board)
+        machine = fw.load("machine")
+        sdcard = fw.load("sdcard")
+        sd = sdcard.SDCard(machine.SPI(1, baudrate=1000000), machine.Pin(13, machine.Pin.OUT))
+        fw.os.mount(sd, "/sd")
+        if strategy == "ring":
+            fw.ring = fw.load("ringlog").RingLog("/sd/datalog.ring", records=ring_records,
+                                                 header=CSV_HEADER)
+        else:
+            with fw.os.open("/sd/datalog_final.csv", "w") as f:
+                f.write(CSV_HEADER)
+
+        card.reset_counters()
+        t0 = board.clock.now_us
+        STRATEGIES[strategy](fw, rows, buffer)
+        elapsed_us = board.clock.now_us - t0
+        stats = card.stats()
+        regions = RegionMap.from_image(image)
+        hot, hot_n = card.writes.most_common(1)[0] if card.writes else (None, 0)
+        n = len(rows)
+        payload = sum(len(r) for r in rows)
+        card.close()
+    finally:
+        shutil.rmtree(tmpdir)
+    return {
+        "strategy": strategy,
+        "rows": n,
+        "blocks_written": round(stats["blocks_written"] / n, 3),
+        "blocks_read": round(stats["blocks_read"] / n, 3),
+        "write_amplification": round(stats["blocks_written"] * 512 / payload, 1),
+        "written_by_region": {k: round(v / n, 3)
+                              for k, v in regions.summary(card.writes).items()},
+        "hottest_block": {"block": hot, "writes": hot_n, "region": regions.region(hot),
+                          "owner": regions.owner(hot)} if hot is not None else None,
+        "au_switches": round(stats["au_switches"] / n, 3),
+        "card_busy_ms": round(stats["busy_ms"] / n, 3),
+        "total_ms": round(elapsed_us / 1000 / n, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SD write patterns on the emulated card")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--buffer", type=int, default=16, help="rows per write when buffered")
+    parser.add_argument("--ring-records", type=int, default=4096)
+    parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES),
+                        help="run only these (repeatable)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    results = [run(name, rows, args.buffer, args.ring_records)
+               for name in (args.strategy or STRATEGIES)]
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    print("per row (%d rows of ~%d bytes)" % (args.rows, len(rows[0])))
+    print("%-9s %8s %8s %7s %9s %8s   %s" % ("strategy", "written", "read", "amplif",
+                                               "busy ms", "total ms", "written by region"))
+    for r in results:
+        regions = ", ".join("%s %.2f" % kv for kv in r["written_by_region"].items())
+        print("%-9s %8.2f %8.2f %6.1fx %9.2f %8.2f   %s" % (
+            r["strategy"], r["blocks_written"], r["blocks_read"], r["write_amplification"],
+            r["card_busy_ms"], r["total_ms"], regions))
+    print()
+    for r in results:
+        hot = r["hottest_block"]
+        if hot:
+            print("%-9s hottest block %d (%s%s) written %d times" % (
+                r["strategy"], hot["block"], hot["region"],
+                ", " + hot["owner"] if hot["owner"] else "", hot["writes"]))
+
+
+if __name__ == "__main__":
+    main()
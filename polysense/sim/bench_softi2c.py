@@ -0,0 +1,434 @@
+"""
+Benchmark bit-banged I2C masters on simulated pins.
+
+Runs the PCB firmware's ``softi2c.SoftI2C``, a Python port of MicroPython's
+``machine.SoftI2C`` (extmod/machine_i2c.c) and the old SoftI2C class from
+mpu6050_temp.py against the same pin-level MPU6050 model, on a virtual
+clock. Pin accesses and sleeps are counted exactly; their cost on the
+RP2040 comes from the profiles below, which are estimates (override them
+from the command line after measuring with PCB/Firmware/bench_i2c.py).
+
+The viper bit loops of softi2c only run on the RP2040, so they are not
+timed here: check_viper() runs their logic as plain Python against the same
+MPU6050 model, through a model of the SIO registers they poke, and checks
+the bytes read. Their speed is measured on the board by bench_i2c.py.
+
+Usage:
+    python -m polysense.sim.bench_softi2c [--rounds 50] [--stretch-us 0]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import types
+
+from polysense.sim.pins import I2CTarget, Line, SimPin, VirtualClock
+
+FIRMWARE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "PCB", "Firmware")
+
+MPU6050_ADDR = 0x68
+MPU6050_REGS = {0x75: 0x68}
+MPU6050_REGS.update({0x3B + i: (0x10 * i + 3) & 0xFF for i in range(14)})
+
+# Estimated RP2040 @ 125 MHz costs (us): pin access, runtime call overhead
+PROFILES = {
+    "machine.SoftI2C": {"pin_us": 0.05, "call_us": 0.0},
+    "softi2c (Pin objects)": {"pin_us": 1.5, "call_us": 1.0},
+    "legacy SoftI2C": {"pin_us": 1.5, "call_us": 1.0, "sleep_us": 20.0},
+}
+
+
+class MachineSoftI2C:
+    """Python port of the machine.SoftI2C bit sequence (extmod/machine_i2c.c)."""
+
+    def __init__(self, scl, sda, clock, freq=400000, timeout_us=50000):
+        self.scl = scl
+        self.sda = sda
+        self.clock = clock
+        self.us_delay = max(1, 500000 // freq)
+        self.us_timeout = timeout_us
+        self._stop()
+
+    def _delay(self):
+        self.clock.charge(self.us_delay)
+
+    def _scl_release(self):
+        count = self.us_timeout
+        self.scl(1)
+        self._delay()
+        while self.scl() == 0 and count:
+            self.clock.charge(1)
+            count -= 1
+        if count == 0:
+            raise OSError(110)
+
+    def _start(self):
+        self.sda(1)
+        self._delay()
+        self._scl_release()
+        self.sda(0)
+        self._delay()
+
+    def _stop(self):
+        self._delay()
+        self.sda(0)
+        self._delay()
+        self._scl_release()
+        self.sda(1)
+        self._delay()
+
+    def _write_byte(self, val):
+        self._delay()
+        self.scl(0)
+        for i in range(7, -1, -1):
+            self.sda((val >> i) & 1)
+            self._delay()
+            self._scl_release()
+            self.scl(0)
+        self.sda(1)
+        self._delay()
+        self._scl_release()
+        ack = self.sda()
+        self._delay()
+        self.scl(0)
+        return not ack
+
+    def _read_byte(self, nack):
+        self._delay()
+        self.scl(0)
+        self._delay()
+        data = 0
+        for i in range(8):
+            self._scl_release()
+            data = (data << 1) | self.sda()
+            self.scl(0)
+            self._delay()
+        if not nack:
+            self.sda(0)
+        self._delay()
+        self._scl_release()
+        self.scl(0)
+        self.sda(1)
+        return data
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        self._start()
+        if not self._write_byte(addr << 1) or not self._write_byte(reg):
+            self._stop()
+            raise OSError(19)
+        self._start()
+        if not self._write_byte((addr << 1) | 1):
+            self._stop()
+            raise OSError(19)
+        for i in range(len(buf)):
+            buf[i] = self._read_byte(i == len(buf) - 1)
+        self._stop()
+
+    def readfrom_mem(self, addr, reg, n):
+        buf = bytearray(n)
+        self.readfrom_mem_into(addr, reg, buf)
+        return bytes(buf)
+
+
+class LegacySoftI2C:
+    """The SoftI2C class formerly in mpu6050_temp.py (time.sleep(1e-5) per step)."""
+
+    def __init__(self, scl, sda, clock, sleep_us):
+        self.scl = scl
+        self.sda = sda
+        self.clock = clock
+        self.sleep_cost = sleep_us
+
+    def _sleep(self):
+        self.clock.charge(self.sleep_cost)
+
+    def start(self):
+        self.sda.init(SimPin.OUT)
+        self.sda.value(1)
+        self.scl.value(1)
+        self._sleep()
+        self.sda.value(0)
+        self._sleep()
+        self.scl.value(0)
+        self._sleep()
+
+    def stop(self):
+        self.sda.init(SimPin.OUT)
+        self.sda.value(0)
+        self._sleep()
+        self.scl.value(1)
+        self._sleep()
+        self.sda.value(1)
+        self._sleep()
+
+    def write_byte(self, byte):
+        self.sda.init(SimPin.OUT)
+        for i in range(8):
+            self.sda.value((byte >> (7 - i)) & 1)
+            self._sleep()
+            self.scl.value(1)
+            self._sleep()
+            self.scl.value(0)
+            self._sleep()
+        self.sda.init(SimPin.IN, SimPin.PULL_UP)
+        self._sleep()
+        self.scl.value(1)
+        self._sleep()
+        ack = self.sda.value()
+        self.scl.value(0)
+        self._sleep()
+        return ack == 0
+
+    def read_byte(self, ack=True):
+        self.sda.init(SimPin.IN, SimPin.PULL_UP)
+        byte = 0
+        for i in range(8):
+            self._sleep()
+            self.scl.value(1)
+            self._sleep()
+            byte = (byte << 1) | self.sda.value()
+            self.scl.value(0)
+        self.sda.init(SimPin.OUT)
+        self.sda.value(0 if ack else 1)
+        self._sleep()
+        self.scl.value(1)
+        self._sleep()
+        self.scl.value(0)
+        self._sleep()
+        return byte
+
+    def readfrom_mem(self, addr, reg, num_bytes):
+        self.start()
+        if not self.write_byte(addr << 1) or not self.write_byte(reg):
+            self.stop()
+            raise OSError("Device not responding")
+        self.start()
+        if not self.write_byte((addr << 1) | 1):
+            self.stop()
+            raise OSError("Read failed")
+        data = bytearray()
+        for i in range(num_bytes):
+            data.append(self.read_byte(ack=(i < num_bytes - 1)))
+        self.stop()
+        return bytes(data)
+
+    def readfrom_mem_into(self, addr, reg, buf):
+        buf[:] = self.readfrom_mem(addr, reg, len(buf))
+
+
+def _load_softi2c():
+    sys.path.insert(0, os.path.abspath(FIRMWARE_DIR))
+    try:
+        import softi2c
+    finally:
+        sys.path.pop(0)
+    return softi2c
+
+
+class SioRegisters:
+    """
+    RP2040 SIO GPIO registers on simulated Lines, as the viper loops use them.
+
+    GPIO_IN reads the lines; GPIO_OE_SET / GPIO_OE_CLR enable / disable the
+    driver of each pin in the mask (OUT is 0, so enabled means pulled low).
+
+    Args:
+        lines: {GPIO number: Line}
+        clock: VirtualClock, charged ``op_us`` per register access
+    """
+
+    def __init__(self, lines, clock, op_us=0.01):
+        self.lines = lines
+        self.clock = clock
+        self.op_us = op_us
+        self.accesses = 0
+
+    def ptr32(self, addr):
+        regs = self
+
+        class Register:
+            def __getitem__(self, i):
+                regs._access()
+                if addr & 0xFF != 0x04:
+                    raise AssertionError("viper loop read SIO register 0x%02X" % (addr & 0xFF))
+                return sum(line.read() << gpio for gpio, line in regs.lines.items())
+
+            def __setitem__(self, i, mask):
+                regs._access()
+                offset = addr & 0xFF
+                if offset not in (0x24, 0x28):
+                    raise AssertionError("viper loop wrote SIO register 0x%02X" % offset)
+                for gpio, line in regs.lines.items():
+                    if mask >> gpio & 1:
+                        line.drive(regs, offset == 0x24)
+
+        return Register()
+
+    def _access(self):
+        self.accesses += 1
+        self.clock.charge(self.op_us)
+
+
+def _load_softi2c_rp2(sio, clock):
+    """softi2c as it imports on the RP2040 (viper path), with ptr32 on ``sio``."""
+    fakes = {"micropython": types.SimpleNamespace(viper=lambda f: f)}
+    saved = {name: sys.modules.get(name) for name in fakes}
+    platform = sys.platform
+    spec = importlib.util.spec_from_file_location(
+        "softi2c_rp2", os.path.join(os.path.abspath(FIRMWARE_DIR), "softi2c.py"))
+    module = importlib.util.module_from_spec(spec)
+    try:
+        sys.modules.update(fakes)
+        sys.platform = "rp2"
+        spec.loader.exec_module(module)
+    finally:
+        sys.platform = platform
+        for name, old in saved.items():
+            if old is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = old
+    module.ptr32 = sio.ptr32
+    module.time = clock
+    return module
+
+
+def check_viper(rounds, stretch_us, scl_gpio=4, sda_gpio=5):
+    """
+    Run the viper bit loops' logic against the MPU6050 model and check every byte.
+
+    Returns:
+        dict: SIO register accesses per 14-byte burst, target transactions
+    """
+    clock = VirtualClock()
+    scl_line, sda_line = Line("SCL"), Line("SDA")
+    target = I2CTarget(scl_line, sda_line, clock, MPU6050_ADDR, MPU6050_REGS,
+                       stretch_us=stretch_us)
+    sio = SioRegisters({scl_gpio: scl_line, sda_gpio: sda_line}, clock)
+    softi2c = _load_softi2c_rp2(sio, clock)
+
+    class Pin:
+        IN, PULL_UP = 0, 1
+
+        def __init__(self, *args):
+            pass
+
+    machine = types.SimpleNamespace(Pin=Pin, mem32={})
+    saved = sys.modules.get("machine")
+    sys.modules["machine"] = machine
+    try:
+        i2c = softi2c.SoftI2C(scl_gpio, sda_gpio)
+    finally:
+        if saved is None:
+            sys.modules.pop("machine")
+        else:
+            sys.modules["machine"] = saved
+    if not i2c._viper:
+        raise AssertionError("softi2c did not take the viper path")
+    i2c._loops = 1  # the delay loops only pace the bus; keep them short here
+
+    for _ in range(rounds):
+        who = i2c.readfrom_mem(MPU6050_ADDR, 0x75, 1)[0]
+        if who != 0x68:
+            raise AssertionError(f"viper: WHO_AM_I read 0x{who:02X}")
+    buf = bytearray(14)
+    expected = bytes(MPU6050_REGS[0x3B + i] for i in range(14))
+    accesses0 = sio.accesses
+    for _ in range(rounds):
+        i2c.readfrom_mem_into(MPU6050_ADDR, 0x3B, buf)
+        if bytes(buf) != expected:
+            raise AssertionError(f"viper: burst read {bytes(buf).hex()} != {expected.hex()}")
+    return {"accesses": (sio.accesses - accesses0) / rounds,
+            "transactions": target.transactions}
+
+
+def run(name, profile, rounds, stretch_us, freq=400000):
+    """
+    Time WHO_AM_I reads and 14-byte bursts for one master.
+
+    Returns:
+        dict: virtual us per transaction, pin ops per burst, effective kHz
+    """
+    clock = VirtualClock(call_us=profile["call_us"])
+    scl_line, sda_line = Line("SCL"), Line("SDA")
+    target = I2CTarget(scl_line, sda_line, clock, MPU6050_ADDR, MPU6050_REGS,
+                       stretch_us=stretch_us)
+    scl = SimPin(scl_line, clock, profile["pin_us"])
+    sda = SimPin(sda_line, clock, profile["pin_us"])
+
+    if name == "machine.SoftI2C":
+        i2c = MachineSoftI2C(scl, sda, clock, freq)
+    elif name == "legacy SoftI2C":
+        i2c = LegacySoftI2C(scl, sda, clock, profile["sleep_us"])
+    else:
+        softi2c = _load_softi2c()
+        softi2c.time = clock
+        i2c = softi2c.SoftI2C(scl, sda, freq=freq)
+
+    who = i2c.readfrom_mem(MPU6050_ADDR, 0x75, 1)[0]
+    if who != 0x68:
+        raise AssertionError(f"{name}: WHO_AM_I read 0x{who:02X}")
+
+    t0 = clock.now_us
+    for _ in range(rounds):
+        i2c.readfrom_mem(MPU6050_ADDR, 0x75, 1)
+    single_us = (clock.now_us - t0) / rounds
+
+    buf = bytearray(14)
+    ops0 = scl.ops + sda.ops
+    inits0 = sda.inits
+    t0 = clock.now_us
+    for _ in range(rounds):
+        i2c.readfrom_mem_into(MPU6050_ADDR, 0x3B, buf)
+    burst_us = (clock.now_us - t0) / rounds
+    expected = bytes(MPU6050_REGS[0x3B + i] for i in range(14))
+    if bytes(buf) != expected:
+        raise AssertionError(f"{name}: burst read {bytes(buf).hex()} != {expected.hex()}")
+
+    return {
+        "single_us": single_us,
+        "burst_us": burst_us,
+        "pin_ops": (scl.ops + sda.ops - ops0) / rounds,
+        "reinits": (sda.inits - inits0) / rounds,
+        "khz": 17 * 9 / burst_us * 1000,
+        "transactions": target.transactions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bit-banged I2C on simulated pins")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--freq", type=int, default=400000)
+    parser.add_argument("--stretch-us", type=float, default=0.0,
+                        help="target clock stretching after every byte")
+    parser.add_argument("--py-pin-us", type=float, help="override Python pin access cost")
+    parser.add_argument("--legacy-sleep-us", type=float, help="override time.sleep(1e-5) cost")
+    args = parser.parse_args()
+
+    profiles = {name: dict(p) for name, p in PROFILES.items()}
+    if args.py_pin_us is not None:
+        profiles["softi2c (Pin objects)"]["pin_us"] = args.py_pin_us
+        profiles["legacy SoftI2C"]["pin_us"] = args.py_pin_us
+    if args.legacy_sleep_us is not None:
+        profiles["legacy SoftI2C"]["sleep_us"] = args.legacy_sleep_us
+
+    print(f"Simulated MPU6050 at 0x{MPU6050_ADDR:02X}, SCL {args.freq // 1000} kHz, "
+          f"clock stretching {args.stretch_us} us/byte, {args.rounds} rounds")
+    print(f"{'master':<24}{'1 byte (us)':>12}{'14 bytes (us)':>15}{'pin ops':>10}"
+          f"{'re-inits':>10}{'eff. kHz':>10}")
+    for name, profile in profiles.items():
+        if name == "legacy SoftI2C" and args.stretch_us:
+            print(f"{name:<24}{'(no clock-stretching support)':>57}")
+            continue
+        r = run(name, profile, args.rounds, args.stretch_us, args.freq)
+        print(f"{name:<24}{r['single_us']:>12.1f}{r['burst_us']:>15.1f}{r['pin_ops']:>10.0f}"
+              f"{r['reinits']:>10.0f}{r['khz']:>10.0f}")
+    v = check_viper(args.rounds, args.stretch_us)
+    print(f"{'softi2c (viper)':<24}bit loops read every byte correctly "
+          f"({v['accesses']:.0f} SIO accesses per 14 bytes); not timed here, "
+          f"run PCB/Firmware/bench_i2c.py on the board")
+
+
+if __name__ == "__main__":
+    main()
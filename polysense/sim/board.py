@@ -0,0 +1,279 @@
+"""
+Simulated RP2040 board: GPIO nets, I2C/SPI buses, ADC, RTC and soft timers
+on an accelerated virtual clock.
+
+The stand-in ``machine`` module (polysense/sim/stubs/machine.py) forwards
+every peripheral access to the attached Board, which charges its cost to
+the clock and routes it to the device models wired to that pin or bus.
+Sleeping advances the clock instantly, so ``time.sleep(30)`` costs nothing;
+due soft-timer callbacks run at the moment the sleep passes them.
+"""
+
+import calendar
+import errno
+import time as _time
+
+from polysense.sim.pins import VirtualClock
+
+# Estimated RP2040 @ 125 MHz costs (us) of MicroPython-level operations
+DEFAULT_COSTS = {
+    "call_us": 1.0,       # sleep_*/ticks_* call overhead
+    "pin_us": 1.5,        # Pin.value() / pin(x)
+    "pin_init_us": 6.0,   # Pin.init()
+    "i2c_call_us": 20.0,  # machine.I2C method overhead
+    "spi_call_us": 8.0,   # machine.SPI method overhead
+    "adc_us": 4.0,        # ADC.read_u16()
+}
+
+
+class Halt(BaseException):
+    """Stops a simulation (virtual deadline, machine.reset()); not an Exception,
+    so the firmware's ``except Exception`` handlers do not swallow it."""
+
+
+class Net:
+    """
+    One GPIO and the devices wired to it.
+
+    The MCU side is described by the pin mode and output value; devices are
+    objects with ``level(now_us)`` (0 to pull low, 1 to drive high, None to
+    release) and optionally ``on_master(net, level, now_us)``, called when
+    the level the MCU drives changes (None = released).
+    """
+
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, board, name):
+        self.board = board
+        self.name = name
+        self.mode = self.IN
+        self.pull = None
+        self.out = 0
+        self.devices = []
+        self.reads = 0
+        self.writes = 0
+        self.edges = 0
+
+    def attach(self, device):
+        self.devices.append(device)
+        return device
+
+    def master(self):
+        if self.mode == self.OUT:
+            return self.out
+        if self.mode == self.OPEN_DRAIN and not self.out:
+            return 0
+        return None
+
+    def _changed(self, before):
+        after = self.master()
+        if after != before:
+            self.edges += 1
+            now = self.board.clock.now_us
+            for dev in self.devices:
+                notify = getattr(dev, "on_master", None)
+                if notify:
+                    notify(self, after, now)
+
+    def configure(self, mode=None, pull=None):
+        before = self.master()
+        if mode is not None:
+            self.mode = mode
+        if pull is not None:
+            self.pull = pull
+        self._changed(before)
+
+    def write(self, value):
+        self.writes += 1
+        before = self.master()
+        self.out = 1 if value else 0
+        self._changed(before)
+
+    def read(self):
+        self.reads += 1
+        if self.mode == self.OUT:
+            return self.out
+        now = self.board.clock.now_us
+        high = False
+        for dev in self.devices:
+            level = dev.level(now)
+            if level == 0:
+                return 0
+            if level:
+                high = True
+        if self.master() == 0:
+            return 0
+        if high or self.pull == self.PULL_UP:
+            return 1
+        return 0
+
+
+class I2CBus:
+    """
+    Register-level I2C bus: devices are addressed by their 7-bit address and
+    see each transaction as write(data) / read(n) calls.
+    """
+
+    def __init__(self, board, name):
+        self.board = board
+        self.name = name
+        self.devices = {}
+        self.transactions = 0
+        self.bytes = 0
+        self.nacks = 0
+        self.per_device = {}
+
+    def attach(self, device):
+        self.devices[device.addr] = device
+        return device
+
+    def transfer(self, addr, write=None, read=0, freq=100000, nack_errno=errno.EIO):
+        """
+        One transaction: optional write, optional (repeated-start) read.
+
+        Returns:
+            bytes read (empty when ``read`` is 0)
+        """
+        board = self.board
+        board.clock.charge(board.costs["i2c_call_us"])
+        nbytes = (1 + len(write) if write is not None else 0) + (1 + read if read else 0)
+        board.clock.charge(nbytes * 9 * 1e6 / freq)
+        self.transactions += 1
+        self.bytes += nbytes
+        dev = self.devices.get(addr)
+        if dev is None:
+            self.nacks += 1
+            raise OSError(nack_errno)
+        self.per_device[addr] = self.per_device.get(addr, 0) + 1
+        if write is not None:
+            dev.write(bytes(write))
+        return bytes(dev.read(read)) if read else b""
+
+    def scan(self):
+        return sorted(self.devices)
+
+
+class SPIBus:
+    """SPI bus; the device whose chip-select net is driven low gets the bytes."""
+
+    def __init__(self, board, name):
+        self.board = board
+        self.name = name
+        self.devices = []
+        self.bytes = 0
+
+    def attach(self, device, cs_net):
+        device.cs = cs_net
+        self.devices.append(device)
+        return device
+
+    def exchange(self, data, baudrate):
+        board = self.board
+        board.clock.charge(board.costs["spi_call_us"] + len(data) * 8 * 1e6 / baudrate)
+        self.bytes += len(data)
+        for dev in self.devices:
+            if dev.cs.master() == 0:
+                return dev.exchange(data)
+        return b"\xff" * len(data)
+
+
+class Board:
+    """
+    The simulated board.
+
+    Args:
+        costs: Overrides for DEFAULT_COSTS
+        rtc: Initial RTC date/time (year, month, day, hour, minute, second)
+        deadline_s: Raise Halt when virtual time passes this (None = never)
+    """
+
+    def __init__(self, costs=None, rtc=(2025, 9, 1, 0, 0, 0), deadline_s=None):
+        self.costs = dict(DEFAULT_COSTS)
+        if costs:
+            self.costs.update(costs)
+        self.clock = VirtualClock(call_us=self.costs["call_us"])
+        self.nets = {}
+        self.i2c = {}
+        self.soft_i2c = {}
+        self.spi = {}
+        self.adc = {}
+        self.timers = []
+        self.epoch0 = calendar.timegm(tuple(rtc) + (0, 0, 0))
+        self.deadline_us = None if deadline_s is None else deadline_s * 1e6
+        self.sleep_hooks = []
+
+    # --- wiring ---
+    def net(self, pin):
+        net = self.nets.get(pin)
+        if net is None:
+            net = self.nets[pin] = Net(self, pin)
+        return net
+
+    def i2c_bus(self, bus_id):
+        bus = self.i2c.get(bus_id)
+        if bus is None:
+            bus = self.i2c[bus_id] = I2CBus(self, "i2c%s" % bus_id)
+        return bus
+
+    def soft_i2c_bus(self, scl, sda):
+        bus = self.soft_i2c.get((scl, sda))
+        if bus is None:
+            bus = self.soft_i2c[(scl, sda)] = I2CBus(self, "softi2c%s/%s" % (scl, sda))
+        return bus
+
+    def spi_bus(self, bus_id):
+        bus = self.spi.get(bus_id)
+        if bus is None:
+            bus = self.spi[bus_id] = SPIBus(self, "spi%s" % bus_id)
+        return bus
+
+    def attach_adc(self, channel, volts):
+        """Wire ``volts()`` (returning the input voltage) to an ADC channel."""
+        self.adc[channel] = volts
+
+    # --- time ---
+    def now_s(self):
+        return self.clock.now_us / 1e6
+
+    def epoch(self):
+        """Seconds since 1970 according to the RTC."""
+        return self.epoch0 + self.clock.now_us / 1e6
+
+    def localtime(self):
+        return _time.gmtime(int(self.epoch()))
+
+    def set_rtc(self, year, month, day, hour, minute, second):
+        self.epoch0 = calendar.timegm((year, month, day, hour, minute, second, 0, 0, 0)) \
+            - self.clock.now_us / 1e6
+
+    def add_timer(self, timer):
+        if timer not in self.timers:
+            self.timers.append(timer)
+
+    def remove_timer(self, timer):
+        if timer in self.timers:
+            self.timers.remove(timer)
+
+    def sleep_us(self, us):
+        """Advance the clock by ``us``, running soft timers that fall due."""
+        clock = self.clock
+        clock.charge(self.costs["call_us"])
+        target = clock.now_us + max(0, us)
+        for hook in self.sleep_hooks:
+            hook(us)
+        while self.timers:
+            timer = min(self.timers, key=lambda t: t.due_us)
+            if timer.due_us > target:
+                break
+            clock.now_us = max(clock.now_us, timer.due_us)
+            timer.fire()
+        clock.now_us = max(clock.now_us, target)
+        self.check_deadline()
+
+    def check_deadline(self):
+        if self.deadline_us is not None and self.clock.now_us > self.deadline_us:
+            raise Halt("virtual deadline reached")
@@ -0,0 +1,86 @@
+"""
+Stub HTTP collector for lib/uplink.py.
+
+Accepts the uplink's POSTed batches on a keep-alive connection, inflates
+them, drops batches it has already stored (same X-Station and X-Offset) and
+appends the rows to one CSV per station.
+
+Usage:
+    python -m polysense.sim.collector [--port 8080] [--out received]
+                                      [--fail-every N]
+
+``--fail-every N`` answers every Nth batch with 503 to exercise the
+uplink's retry path.
+"""
+
+import argparse
+import os
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server.requests += 1
+        if server.fail_every and server.requests % server.fail_every == 0:
+            self._reply(503)
+            return
+        if self.headers.get("Content-Encoding") == "deflate":
+            body = zlib.decompress(body)
+        station = self.headers.get("X-Station", "unknown")
+        key = (station, self.headers.get("X-Offset"))
+        if key in server.seen:
+            server.duplicates += 1
+        else:
+            server.seen.add(key)
+            with open(os.path.join(server.out_dir, station + ".csv"), "ab") as f:
+                f.write(body)
+            server.rows += body.count(b"\n")
+        self._reply(200)
+
+    def _reply(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+
+def make_server(port=8080, out_dir="received", fail_every=0, verbose=False):
+    """Create (but do not start) a collector bound to localhost:``port``."""
+    os.makedirs(out_dir, exist_ok=True)
+    server = ThreadingHTTPServer(("127.0.0.1", port), CollectorHandler)
+    server.out_dir = out_dir
+    server.fail_every = fail_every
+    server.verbose = verbose
+    server.seen = set()
+    server.requests = 0
+    server.duplicates = 0
+    server.rows = 0
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub HTTP collector for the uplink")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--out", default="received", help="output directory")
+    parser.add_argument("--fail-every", type=int, default=0,
+                        help="answer every Nth request with 503")
+    args = parser.parse_args()
+    server = make_server(args.port, args.out, args.fail_every, verbose=True)
+    print(f"Collecting on http://127.0.0.1:{args.port}/ into {args.out}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"{server.requests} requests, {server.rows} rows, {server.duplicates} duplicates")
+
+
+if __name__ == "__main__":
+    main()
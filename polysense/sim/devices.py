@@ -0,0 +1,639 @@
+"""
+Register- and pulse-level models of the PolySense sensors.
+
+Each model reads the ground truth from an Environment and presents it the
+way the real part does: raw ADC codes behind the factory calibration
+constants (BMP280, BMP180), conversion delays on the virtual clock, status
+bits, CRCs, and - for the bit-banged parts - the line timing itself
+(OneWire slots for the DS18B20, the DHT11 pulse train).
+"""
+
+import math
+import random
+
+
+class Environment:
+    """
+    Ground truth at the station: diurnal temperature and humidity cycles and
+    a semidiurnal pressure tide, following the board's RTC.
+
+    Args:
+        board: Board providing the clock/RTC
+        seed: Seed for every sensor's noise
+        temp_mean, temp_amp: Daily mean and half-range (deg C), peak at 15:00
+        rh_mean, rh_amp: Relative humidity (%), lowest at 15:00
+        press_mean, press_amp: Station pressure (hPa) and tide amplitude
+    """
+
+    def __init__(self, board, seed=0, temp_mean=21.0, temp_amp=6.0, rh_mean=65.0,
+                 rh_amp=20.0, press_mean=908.0, press_amp=1.2):
+        self.board = board
+        self.seed = seed
+        self.temp_mean = temp_mean
+        self.temp_amp = temp_amp
+        self.rh_mean = rh_mean
+        self.rh_amp = rh_amp
+        self.press_mean = press_mean
+        self.press_amp = press_amp
+
+    def rng(self, name):
+        """Independent, reproducible noise source for one sensor."""
+        return random.Random("%s/%s" % (self.seed, name))
+
+    def _hour(self):
+        return (self.board.epoch() % 86400) / 3600.0
+
+    def temperature(self):
+        return self.temp_mean + self.temp_amp * math.sin(2 * math.pi * (self._hour() - 9) / 24)
+
+    def humidity(self):
+        rh = self.rh_mean - self.rh_amp * math.sin(2 * math.pi * (self._hour() - 9) / 24)
+        return max(0.0, min(100.0, rh))
+
+    def pressure(self):
+        return self.press_mean + self.press_amp * math.cos(2 * math.pi * (self._hour() - 10) / 12)
+
+
+def _crc8(data, poly, init=0x00, reflect=False):
+    crc = init
+    for byte in data:
+        if reflect:
+            crc ^= byte
+            for _ in range(8):
+                crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+        else:
+            crc ^= byte
+            for _ in range(8):
+                crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+def _bisect(f, target, lo, hi, increasing=True):
+    """Largest integer x in [lo, hi] with f(x) <= target (increasing f)."""
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if (f(mid) <= target) == increasing:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+# --- I2C register devices ---
+
+class RegisterDevice:
+    """I2C target with an auto-incrementing register pointer."""
+
+    addr = None
+
+    def __init__(self, env, name, offset=0.0, noise=0.0):
+        self.env = env
+        self.board = env.board
+        self.rng = env.rng(name)
+        self.offset = offset
+        self.noise = noise
+        self.regs = bytearray(256)
+        self.ptr = 0
+
+    def true_temperature(self):
+        return self.env.temperature() + self.offset + self.rng.gauss(0, self.noise)
+
+    def write(self, data):
+        if not data:
+            return
+        self.ptr = data[0]
+        for b in data[1:]:
+            self.write_reg(self.ptr, b)
+            self.ptr = (self.ptr + 1) & 0xFF
+
+    def read(self, n):
+        self.refresh()
+        out = bytes(self.regs[(self.ptr + i) & 0xFF] for i in range(n))
+        self.ptr = (self.ptr + n) & 0xFF
+        return out
+
+    def write_reg(self, reg, value):
+        self.regs[reg] = value
+
+    def refresh(self):
+        pass
+
+
+class MPU6050(RegisterDevice):
+    """
+    MPU6050 at 0x68: reset/sleep via PWR_MGMT_1, WHO_AM_I, live TEMP_OUT and
+    a level, motionless accelerometer. The die runs warmer than the air.
+    """
+
+    addr = 0x68
+
+    def __init__(self, env, offset=1.8, noise=0.05):
+        super().__init__(env, "mpu6050", offset, noise)
+        self._power_on()
+
+    def _power_on(self):
+        self.regs[:] = bytes(256)
+        self.regs[0x6B] = 0x40  # SLEEP
+        self.regs[0x75] = 0x68
+
+    def write_reg(self, reg, value):
+        if reg == 0x6B and value & 0x80:
+            self._power_on()
+            return
+        if reg != 0x75:
+            self.regs[reg] = value
+
+    def refresh(self):
+        if self.regs[0x6B] & 0x40:
+            return
+        raw = int(round((self.true_temperature() - 36.53) * 340)) & 0xFFFF
+        self.regs[0x41] = raw >> 8
+        self.regs[0x42] = raw & 0xFF
+        self.regs[0x3F] = 0x40  # ACCEL_Z = +1 g at +-2 g full scale
+        self.regs[0x40] = 0x00
+
+
+class AHT20:
+    """
+    AHT20 at 0x38: command protocol (0xBE init, 0xAC trigger, 0xBA reset),
+    80 ms conversion with the busy bit, 20-bit readings and CRC-8.
+    """
+
+    addr = 0x38
+    CONVERSION_US = 80000
+
+    def __init__(self, env, offset=0.3, noise=0.03, rh_offset=-1.5, rh_noise=0.3):
+        self.env = env
+        self.board = env.board
+        self.rng = env.rng("aht20")
+        self.offset = offset
+        self.noise = noise
+        self.rh_offset = rh_offset
+        self.rh_noise = rh_noise
+        self.status = 0x18  # calibrated, idle
+        self.done_us = 0
+        self.data = bytes(5)
+
+    def write(self, data):
+        if data[:1] == b"\xac":
+            self.done_us = self.board.clock.now_us + self.CONVERSION_US
+            t = self.env.temperature() + self.offset + self.rng.gauss(0, self.noise)
+            rh = self.env.humidity() + self.rh_offset + self.rng.gauss(0, self.rh_noise)
+            h = max(0, min(0xFFFFF, int(rh / 100 * 0x100000)))
+            t = max(0, min(0xFFFFF, int((t + 50) / 200 * 0x100000)))
+            self.data = bytes((h >> 12, (h >> 4) & 0xFF, ((h & 0xF) << 4) | (t >> 16),
+                               (t >> 8) & 0xFF, t & 0xFF))
+        elif data[:1] == b"\xba":
+            self.done_us = self.board.clock.now_us + 20000
+        self.status = 0x18
+
+    def read(self, n):
+        busy = 0x80 if self.board.clock.now_us < self.done_us else 0
+        out = bytes((self.status | busy,)) + self.data
+        out += bytes((_crc8(out, 0x31, 0xFF),))
+        return out[:n]
+
+
+class BMP280(RegisterDevice):
+    """
+    BMP280 at 0x77 with the datasheet's example trimming parameters.
+    Readings are stored as the raw 20-bit ADC codes that the Bosch
+    compensation maps back to the true temperature and pressure.
+    """
+
+    addr = 0x77
+    TRIM = (27504, 26435, -1000, 36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000)
+
+    def __init__(self, env, offset=0.6, noise=0.01, press_offset=0.4, press_noise=0.02):
+        super().__init__(env, "bmp280", offset, noise)
+        self.press_offset = press_offset
+        self.press_noise = press_noise
+        self.regs[0xD0] = 0x58
+        for i, v in enumerate(self.TRIM):
+            v &= 0xFFFF
+            self.regs[0x88 + 2 * i] = v & 0xFF
+            self.regs[0x89 + 2 * i] = v >> 8
+        self.updated_us = None
+
+    def _temp(self, adc_t):
+        t1, t2, t3 = self.TRIM[:3]
+        v1 = (adc_t / 16384.0 - t1 / 1024.0) * t2
+        v2 = (adc_t / 131072.0 - t1 / 8192.0) ** 2 * t3
+        return (v1 + v2) / 5120.0, int(v1 + v2)
+
+    def _press(self, adc_p, t_fine):
+        p1, p2, p3, p4, p5, p6, p7, p8, p9 = self.TRIM[3:]
+        v1 = t_fine / 2.0 - 64000.0
+        v2 = v1 * v1 * p6 / 32768.0
+        v2 = v2 + v1 * p5 * 2.0
+        v2 = v2 / 4.0 + p4 * 65536.0
+        v1 = (p3 * v1 * v1 / 524288.0 + p2 * v1) / 524288.0
+        v1 = (1.0 + v1 / 32768.0) * p1
+        p = 1048576.0 - adc_p
+        p = ((p - v2 / 4096.0) * 6250.0) / v1
+        v1 = p9 * p * p / 2147483648.0
+        v2 = p * p8 / 32768.0
+        return (p + (v1 + v2 + p7) / 16.0) / 100.0
+
+    def refresh(self):
+        now = self.board.clock.now_us
+        if self.regs[0xF4] & 0x03 == 0:
+            return
+        if self.updated_us is not None and now - self.updated_us < 1000:
+            return
+        self.updated_us = now
+        t = self.true_temperature()
+        p = self.env.pressure() + self.press_offset + self.rng.gauss(0, self.press_noise)
+        adc_t = _bisect(lambda x: self._temp(x)[0], t, 0, 0xFFFFF)
+        t_fine = self._temp(adc_t)[1]
+        adc_p = _bisect(lambda x: self._press(x, t_fine), p, 0, 0xFFFFF, increasing=False)
+        for reg, v in ((0xF7, adc_p), (0xFA, adc_t)):
+            self.regs[reg] = v >> 12
+            self.regs[reg + 1] = (v >> 4) & 0xFF
+            self.regs[reg + 2] = (v & 0xF) << 4
+
+
+class BMP180(RegisterDevice):
+    """
+    BMP180 at 0x77 with the datasheet's example calibration EEPROM. Writing
+    the control register starts a conversion; results appear in 0xF6-0xF8
+    after the datasheet conversion time (stale data before that).
+    """
+
+    addr = 0x77
+    CAL = (408, -72, -14383, 32741, 32757, 23153, 6190, 4, -32768, -8711, 2868)
+    PRESSURE_US = (4500, 7500, 13500, 25500)
+
+    def __init__(self, env, offset=-0.4, noise=0.05, press_offset=-0.6, press_noise=0.05):
+        super().__init__(env, "bmp180", offset, noise)
+        self.press_offset = press_offset
+        self.press_noise = press_noise
+        self.regs[0xD0] = 0x55
+        for i, v in enumerate(self.CAL):
+            v &= 0xFFFF
+            self.regs[0xAA + 2 * i] = v >> 8
+            self.regs[0xAB + 2 * i] = v & 0xFF
+        self.pending = None
+
+    def _b5(self, ut):
+        ac1, ac2, ac3, ac4, ac5, ac6, b1, b2, mb, mc, md = self.CAL
+        x1 = (ut - ac6) * ac5 // 2**15
+        x2 = mc * 2**11 // (x1 + md)
+        return x1 + x2
+
+    def _pressure(self, up, oss, b5):
+        ac1, ac2, ac3, ac4, ac5, ac6, b1, b2, mb, mc, md = self.CAL
+        b6 = b5 - 4000
+        x1 = (b2 * (b6 * b6 // 2**12)) // 2**11
+        x2 = ac2 * b6 // 2**11
+        b3 = (((ac1 * 4 + x1 + x2) << oss) + 2) // 4
+        x1 = ac3 * b6 // 2**13
+        x2 = (b1 * (b6 * b6 // 2**12)) // 2**16
+        x3 = ((x1 + x2) + 2) // 2**2
+        b4 = ac4 * (x3 + 32768) // 2**15
+        b7 = (up - b3) * (50000 >> oss)
+        p = (b7 * 2) // b4 if b7 < 0x80000000 else (b7 // b4) * 2
+        x1 = (p // 2**8) ** 2
+        x1 = (x1 * 3038) // 2**16
+        x2 = (-7357 * p) // 2**16
+        return p + (x1 + x2 + 3791) // 2**4
+
+    def write_reg(self, reg, value):
+        self.regs[reg] = value
+        if reg == 0xF4:
+            oss = value >> 6
+            if value & 0x3F == 0x2E:
+                self.pending = ("T", 0, self.board.clock.now_us + 4500)
+            elif value & 0x3F == 0x34:
+                self.pending = ("P", oss, self.board.clock.now_us + self.PRESSURE_US[oss])
+            self.regs[0xF4] |= 0x20  # SCO: conversion running
+
+    def refresh(self):
+        if not self.pending or self.board.clock.now_us < self.pending[2]:
+            return
+        kind, oss, _ = self.pending
+        self.pending = None
+        self.regs[0xF4] &= ~0x20 & 0xFF
+        t = self.true_temperature()
+        ut = _bisect(lambda u: (self._b5(u) + 8) // 16, int(t * 10), 0, 0xFFFF)
+        if kind == "T":
+            self.regs[0xF6] = ut >> 8
+            self.regs[0xF7] = ut & 0xFF
+            return
+        pa = (self.env.pressure() + self.press_offset + self.rng.gauss(0, self.press_noise)) * 100
+        b5 = self._b5(ut)
+        up = _bisect(lambda u: self._pressure(u, oss, b5), pa, 0, (1 << (16 + oss)) - 1)
+        raw = up << (8 - oss)
+        self.regs[0xF6] = (raw >> 16) & 0xFF
+        self.regs[0xF7] = (raw >> 8) & 0xFF
+        self.regs[0xF8] = raw & 0xFF
+
+
+class SSD1306:
+    """
+    SSD1306 128x64 OLED at 0x3C: command parser (with argument bytes),
+    page/column addressing and the 1 KiB display RAM.
+    """
+
+    addr = 0x3C
+    _ARGS = {0x20: 1, 0x21: 2, 0x22: 2, 0x81: 1, 0x8D: 1, 0xA8: 1, 0xD3: 1, 0xD5: 1,
+             0xD9: 1, 0xDA: 1, 0xDB: 1, 0x26: 6, 0x27: 6, 0x29: 5, 0x2A: 5, 0xA3: 2}
+
+    def __init__(self, width=128, height=64):
+        self.width = width
+        self.pages = height // 8
+        self.ram = bytearray(width * self.pages)
+        self.on = False
+        self.page = 0
+        self.col = 0
+        self.commands = 0
+        self.data_bytes = 0
+        self._cmd = []
+
+    def write(self, data):
+        if not data:
+            return
+        control, payload = data[0], data[1:]
+        if control & 0x40:
+            for b in payload:
+                self.ram[self.page * self.width + self.col] = b
+                self.col = (self.col + 1) % self.width
+            self.data_bytes += len(payload)
+        else:
+            for b in payload:
+                self._command(b)
+
+    def _command(self, b):
+        cmd = self._cmd
+        cmd.append(b)
+        if len(cmd) <= self._ARGS.get(cmd[0], 0):
+            return
+        self._cmd = []
+        self.commands += 1
+        op = cmd[0]
+        if op in (0xAE, 0xAF):
+            self.on = op == 0xAF
+        elif 0xB0 <= op <= 0xB7:
+            self.page = op & 0x07
+        elif op <= 0x0F:
+            self.col = (self.col & 0xF0) | op
+        elif 0x10 <= op <= 0x1F:
+            self.col = (self.col & 0x0F) | ((op & 0x0F) << 4)
+
+    def read(self, n):
+        return bytes(n)
+
+    def render(self, on="#", off="."):
+        """Display RAM as text, one string per pixel row."""
+        rows = []
+        for y in range(self.pages * 8):
+            page, bit = divmod(y, 8)
+            base = page * self.width
+            rows.append("".join(on if self.ram[base + x] >> bit & 1 else off
+                                for x in range(self.width)))
+        return rows
+
+
+# --- pin-level devices ---
+
+class Button:
+    """Push button to 3V3 (the firmware enables a pull-down): pressed when ``pressed()``."""
+
+    def __init__(self, pressed):
+        self.pressed = pressed
+
+    def level(self, now_us):
+        return 1 if self.pressed() else None
+
+
+class DS18B20:
+    """
+    One DS18B20 on a OneWire net, decoding the master's slots from the
+    line timing: resets (presence pulse), ROM commands (search, match,
+    skip, read), convert T (750 ms at 12 bit), scratchpad read/write and
+    read power supply.
+
+    Args:
+        env: Environment
+        serial: 48-bit serial number
+    """
+
+    FAMILY = 0x28
+
+    def __init__(self, env, serial=0x0000A1B2C3D4, offset=-0.1, noise=0.02):
+        self.env = env
+        self.board = env.board
+        self.rng = env.rng("ds18b20")
+        self.offset = offset
+        self.noise = noise
+        rom = bytes((self.FAMILY,)) + serial.to_bytes(6, "little")
+        self.rom = rom + bytes((_crc8(rom, 0x8C, reflect=True),))
+        self.scratch = bytearray(b"\x50\x05\x4b\x46\x7f\xff\x0c\x10\x00")  # 85.0 C at power-up
+        self.scratch[8] = _crc8(self.scratch[:8], 0x8C, reflect=True)
+        self.convert_done_us = 0
+        self.fall_us = None
+        self.hold = (0, 0)           # device pulls the line low in [start, end)
+        self.resets = 0
+        self.state = "idle"
+        self.bits = []
+        self.tx = []
+
+    # line side
+    def level(self, now_us):
+        start, end = self.hold
+        return 0 if start <= now_us < end else None
+
+    def on_master(self, net, level, now_us):
+        if level == 0:
+            self.fall_us = now_us
+            if self.tx and self.state == "send":
+                if not self.tx[0]:
+                    self.hold = (now_us, now_us + 30)
+            return
+        if self.fall_us is None:
+            return
+        low = now_us - self.fall_us
+        self.fall_us = None
+        if low >= 400:
+            self._reset(now_us)
+        elif self.state == "send":
+            self.tx.pop(0)
+            if not self.tx:
+                self._sent()
+        elif self.state != "idle":
+            self._bit(1 if low < 15 else 0)
+
+    def _reset(self, now_us):
+        self.resets += 1
+        self.hold = (now_us + 30, now_us + 150)  # presence pulse
+        self.state = "rom"
+        self.bits = []
+        self.tx = []
+
+    def _send(self, data, then):
+        self.tx = [(byte >> i) & 1 for byte in data for i in range(8)]
+        self.after_send = then
+        self.state = "send"
+
+    def _send_bits(self, bits, then):
+        self.tx = list(bits)
+        self.after_send = then
+        self.state = "send"
+
+    def _sent(self):
+        self.state = self.after_send
+        if self.state == "search_dir":
+            self.bits = []
+
+    def _bit(self, bit):
+        self.bits.append(bit)
+        if self.state == "search_dir":
+            self.bits = []
+            if bit != (self.rom_bits[self.search_pos]):
+                self.state = "idle"  # deselected
+                return
+            self.search_pos += 1
+            if self.search_pos == 64:
+                self.state = "function"
+                return
+            b = self.rom_bits[self.search_pos]
+            self._send_bits((b, b ^ 1), "search_dir")
+            return
+        if self.state == "match":
+            if len(self.bits) == 64:
+                rom = bytes(sum(self.bits[i * 8 + j] << j for j in range(8)) for i in range(8))
+                self.bits = []
+                self.state = "function" if rom == self.rom else "idle"
+            return
+        if self.state == "write_scratch":
+            if len(self.bits) == 24:
+                data = bytes(sum(self.bits[i * 8 + j] << j for j in range(8)) for i in range(3))
+                self.scratch[2:5] = data
+                self.scratch[8] = _crc8(self.scratch[:8], 0x8C, reflect=True)
+                self.bits = []
+                self.state = "idle"
+            return
+        if len(self.bits) < 8:
+            return
+        byte = sum(b << i for i, b in enumerate(self.bits))
+        self.bits = []
+        if self.state == "rom":
+            self._rom_command(byte)
+        elif self.state == "function":
+            self._function(byte)
+
+    def _rom_command(self, cmd):
+        if cmd == 0xCC:
+            self.state = "function"
+        elif cmd == 0x55:
+            self.state = "match"
+        elif cmd == 0x33:
+            self._send(self.rom, "function")
+        elif cmd == 0xF0:
+            self.rom_bits = [(self.rom[i // 8] >> (i % 8)) & 1 for i in range(64)]
+            self.search_pos = 0
+            b = self.rom_bits[0]
+            self._send_bits((b, b ^ 1), "search_dir")
+        else:
+            self.state = "idle"
+
+    def _function(self, cmd):
+        now = self.board.clock.now_us
+        if cmd == 0x44:
+            self.convert_done_us = now + 750000
+            t = self.env.temperature() + self.offset + self.rng.gauss(0, self.noise)
+            raw = int(round(t * 16)) & 0xFFFF
+            self.next_raw = raw
+            self.state = "idle"
+        elif cmd == 0xBE:
+            if self.convert_done_us and now >= self.convert_done_us:
+                self.scratch[0] = self.next_raw & 0xFF
+                self.scratch[1] = self.next_raw >> 8
+                self.scratch[8] = _crc8(self.scratch[:8], 0x8C, reflect=True)
+                self.convert_done_us = 0
+            self._send(self.scratch, "idle")
+        elif cmd == 0x4E:
+            self.state = "write_scratch"
+        elif cmd == 0xB4:
+            self._send_bits((1,), "idle")
+        else:
+            self.state = "idle"
+
+
+class DHT11:
+    """
+    DHT11 pulse train: after the host holds the line low for >= 18 ms and
+    releases it, the sensor answers 80 us low / 80 us high, then 40 bits of
+    50 us low followed by 26 us (0) or 70 us (1) high, then a 50 us low.
+    """
+
+    def __init__(self, env, offset=0.8, rh_offset=4.0):
+        self.env = env
+        self.board = env.board
+        self.rng = env.rng("dht11")
+        self.offset = offset
+        self.rh_offset = rh_offset
+        self.fall_us = None
+        self.edges = []   # [(time, level)] from the last start signal
+        self.frames = 0
+
+    def on_master(self, net, level, now_us):
+        if level == 0:
+            self.fall_us = now_us
+            return
+        if self.fall_us is None or now_us - self.fall_us < 18000:
+            self.fall_us = None
+            return
+        self.fall_us = None
+        self.frames += 1
+        t = self.env.temperature() + self.offset + self.rng.gauss(0, 0.3)
+        rh = self.env.humidity() + self.rh_offset + self.rng.gauss(0, 1.0)
+        t_int, t_dec = int(t), int((t - int(t)) * 10)
+        data = [max(0, min(255, int(round(rh)))), 0, max(0, min(255, t_int)), max(0, t_dec)]
+        data.append(sum(data) & 0xFF)
+        edges = []
+        t = now_us + 30
+        edges.append((t, 0))
+        t += 80
+        edges.append((t, None))
+        t += 80
+        for byte in data:
+            for i in range(7, -1, -1):
+                edges.append((t, 0))
+                t += 50
+                edges.append((t, None))
+                t += 70 if (byte >> i) & 1 else 26
+        edges.append((t, 0))
+        edges.append((t + 50, None))
+        self.edges = edges
+
+    def level(self, now_us):
+        level = None
+        for t, lvl in self.edges:
+            if t > now_us:
+                break
+            level = lvl
+        if level is None:
+            return 1 if self.edges else None
+        return level
+
+
+class NTCDivider:
+    """
+    10 k NTC (B = 3950) from the ADC input to GND under a 10 k resistor
+    from 3V3, as wired on the station; returns the ADC input voltage.
+    """
+
+    def __init__(self, env, offset=-0.2, noise=0.08, r_fixed=10000.0, r0=10000.0, beta=3950.0):
+        self.env = env
+        self.rng = env.rng("ntc")
+        self.offset = offset
+        self.noise = noise
+        self.r_fixed = r_fixed
+        self.r0 = r0
+        self.beta = beta
+
+    def __call__(self):
+        t = self.env.temperature() + self.offset + self.rng.gauss(0, self.noise) + 273.15
+        r = self.r0 * math.exp(self.beta * (1 / t - 1 / 298.15))
+        return 3.3 * r / (self.r_fixed + r)
@@ -0,0 +1,876 @@
+"""
+FAT32 file system over a block device, for running the firmware on a PC.
+
+Stands in for MicroPython's ``VfsFat``: ``os.mount(SDCard(...), '/sd')`` in
+the simulated firmware mounts a FatVolume on the card model, so every file
+operation turns into the same kind of block traffic the card sees on the
+station. Block access follows FatFs as configured by MicroPython
+(FF_FS_TINY): a single 512-byte sector window shared by the FAT, the
+directories and partial data sectors, written back when another sector is
+needed, mirrored to the second FAT, and flushed together with the directory
+entry and FSInfo on close()/flush(). Full, aligned sectors bypass the window.
+
+Supports FAT32 on a superfloppy or an MBR-partitioned image, long file
+names and subdirectories. ``mkfs`` formats an image the way an SD card
+comes from the factory (MBR, partition at 4 MiB); RegionMap tells which
+blocks of an image hold the FATs, directories and each file's data.
+"""
+
+import errno
+import struct
+
+SECTOR = 512
+EOC = 0x0FFFFFF8
+_DIR_ENTRY = 32
+_ATTR_DIR = 0x10
+_ATTR_ARCHIVE = 0x20
+_ATTR_LFN = 0x0F
+_ATTR_VOLUME = 0x08
+_LFN_CHARS = 13
+_SFN_CHARS = set(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789$%'-_@~`!(){}^#&")
+
+
+def _err(code):
+    return OSError(code, errno.errorcode.get(code, ""))
+
+
+# --- formatting ---
+
+def mkfs(path, size, partition_start=8192, label="POLYSENSE"):
+    """
+    Create a FAT32-formatted image file.
+
+    Args:
+        path: Image file to create (sparse)
+        size: Image size in bytes
+        partition_start: First sector of the partition (0 = no MBR)
+        label: Volume label
+
+    Returns:
+        dict: Layout of the new volume (sectors, cluster size, regions)
+    """
+    total = size // SECTOR
+    sectors = total - partition_start
+    if sectors * SECTOR <= 260 << 20:
+        spc = 1
+    elif sectors * SECTOR <= 8 << 30:
+        spc = 8
+    elif sectors * SECTOR <= 16 << 30:
+        spc = 16
+    else:
+        spc = 32
+    reserved = 32
+    fatsz = 1
+    while True:
+        clusters = (sectors - reserved - 2 * fatsz) // spc
+        need = ((clusters + 2) * 4 + SECTOR - 1) // SECTOR
+        if need <= fatsz:
+            break
+        fatsz = need
+    if clusters < 65525:
+        raise ValueError("image too small for FAT32 (needs at least ~34 MiB)")
+
+    boot = bytearray(SECTOR)
+    boot[0:3] = b"\xEB\x58\x90"
+    boot[3:11] = b"MSWIN4.1"
+    struct.pack_into("<HBHBHHBHHHII", boot, 11, SECTOR, spc, reserved, 2, 0, 0, 0xF8, 0,
+                     63, 255, partition_start, sectors)
+    struct.pack_into("<IHHIHH", boot, 36, fatsz, 0, 0, 2, 1, 6)
+    boot[64] = 0x80
+    boot[66] = 0x29
+    struct.pack_into("<I", boot, 67, 0x50534E31)
+    boot[71:82] = label.upper().encode()[:11].ljust(11)
+    boot[82:90] = b"FAT32   "
+    boot[510:512] = b"\x55\xAA"
+
+    fsinfo = bytearray(SECTOR)
+    struct.pack_into("<I", fsinfo, 0, 0x41615252)
+    struct.pack_into("<III", fsinfo, 484, 0x61417272, clusters - 1, 3)
+    struct.pack_into("<I", fsinfo, 508, 0xAA550000)
+
+    fat = bytearray(SECTOR)
+    struct.pack_into("<III", fat, 0, 0x0FFFFFF8, 0x0FFFFFFF, 0x0FFFFFFF)
+
+    root = bytearray(SECTOR)
+    root[0:11] = label.upper().encode()[:11].ljust(11)
+    root[11] = _ATTR_VOLUME
+
+    def put(f, sector, data):
+        f.seek((partition_start + sector) * SECTOR)
+        f.write(data)
+
+    with open(path, "wb") as f:
+        f.truncate(size)
+        if partition_start:
+            mbr = bytearray(SECTOR)
+            mbr[446] = 0x00
+            mbr[446 + 4] = 0x0C  # FAT32 LBA
+            struct.pack_into("<II", mbr, 446 + 8, partition_start, sectors)
+            mbr[510:512] = b"\x55\xAA"
+            f.seek(0)
+            f.write(mbr)
+        for base in (0, 6):
+            put(f, base, boot)
+            put(f, base + 1, fsinfo)
+        for copy in range(2):
+            put(f, reserved + copy * fatsz, fat)
+        put(f, reserved + 2 * fatsz, root)
+    return {
+        "partition_start": partition_start,
+        "sectors": sectors,
+        "sectors_per_cluster": spc,
+        "fat_start": partition_start + reserved,
+        "fat_sectors": fatsz,
+        "data_start": partition_start + reserved + 2 * fatsz,
+        "clusters": clusters,
+    }
+
+
+# --- names ---
+
+def _sfn_checksum(sfn):
+    s = 0
+    for c in sfn:
+        s = (((s & 1) << 7) + (s >> 1) + c) & 0xFF
+    return s
+
+
+def _split_name(name):
+    if "." in name[1:]:
+        base, ext = name.rsplit(".", 1)
+    else:
+        base, ext = name, ""
+    return base, ext
+
+
+def _plain_sfn(name):
+    """8.3 entry and NT case flags if ``name`` needs no long name, else None."""
+    base, ext = _split_name(name)
+    if not base or len(base) > 8 or len(ext) > 3:
+        return None
+    flags = 0
+    for part, bit in ((base, 0x08), (ext, 0x10)):
+        if part != part.upper() and part != part.lower():
+            return None
+        if part and part == part.lower() and part != part.upper():
+            flags |= bit
+        if any(c not in _SFN_CHARS for c in part.upper().encode()):
+            return None
+    return base.upper().encode().ljust(8) + ext.upper().encode().ljust(3), flags
+
+
+def _sfn_text(entry):
+    base = bytes(entry[0:8]).rstrip()
+    ext = bytes(entry[8:11]).rstrip()
+    case = entry[12]
+    base = base.decode("latin-1")
+    ext = ext.decode("latin-1")
+    if case & 0x08:
+        base = base.lower()
+    if case & 0x10:
+        ext = ext.lower()
+    return base + ("." + ext if ext else "")
+
+
+def _fat_time(dt):
+    y, mo, d, h, mi, s = dt
+    return ((y - 1980) << 9) | (mo << 5) | d, (h << 11) | (mi << 5) | (s // 2)
+
+
+class FatVolume:
+    """
+    Mounted FAT32 volume.
+
+    Args:
+        bdev: Object with readblocks(n, buf) / writeblocks(n, buf), e.g.
+              lib/sdcard.py's SDCard on the simulated SPI card
+        clock: Callable returning (year, month, day, hour, minute, second)
+               for directory time stamps
+    """
+
+    def __init__(self, bdev, clock=None):
+        self.bdev = bdev
+        self.clock = clock or (lambda: (2025, 1, 1, 0, 0, 0))
+        self.win = bytearray(SECTOR)
+        self.winsect = -1
+        self.wdirty = False
+        self.fsi_dirty = False
+        self.fat_start = self.fatsz = 0
+
+        self._move(0)
+        base = 0
+        if not self._is_fat32(self.win):
+            if self.win[510:512] != b"\x55\xAA" or self.win[446 + 4] not in (0x0B, 0x0C):
+                raise _err(errno.ENODEV)
+            base = struct.unpack_from("<I", self.win, 446 + 8)[0]
+            self._move(base)
+            if not self._is_fat32(self.win):
+                raise _err(errno.ENODEV)
+        w = self.win
+        self.base = base
+        self.spc = w[13]
+        reserved = struct.unpack_from("<H", w, 14)[0]
+        self.nfats = w[16]
+        total = struct.unpack_from("<I", w, 32)[0]
+        self.fatsz = struct.unpack_from("<I", w, 36)[0]
+        self.root = struct.unpack_from("<I", w, 44)[0]
+        self.fsinfo = base + struct.unpack_from("<H", w, 48)[0]
+        self.fat_start = base + reserved
+        self.data_start = self.fat_start + self.nfats * self.fatsz
+        self.nclusters = (total - (self.data_start - base)) // self.spc + 2
+        self.cluster_bytes = self.spc * SECTOR
+
+        self._move(self.fsinfo)
+        free, last = struct.unpack_from("<II", self.win, 488)
+        self.free = free if free <= self.nclusters else None
+        self.last = last if 2 <= last < self.nclusters else 2
+
+    @staticmethod
+    def _is_fat32(sector):
+        return (sector[510:512] == b"\x55\xAA"
+                and struct.unpack_from("<H", sector, 11)[0] == SECTOR
+                and struct.unpack_from("<H", sector, 17)[0] == 0
+                and struct.unpack_from("<H", sector, 22)[0] == 0)
+
+    # --- sector window ---
+    def _sync_window(self):
+        if self.wdirty:
+            self.bdev.writeblocks(self.winsect, self.win)
+            if self.fat_start <= self.winsect < self.fat_start + self.fatsz:
+                for i in range(1, self.nfats):
+                    self.bdev.writeblocks(self.winsect + i * self.fatsz, self.win)
+            self.wdirty = False
+
+    def _move(self, sector):
+        if sector != self.winsect:
+            self._sync_window()
+            self.bdev.readblocks(sector, self.win)
+            self.winsect = sector
+
+    def _claim(self, sector):
+        """Point the window at ``sector`` without reading it (growing edge)."""
+        self._sync_window()
+        self.winsect = sector
+        self.win[:] = bytes(SECTOR)
+
+    def sync(self):
+        """FatFs sync_fs(): flush the window and, if changed, FSInfo."""
+        self._sync_window()
+        if self.fsi_dirty:
+            w = self.win
+            w[:] = bytes(SECTOR)
+            struct.pack_into("<I", w, 0, 0x41615252)
+            struct.pack_into("<III", w, 484, 0x61417272,
+                             0xFFFFFFFF if self.free is None else self.free, self.last)
+            struct.pack_into("<I", w, 508, 0xAA550000)
+            self.winsect = self.fsinfo
+            self.bdev.writeblocks(self.fsinfo, w)
+            self.fsi_dirty = False
+
+    # --- FAT ---
+    def cluster_sector(self, clust):
+        return self.data_start + (clust - 2) * self.spc
+
+    def get_fat(self, clust):
+        self._move(self.fat_start + clust * 4 // SECTOR)
+        return struct.unpack_from("<I", self.win, clust * 4 % SECTOR)[0] & 0x0FFFFFFF
+
+    def put_fat(self, clust, value):
+        self._move(self.fat_start + clust * 4 // SECTOR)
+        off = clust * 4 % SECTOR
+        old = struct.unpack_from("<I", self.win, off)[0]
+        struct.pack_into("<I", self.win, off, (old & 0xF0000000) | value)
+        self.wdirty = True
+
+    def alloc(self, prev=0):
+        """Allocate a cluster and link it after ``prev`` (0 = new chain)."""
+        c = self.last
+        for _ in range(self.nclusters - 2):
+            c += 1
+            if c >= self.nclusters:
+                c = 2
+            if self.get_fat(c) == 0:
+                break
+        else:
+            raise _err(errno.ENOSPC)
+        self.put_fat(c, 0x0FFFFFFF)
+        if prev:
+            self.put_fat(prev, c)
+        self.last = c
+        if self.free is not None:
+            self.free -= 1
+        self.fsi_dirty = True
+        return c
+
+    def free_chain(self, clust):
+        while 2 <= clust < EOC:
+            nxt = self.get_fat(clust)
+            self.put_fat(clust, 0)
+            if self.free is not None:
+                self.free += 1
+            clust = nxt
+        self.fsi_dirty = True
+
+    def chain(self, clust):
+        while 2 <= clust < EOC:
+            yield clust
+            clust = self.get_fat(clust)
+
+    # --- directories ---
+    def _dir_slots(self, clust, extend=False):
+        """Yield (sector, offset) of every entry of the directory at ``clust``."""
+        prev = 0
+        while True:
+            for c in self.chain(clust):
+                prev = c
+                for s in range(self.spc):
+                    sector = self.cluster_sector(c) + s
+                    for off in range(0, SECTOR, _DIR_ENTRY):
+                        yield sector, off
+            if not extend:
+                return
+            clust = self.alloc(prev)
+            self._clear_cluster(clust)
+
+    def _clear_cluster(self, clust):
+        self._sync_window()
+        first = self.cluster_sector(clust)
+        for s in range(self.spc):
+            self._claim(first + s)
+            self.wdirty = True
+        self._sync_window()
+
+    def _entries(self, clust):
+        """Yield (name, sector, offset, entry bytes, slots) for each entry."""
+        lfn = []
+        check = None
+        slots = []
+        for sector, off in self._dir_slots(clust):
+            self._move(sector)
+            e = bytes(self.win[off:off + _DIR_ENTRY])
+            if e[0] == 0:
+                return
+            if e[0] == 0xE5:
+                lfn, slots = [], []
+                continue
+            if e[11] == _ATTR_LFN:
+                if e[0] & 0x40:
+                    lfn, slots = [], []
+                    check = e[13]
+                chars = e[1:11] + e[14:26] + e[28:32]
+                lfn.insert(0, chars)
+                slots.append((sector, off))
+                continue
+            slots.append((sector, off))
+            if e[11] & _ATTR_VOLUME:
+                lfn, slots = [], []
+                continue
+            name = None
+            if lfn and check == _sfn_checksum(e[0:11]):
+                raw = b"".join(lfn).decode("utf-16-le")
+                name = raw.split("\x00", 1)[0]
+            if not name:
+                name = _sfn_text(e)
+            yield name, sector, off, e, slots
+            lfn, slots = [], []
+
+    def _find(self, clust, name):
+        key = name.lower()
+        for entry in self._entries(clust):
+            if entry[0].lower() == key:
+                return entry
+        return None
+
+    def resolve(self, path, parent=False):
+        """
+        Walk ``path`` (relative to the volume root).
+
+        Returns:
+            (dir_cluster, name, entry) when parent is True, else the entry
+            tuple of the final component (None for the root directory)
+        """
+        parts = [p for p in path.split("/") if p]
+        clust = self.root
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            if last and parent:
+                return clust, part, self._find(clust, part)
+            entry = self._find(clust, part)
+            if entry is None:
+                raise _err(errno.ENOENT)
+            if last:
+                return entry
+            if not entry[3][11] & _ATTR_DIR:
+                raise _err(errno.ENOTDIR)
+            clust = self._entry_cluster(entry[3]) or self.root
+        if parent:
+            raise _err(errno.EINVAL)
+        return None
+
+    @staticmethod
+    def _entry_cluster(e):
+        return struct.unpack_from("<H", e, 20)[0] << 16 | struct.unpack_from("<H", e, 26)[0]
+
+    def _short_name(self, clust, name):
+        plain = _plain_sfn(name)
+        if plain:
+            return plain[0], plain[1], False
+        base, ext = _split_name(name)
+        clean = lambda s: bytes(c if c in _SFN_CHARS else ord("_")
+                                for c in s.upper().replace(" ", "").replace(".", "").encode("ascii", "replace"))
+        base, ext = clean(base), clean(ext)[:3]
+        taken = {e[3][0:11] for e in self._entries(clust)}
+        for n in range(1, 1000000):
+            tail = b"~%d" % n
+            sfn = (base[:8 - len(tail)] + tail).ljust(8) + ext.ljust(3)
+            if sfn not in taken:
+                return sfn, 0, True
+        raise _err(errno.EEXIST)
+
+    def create_entry(self, clust, name, attr, first_clust=0):
+        """Register ``name`` in the directory at ``clust``; returns (sector, offset)."""
+        sfn, case, need_lfn = self._short_name(clust, name)
+        count = 1
+        if need_lfn:
+            units = name.encode("utf-16-le")
+            count += (len(units) // 2 + _LFN_CHARS - 1) // _LFN_CHARS
+
+        run = []
+        for sector, off in self._dir_slots(clust, extend=True):
+            self._move(sector)
+            first = self.win[off]
+            if first in (0, 0xE5):
+                run.append((sector, off))
+                if len(run) == count:
+                    break
+            else:
+                run = []
+
+        ymd, hms = _fat_time(self.clock())
+        e = bytearray(_DIR_ENTRY)
+        e[0:11] = sfn
+        e[11] = attr
+        e[12] = case
+        struct.pack_into("<HHHHHHHI", e, 14, hms, ymd, ymd, first_clust >> 16, hms, ymd,
+                         first_clust & 0xFFFF, 0)
+        if need_lfn:
+            chk = _sfn_checksum(sfn)
+            chars = name.encode("utf-16-le") + b"\x00\x00"
+            chars = chars.ljust((count - 1) * _LFN_CHARS * 2, b"\xFF")
+            for i in range(count - 1):
+                seq = count - 1 - i
+                part = chars[(seq - 1) * 26:seq * 26]
+                lfn = bytearray(_DIR_ENTRY)
+                lfn[0] = seq | (0x40 if i == 0 else 0)
+                lfn[1:11] = part[0:10]
+                lfn[11] = _ATTR_LFN
+                lfn[13] = chk
+                lfn[14:26] = part[10:22]
+                lfn[28:32] = part[22:26]
+                sector, off = run[i]
+                self._move(sector)
+                self.win[off:off + _DIR_ENTRY] = lfn
+                self.wdirty = True
+        sector, off = run[-1]
+        self._move(sector)
+        self.win[off:off + _DIR_ENTRY] = e
+        self.wdirty = True
+        return sector, off
+
+    def remove_entry(self, slots):
+        for sector, off in slots:
+            self._move(sector)
+            self.win[off] = 0xE5
+            self.wdirty = True
+
+    def update_entry(self, sector, off, clust, size):
+        self._move(sector)
+        w = self.win
+        ymd, hms = _fat_time(self.clock())
+        w[off + 11] |= _ATTR_ARCHIVE
+        struct.pack_into("<H", w, off + 20, clust >> 16)
+        struct.pack_into("<HH", w, off + 22, hms, ymd)
+        struct.pack_into("<H", w, off + 18, ymd)
+        struct.pack_into("<H", w, off + 26, clust & 0xFFFF)
+        struct.pack_into("<I", w, off + 28, size)
+        self.wdirty = True
+
+    # --- os-level API (paths relative to the mount point) ---
+    def open(self, path, mode="r"):
+        return FatFile(self, path, mode)
+
+    def listdir(self, path=""):
+        entry = self.resolve(path) if path.strip("/") else None
+        clust = self._entry_cluster(entry[3]) if entry else self.root
+        return [e[0] for e in self._entries(clust or self.root) if e[0] not in (".", "..")]
+
+    def stat(self, path):
+        entry = self.resolve(path)
+        if entry is None:
+            return (0x4000, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+        e = entry[3]
+        mode = 0x4000 if e[11] & _ATTR_DIR else 0x8000
+        size = struct.unpack_from("<I", e, 28)[0]
+        return (mode, 0, 0, 0, 0, 0, size, 0, 0, 0)
+
+    def remove(self, path):
+        entry = self.resolve(path)
+        if entry is None or entry[3][11] & _ATTR_DIR:
+            raise _err(errno.EISDIR)
+        self.free_chain(self._entry_cluster(entry[3]))
+        self.remove_entry(entry[4])
+        self.sync()
+
+    def rename(self, old, new):
+        src = self.resolve(old)
+        if src is None:
+            raise _err(errno.EINVAL)
+        dclust, name, dst = self.resolve(new, parent=True)
+        if dst is not None:
+            # FatFs refuses; MicroPython's VfsFat removes the target and retries
+            self.remove(new)
+            src = self.resolve(old)
+        e = src[3]
+        sector, off = self.create_entry(dclust, name, e[11])
+        self._move(sector)
+        self.win[off + 13:off + _DIR_ENTRY] = e[13:]
+        self.wdirty = True
+        src = self.resolve(old)
+        self.remove_entry(src[4])
+        self.sync()
+
+    def mkdir(self, path):
+        pclust, name, existing = self.resolve(path, parent=True)
+        if existing is not None:
+            raise _err(errno.EEXIST)
+        clust = self.alloc()
+        self._clear_cluster(clust)
+        self.create_entry(pclust, name, _ATTR_DIR, clust)
+        first = self.cluster_sector(clust)
+        self._move(first)
+        for i, (sfn, target) in enumerate(((b".", clust), (b"..", 0 if pclust == self.root else pclust))):
+            off = i * _DIR_ENTRY
+            self.win[off:off + 11] = sfn.ljust(11)
+            self.win[off + 11] = _ATTR_DIR
+            struct.pack_into("<H", self.win, off + 20, target >> 16)
+            struct.pack_into("<H", self.win, off + 26, target & 0xFFFF)
+        self.wdirty = True
+        self.sync()
+
+    def statvfs(self):
+        free = self.free if self.free is not None else 0
+        n = self.nclusters - 2
+        return (self.cluster_bytes, self.cluster_bytes, n, free, free, 0, 0, 0, 0, 255)
+
+
+class FatFile:
+    """File object with the MicroPython stream API (read/readinto/readline/write/seek)."""
+
+    def __init__(self, vol, path, mode="r"):
+        self.vol = vol
+        self.binary = "b" in mode
+        self.readable = "r" in mode or "+" in mode
+        self.writable = "w" in mode or "a" in mode or "+" in mode
+        self.closed = False
+        self.modified = False
+        pclust, name, entry = vol.resolve(path, parent=True)
+        if entry is None:
+            if mode[0] == "r":
+                raise _err(errno.ENOENT)
+            self.dir_sect, self.dir_off = vol.create_entry(pclust, name, _ATTR_ARCHIVE)
+            self.start = 0
+            self.size = 0
+            self.modified = True
+        else:
+            e = entry[3]
+            if e[11] & _ATTR_DIR:
+                raise _err(errno.EISDIR)
+            self.dir_sect, self.dir_off = entry[1], entry[2]
+            self.start = vol._entry_cluster(e)
+            self.size = struct.unpack_from("<I", e, 28)[0]
+            if mode[0] == "w":
+                vol.update_entry(self.dir_sect, self.dir_off, 0, 0)
+                vol.free_chain(self.start)
+                self.start = 0
+                self.size = 0
+                self.modified = True
+        self.pos = 0
+        self.clust = 0      # cluster holding byte pos - 1 (0 at pos 0)
+        self.clust_idx = -1
+        if mode[0] == "a":
+            self.seek(0, 2)
+
+    # --- cluster walk ---
+    def _locate(self, pos, extend=False):
+        """Set clust/clust_idx for ``pos`` walking the chain like f_lseek."""
+        vol = self.vol
+        cb = vol.cluster_bytes
+        if pos == 0:
+            self.clust, self.clust_idx = 0, -1
+            return
+        target = (pos - 1) // cb
+        if self.clust and target >= self.clust_idx:
+            c, idx = self.clust, self.clust_idx
+        else:
+            if not self.start:
+                if not extend:
+                    raise _err(errno.EINVAL)
+                self.start = vol.alloc()
+            c, idx = self.start, 0
+        while idx < target:
+            nxt = vol.get_fat(c)
+            if nxt >= EOC or nxt < 2:
+                if not extend:
+                    raise _err(errno.EINVAL)
+                nxt = vol.alloc(c)
+            c, idx = nxt, idx + 1
+        self.clust, self.clust_idx = c, idx
+
+    def _next_cluster(self, allocate):
+        """Cluster for the byte at pos when pos is on a cluster boundary."""
+        vol = self.vol
+        if self.pos == 0:
+            c = self.start
+            if not c and allocate:
+                c = self.start = vol.alloc()
+        else:
+            c = vol.get_fat(self.clust)
+            if (c >= EOC or c < 2) and allocate:
+                c = vol.alloc(self.clust)
+        self.clust, self.clust_idx = c, self.clust_idx + 1
+        return c
+
+    # --- I/O ---
+    def _check(self):
+        if self.closed:
+            raise _err(errno.EBADF)
+
+    def readinto(self, buf):
+        self._check()
+        if not self.readable:
+            raise _err(errno.EBADF)
+        vol = self.vol
+        mv = memoryview(buf).cast("B")
+        want = min(len(mv), self.size - self.pos)
+        done = 0
+        cb = vol.cluster_bytes
+        while done < want:
+            if self.pos % cb == 0:
+                self._next_cluster(False)
+            sector = vol.cluster_sector(self.clust) + (self.pos % cb) // SECTOR
+            in_sec = self.pos % SECTOR
+            if in_sec == 0 and want - done >= SECTOR:
+                n = min((want - done) // SECTOR, vol.spc - (self.pos % cb) // SECTOR)
+                chunk = mv[done:done + n * SECTOR]
+                vol.bdev.readblocks(sector, chunk)
+                if vol.wdirty and sector <= vol.winsect < sector + n:
+                    o = (vol.winsect - sector) * SECTOR
+                    chunk[o:o + SECTOR] = vol.win
+                k = n * SECTOR
+            else:
+                vol._move(sector)
+                k = min(SECTOR - in_sec, want - done)
+                mv[done:done + k] = vol.win[in_sec:in_sec + k]
+            done += k
+            self.pos += k
+        return done
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = max(0, self.size - self.pos)
+        buf = bytearray(n)
+        got = self.readinto(buf)
+        data = bytes(buf[:got])
+        return data if self.binary else data.decode()
+
+    def readline(self):
+        out = bytearray()
+        one = bytearray(1)
+        while self.readinto(one):
+            out += one
+            if one[0] == 0x0A:
+                break
+        return bytes(out) if self.binary else out.decode()
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def write(self, data):
+        self._check()
+        if not self.writable:
+            raise _err(errno.EBADF)
+        if isinstance(data, str):
+            data = data.encode()
+        vol = self.vol
+        mv = memoryview(data).cast("B")
+        cb = vol.cluster_bytes
+        done = 0
+        while done < len(mv):
+            if self.pos % cb == 0:
+                self._next_cluster(True)
+            sector = vol.cluster_sector(self.clust) + (self.pos % cb) // SECTOR
+            in_sec = self.pos % SECTOR
+            left = len(mv) - done
+            if in_sec == 0 and left >= SECTOR:
+                n = min(left // SECTOR, vol.spc - (self.pos % cb) // SECTOR)
+                chunk = mv[done:done + n * SECTOR]
+                if sector <= vol.winsect < sector + n:
+                    o = (vol.winsect - sector) * SECTOR
+                    vol.win[:] = chunk[o:o + SECTOR]
+                    vol.wdirty = False
+                vol.bdev.writeblocks(sector, chunk)
+                k = n * SECTOR
+            else:
+                if in_sec == 0 and self.pos >= self.size:
+                    if vol.winsect != sector:
+                        vol._claim(sector)
+                else:
+                    vol._move(sector)
+                k = min(SECTOR - in_sec, left)
+                vol.win[in_sec:in_sec + k] = mv[done:done + k]
+                vol.wdirty = True
+            done += k
+            self.pos += k
+            if self.pos > self.size:
+                self.size = self.pos
+        self.modified = True
+        return done
+
+    def seek(self, offset, whence=0):
+        self._check()
+        if whence == 1:
+            offset += self.pos
+        elif whence == 2:
+            offset += self.size
+        if offset > self.size and not self.writable:
+            offset = self.size
+        self._locate(offset, extend=offset > self.size)
+        self.pos = offset
+        if offset > self.size:
+            self.size = offset
+            self.modified = True
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        """f_sync(): write back data, directory entry and FSInfo."""
+        self._check()
+        if self.modified:
+            self.vol.update_entry(self.dir_sect, self.dir_off, self.start, self.size)
+            self.modified = False
+            self.vol.sync()
+
+    def close(self):
+        if not self.closed:
+            self.flush()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- host-side inspection ---
+
+class ImageBlockDevice:
+    """Block device over an image file, for opening a card image on the host."""
+
+    def __init__(self, path, writable=False):
+        self.file = open(path, "r+b" if writable else "rb")
+        self.file.seek(0, 2)
+        self.sectors = self.file.tell() // SECTOR
+
+    def readblocks(self, block, buf):
+        self.file.seek(block * SECTOR)
+        self.file.readinto(buf)
+
+    def writeblocks(self, block, buf):
+        self.file.seek(block * SECTOR)
+        self.file.write(buf)
+
+    def ioctl(self, op, arg):
+        if op == 4:
+            return self.sectors
+        if op == 5:
+            return SECTOR
+
+    def close(self):
+        self.file.close()
+
+
+class RegionMap:
+    """
+    What a FAT volume keeps in each block of the card, for reading block
+    counters and traces.
+
+    Regions: "mbr", "reserved" (boot sector, FSInfo and their backups),
+    "fat1"/"fat2", "root" (root directory clusters), "dir" (other
+    directories), "data" (file contents; owner() names the file) and
+    "free" (unallocated clusters, gaps outside the partition).
+    """
+
+    def __init__(self, vol):
+        self.vol = vol
+        self.clusters = {}   # cluster -> (region, path)
+        self._walk(vol.root, "/", "root")
+
+    @classmethod
+    def from_image(cls, path):
+        bdev = ImageBlockDevice(path)
+        try:
+            return cls(FatVolume(bdev))
+        finally:
+            bdev.close()
+
+    def _walk(self, clust, path, region):
+        vol = self.vol
+        for c in vol.chain(clust):
+            self.clusters[c] = (region, path)
+        for name, _, _, e, _ in list(vol._entries(clust)):
+            if name in (".", ".."):
+                continue
+            first = vol._entry_cluster(e)
+            if e[11] & _ATTR_DIR:
+                if first:
+                    self._walk(first, path + name + "/", "dir")
+            else:
+                for c in vol.chain(first):
+                    self.clusters[c] = ("data", path + name)
+
+    def _cluster(self, block):
+        vol = self.vol
+        if block < vol.data_start:
+            return None
+        clust = (block - vol.data_start) // vol.spc + 2
+        return clust if clust < vol.nclusters else None
+
+    def region(self, block):
+        vol = self.vol
+        if block < vol.base:
+            return "mbr" if block == 0 else "free"
+        if block < vol.fat_start:
+            return "reserved"
+        if block < vol.data_start:
+            return "fat%d" % (1 + (block - vol.fat_start) // vol.fatsz)
+        return self.clusters.get(self._cluster(block), ("free",))[0]
+
+    def owner(self, block):
+        """Path of the file or directory holding ``block`` (None outside the data area)."""
+        entry = self.clusters.get(self._cluster(block))
+        return entry[1] if entry else None
+
+    def summary(self, counts):
+        """Sum a {block: count} mapping per region."""
+        totals = {}
+        for block, n in counts.items():
+            region = self.region(block)
+            totals[region] = totals.get(region, 0) + n
+        return dict(sorted(totals.items()))
@@ -0,0 +1,453 @@
+"""
+Hardware-in-the-loop simulation: run the unmodified firmware (main.py and
+lib/) on a PC against register-level sensor models and an SD card image.
+
+The firmware is executed with its own builtins: ``import time``/``os`` get
+virtual versions driven by the simulated board, the fake MicroPython
+modules in polysense/sim/stubs replace ``machine``, ``micropython`` and
+``framebuf``, ``open('/sd/...')`` goes through the FAT model on the card
+and ``bytearray`` truncates stored ints like MicroPython's. Sleeping costs
+no wall time, so a day of 30-second cycles runs in seconds.
+
+Only the cost of peripheral access (see board.DEFAULT_COSTS), bus transfers
+and card latency is charged to the virtual clock; the firmware's own Python
+execution time is not modelled, so cycle times are a lower bound.
+
+Usage:
+    # 100 cycles of the stock firmware, fresh 64 MiB card image
+    python -m polysense.sim.hil --cycles 100
+
+    # ring log mode on a kept image, with the display on, as JSON
+    python -m polysense.sim.hil --cycles 500 --set LOG_MODE='"ring"' \\
+        --image card.img --display --json
+"""
+
+import argparse
+import ast
+import builtins
+import calendar
+import errno
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time as _time
+import types
+
+from polysense.sim import devices
+from polysense.sim.board import Board, Halt
+from polysense.sim.fat import FatVolume, RegionMap, mkfs
+from polysense.sim.sdcard import SDCard
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+LIB = os.path.join(ROOT, "lib")
+STUBS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+CYCLE_S = 30
+
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALF = _TICKS_PERIOD // 2
+
+
+class MPBytearray(bytearray):
+    """bytearray that stores ``value & 0xFF`` like MicroPython instead of raising."""
+
+    def __setitem__(self, index, value):
+        if isinstance(value, int):
+            value &= 0xFF
+        super().__setitem__(index, value)
+
+
+def _time_module(board):
+    """The firmware's ``time``: ticks, sleeps and RTC time on the board clock."""
+    clock = board.clock
+    call_us = board.costs["call_us"]
+    mod = types.ModuleType("time")
+
+    def sleep_us(us):
+        board.sleep_us(us)
+
+    def ticks_us():
+        clock.charge(call_us)
+        return int(clock.now_us) & _TICKS_MAX
+
+    def ticks_ms():
+        clock.charge(call_us)
+        return int(clock.now_us // 1000) & _TICKS_MAX
+
+    def ticks_diff(a, b):
+        return ((a - b + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+    def localtime(secs=None):
+        t = _time.gmtime(int(board.epoch() if secs is None else secs))
+        return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec,
+                t.tm_wday, t.tm_yday)
+
+    mod.sleep = lambda s: sleep_us(s * 1e6)
+    mod.sleep_ms = lambda ms: sleep_us(ms * 1000)
+    mod.sleep_us = sleep_us
+    mod.ticks_us = ticks_us
+    mod.ticks_ms = ticks_ms
+    mod.ticks_cpu = ticks_us
+    mod.ticks_diff = ticks_diff
+    mod.ticks_add = lambda t, delta: (t + delta) & _TICKS_MAX
+    mod.time = lambda: int(board.epoch())
+    mod.time_ns = lambda: int(board.epoch() * 1e9)
+    mod.localtime = localtime
+    mod.gmtime = localtime
+    mod.mktime = lambda t: calendar.timegm(tuple(t[:6]) + (0, 0, 0))
+    return mod
+
+
+class VirtualOS(types.ModuleType):
+    """The firmware's ``os``: VFS mounts backed by FatVolume."""
+
+    def __init__(self, board):
+        super().__init__("os")
+        self.board = board
+        self.mounts = {}
+        self.sep = "/"
+
+    def _stamp(self):
+        return self.board.localtime()[:6]
+
+    def _lookup(self, path):
+        for point, vol in self.mounts.items():
+            if path == point or path.startswith(point + "/"):
+                return vol, path[len(point):]
+        raise OSError(errno.ENOENT, "no such file or directory: %s" % path)
+
+    def mount(self, bdev, point, *, readonly=False):
+        if point in self.mounts:
+            raise OSError(errno.EPERM)
+        self.mounts[point] = FatVolume(bdev, clock=self._stamp)
+
+    def umount(self, point):
+        vol = self.mounts.pop(point, None)
+        if vol is None:
+            raise OSError(errno.EINVAL)
+        vol.sync()
+
+    def open(self, path, mode="r"):
+        vol, rel = self._lookup(path)
+        return vol.open(rel, mode)
+
+    def listdir(self, path="/"):
+        if path.rstrip("/") == "":
+            return [p.lstrip("/") for p in self.mounts]
+        vol, rel = self._lookup(path.rstrip("/"))
+        return vol.listdir(rel)
+
+    def stat(self, path):
+        vol, rel = self._lookup(path)
+        return vol.stat(rel)
+
+    def remove(self, path):
+        vol, rel = self._lookup(path)
+        vol.remove(rel)
+
+    def rename(self, old, new):
+        vol, rel = self._lookup(old)
+        vol2, rel2 = self._lookup(new)
+        if vol2 is not vol:
+            raise OSError(errno.EXDEV)
+        vol.rename(rel, rel2)
+
+    def mkdir(self, path):
+        vol, rel = self._lookup(path)
+        vol.mkdir(rel)
+
+    def statvfs(self, path):
+        vol, _ = self._lookup(path)
+        return vol.statvfs()
+
+    def sync(self):
+        for vol in self.mounts.values():
+            vol.sync()
+
+    def uname(self):
+        return ("rp2", "rp2", "1.24.0", "v1.24.0 (sim)", "Raspberry Pi Pico W with RP2040")
+
+    def getcwd(self):
+        return "/"
+
+
+def _gc_module():
+    mod = types.ModuleType("gc")
+    mod.collect = lambda: None
+    mod.enable = lambda: None
+    mod.disable = lambda: None
+    mod.isenabled = lambda: True
+    mod.mem_free = lambda: 180000
+    mod.mem_alloc = lambda: 12000
+    mod.threshold = lambda amount=None: -1 if amount is None else None
+    return mod
+
+
+class Firmware:
+    """
+    A private copy of the firmware's modules bound to one simulated board.
+
+    Modules from lib/ and polysense/sim/stubs are loaded fresh for every
+    Firmware, so several simulations can run in one process.
+    """
+
+    def __init__(self, board, echo=False, lib=LIB):
+        self.board = board
+        self.echo = echo
+        self.paths = (lib, STUBS)
+        self.output = []
+        self.os = VirtualOS(board)
+        self.modules = {"time": _time_module(board), "os": self.os, "gc": _gc_module()}
+        for alias, name in (("utime", "time"), ("uos", "os")):
+            self.modules[alias] = self.modules[name]
+        self.builtins = dict(vars(builtins))
+        self.builtins.update(__import__=self._import, open=self._open, print=self._print,
+                             bytearray=MPBytearray)
+
+    def _print(self, *args, sep=" ", end="\n", file=None):
+        line = sep.join(str(a) for a in args)
+        self.output.append(line)
+        if self.echo:
+            sys.stdout.write(line + end)
+
+    def _open(self, path, mode="r", *args, **kwargs):
+        return self.os.open(path, mode)
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        mod = self.modules.get(name)
+        if mod is None:
+            mod = self.load(name)
+        if mod is None:
+            return builtins.__import__(name, globals, locals, fromlist, level)
+        return mod
+
+    def load(self, name):
+        """Load lib/<name>.py or stubs/<name>.py into this firmware (None if neither)."""
+        for base in self.paths:
+            path = os.path.join(base, name + ".py")
+            if os.path.exists(path):
+                break
+        else:
+            return None
+        mod = types.ModuleType(name)
+        mod.__file__ = path
+        mod.__builtins__ = self.builtins
+        self.modules[name] = mod
+        with open(path) as f:
+            code = compile(f.read(), path, "exec")
+        exec(code, mod.__dict__)
+        if name == "machine":
+            mod.attach(self.board)
+        return mod
+
+    def run(self, path, overrides=None):
+        """
+        Execute ``path`` as the firmware's main.py.
+
+        Args:
+            overrides: {name: python expression} replacing top-level
+                       assignments (e.g. {"LOG_MODE": '"ring"'})
+
+        Returns:
+            dict: The script's globals when it stopped
+        """
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for name, expr in (overrides or {}).items():
+            for node in tree.body:
+                if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                        and isinstance(node.targets[0], ast.Name) and node.targets[0].id == name):
+                    node.value = ast.parse(expr, mode="eval").body
+                    break
+            else:
+                raise ValueError("main.py has no top-level assignment to %s" % name)
+        ns = {"__name__": "__main__", "__file__": path, "__builtins__": self.builtins}
+        try:
+            exec(compile(tree, path, "exec"), ns)
+        except Halt:
+            pass
+        return ns
+
+
+class Station:
+    """
+    The PolySense board: sensors, display, buttons and SD card wired to the
+    pins main.py uses.
+
+    Args:
+        image: FAT-formatted card image
+        cycles: Press the eject button after this many 30-second cycles
+        display: Hold the display button (OLED updates every cycle)
+        seed: Sensor noise seed
+        rtc: Initial RTC setting
+        costs: Overrides for board.DEFAULT_COSTS
+    """
+
+    def __init__(self, image, cycles=100, display=False, seed=0, rtc=(2025, 9, 1, 0, 0, 0),
+                 costs=None):
+        board = self.board = Board(costs=costs, rtc=rtc,
+                                   deadline_s=cycles * (CYCLE_S + 5) + 600)
+        env = self.env = devices.Environment(board, seed=seed)
+        i2c1 = board.i2c_bus(1)
+        self.mpu = i2c1.attach(devices.MPU6050(env))
+        self.aht = i2c1.attach(devices.AHT20(env))
+        self.bmp280 = i2c1.attach(devices.BMP280(env))
+        i2c0 = board.i2c_bus(0)
+        self.bmp180 = i2c0.attach(devices.BMP180(env))
+        self.oled = i2c0.attach(devices.SSD1306())
+        self.sd = board.spi_bus(1).attach(SDCard(board, image), board.net(13))
+        self.ds18b20 = board.net(2).attach(devices.DS18B20(env))
+        self.dht = board.net(9).attach(devices.DHT11(env))
+        board.attach_adc(2, devices.NTCDivider(env))
+        board.net(3).attach(devices.Button(lambda: len(self.cycles) >= cycles))
+        board.net(22).attach(devices.Button(lambda: display))
+
+        self.cycles = []    # per 30 s cycle: counters at the start of the sleep
+        self.wake_us = 0.0
+        board.sleep_hooks.append(self._on_sleep)
+
+    def counters(self):
+        board = self.board
+        return {
+            "i2c_transactions": sum(bus.transactions for bus in board.i2c.values()),
+            "i2c_bytes": sum(bus.bytes for bus in board.i2c.values()),
+            "onewire_resets": self.ds18b20.resets,
+            "onewire_edges": board.net(2).edges,
+            "dht_frames": self.dht.frames,
+            "sd_blocks_read": self.sd.blocks_read,
+            "sd_blocks_written": self.sd.blocks_written,
+            "sd_commands": sum(self.sd.commands.values()),
+        }
+
+    def _on_sleep(self, us):
+        if us != CYCLE_S * 1e6:
+            return
+        now = self.board.clock.now_us
+        self.cycles.append(dict(self.counters(), busy_us=now - self.wake_us, at_us=now))
+        self.wake_us = now + us
+
+
+def run(cycles=100, image=None, image_mb=64, overrides=None, display=False, seed=0,
+        costs=None, echo=False, main=os.path.join(ROOT, "main.py")):
+    """
+    Boot the firmware on a simulated station and run ``cycles`` logging cycles.
+
+    Args:
+        image: Card image to use (kept); a fresh one in a temp dir if None
+        image_mb: Size of a newly formatted image
+        overrides: Top-level main.py settings, {name: expression}
+
+    Returns:
+        dict: Benchmark report (see report())
+    """
+    tmpdir = None
+    if image is None:
+        tmpdir = tempfile.mkdtemp(prefix="polysense-hil-")
+        image = os.path.join(tmpdir, "sd.img")
+    if not os.path.exists(image):
+        mkfs(image, image_mb << 20)
+    station = Station(image, cycles=cycles, display=display, seed=seed, costs=costs)
+    firmware = Firmware(station.board, echo=echo)
+    wall0 = _time.perf_counter()
+    try:
+        ns = firmware.run(main, overrides)
+        wall = _time.perf_counter() - wall0
+        regions = RegionMap.from_image(image)
+    finally:
+        station.sd.close()
+        if tmpdir:
+            shutil.rmtree(tmpdir)
+    return report(station, firmware, ns, wall, regions)
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def report(station, firmware, ns, wall_s, regions=None):
+    """Summarise a finished run: boot, per-cycle bus and card traffic, speed."""
+    board = station.board
+    cycles = station.cycles
+    records = ns.get("record_count", 0)
+    boot = cycles[0] if cycles else station.counters()
+    # Steady state: differences between consecutive cycles (boot excluded)
+    steady = [{k: b[k] - a[k] for k in b if k not in ("busy_us", "at_us")}
+              for a, b in zip(cycles, cycles[1:])]
+    per_cycle = {k: _mean([d[k] for d in steady]) for k in (steady[0] if steady else {})}
+    busy = [c["busy_us"] / 1000 for c in cycles[1:]]
+    virtual_s = board.now_s()
+    return {
+        "cycles": len(cycles),
+        "records": records,
+        "boot_ms": round(cycles[0]["busy_us"] / 1000, 1) if cycles else None,
+        "boot": {k: v for k, v in boot.items() if k not in ("busy_us", "at_us")},
+        "cycle_ms": {
+            "mean": round(_mean(busy), 2),
+            "min": round(min(busy), 2) if busy else None,
+            "max": round(max(busy), 2) if busy else None,
+        },
+        "per_cycle": {k: round(v, 3) for k, v in per_cycle.items()},
+        "i2c_per_device": {
+            bus.name: {"0x%02X" % addr: n for addr, n in sorted(bus.per_device.items())}
+            for bus in board.i2c.values()
+        },
+        "sd_commands": station.sd.stats()["commands"],
+        "sd_writes_by_region": regions.summary(station.sd.writes) if regions else None,
+        "virtual_s": round(virtual_s, 1),
+        "wall_s": round(wall_s, 2),
+        "speedup": round(virtual_s / wall_s) if wall_s else None,
+        "output": firmware.output,
+    }
+
+
+def _print_report(r):
+    print("cycles %d, records %d, boot %s ms" % (r["cycles"], r["records"], r["boot_ms"]))
+    c = r["cycle_ms"]
+    print("cycle busy time: mean %.1f ms (min %s, max %s)" % (c["mean"], c["min"], c["max"]))
+    print("per cycle:")
+    for k, v in r["per_cycle"].items():
+        print("  %-18s %10.2f" % (k, v))
+    print("I2C transactions per device (total):")
+    for bus, devs in r["i2c_per_device"].items():
+        print("  %-6s %s" % (bus, ", ".join("%s: %d" % kv for kv in devs.items())))
+    print("SD commands:", ", ".join("CMD%d: %d" % kv for kv in r["sd_commands"].items()))
+    if r["sd_writes_by_region"]:
+        print("SD blocks written by region:",
+              ", ".join("%s: %d" % kv for kv in r["sd_writes_by_region"].items()))
+    print("virtual %.0f s in %.2f s wall (%sx)" % (r["virtual_s"], r["wall_s"], r["speedup"]))
+    for line in r["output"]:
+        print("firmware:", line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the PolySense firmware on simulated hardware")
+    parser.add_argument("--cycles", type=int, default=100, help="30 s cycles before eject")
+    parser.add_argument("--image", help="SD card image (created and kept if missing)")
+    parser.add_argument("--image-mb", type=int, default=64, help="size of a new image")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=EXPR",
+                        help="override a top-level main.py setting")
+    parser.add_argument("--display", action="store_true", help="display button held")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--echo", action="store_true", help="show firmware prints live")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    overrides = {}
+    for item in args.set:
+        name, sep, expr = item.partition("=")
+        if not sep:
+            parser.error("--set expects NAME=EXPR")
+        overrides[name.strip()] = expr
+    r = run(cycles=args.cycles, image=args.image, image_mb=args.image_mb, overrides=overrides,
+            display=args.display, seed=args.seed, echo=args.echo)
+    if args.json:
+        json.dump(r, sys.stdout, indent=2)
+        print()
+    else:
+        _print_report(r)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Pin-level bus simulation with a virtual microsecond clock.
+
+Time only advances when the code under test sleeps or touches a pin, so a
+bit-banged driver can be timed deterministically on a PC: every pin access
+and every ``sleep_us`` call is charged to the clock according to a cost
+profile describing how expensive that operation is on the real MCU.
+"""
+
+
+class VirtualClock:
+    """
+    Stand-in for the MicroPython ``time`` tick/sleep functions.
+
+    Args:
+        call_us: Fixed overhead charged to every sleep_us/ticks call, i.e.
+                 the cost of calling into the runtime from Python
+    """
+
+    def __init__(self, call_us=0.0):
+        self.now_us = 0.0
+        self.call_us = call_us
+
+    def charge(self, us):
+        self.now_us += us
+
+    def sleep_us(self, us):
+        self.now_us += self.call_us + max(0, us)
+
+    def sleep_ms(self, ms):
+        self.sleep_us(ms * 1000)
+
+    def sleep(self, seconds):
+        self.sleep_us(seconds * 1000000)
+
+    def ticks_us(self):
+        self.now_us += self.call_us
+        return int(self.now_us)
+
+    def ticks_ms(self):
+        return int(self.now_us // 1000)
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+    def ticks_add(self, a, b):
+        return a + b
+
+
+class Line:
+    """
+    Open-drain wire with a pull-up: low if any participant pulls it low.
+
+    Participants are any hashable object; listeners are told about every level
+    change together with the participant that caused it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.pulling = set()
+        self.level = 1
+        self.listeners = []
+        self.pollers = []
+
+    def drive(self, who, low):
+        if low:
+            self.pulling.add(who)
+        else:
+            self.pulling.discard(who)
+        self._update(who)
+
+    def read(self):
+        for poll in self.pollers:
+            poll()
+        return self.level
+
+    def _update(self, source):
+        level = 0 if self.pulling else 1
+        if level != self.level:
+            self.level = level
+            for listener in self.listeners:
+                listener(self, level, source)
+
+
+class SimPin:
+    """
+    Pin-like object on a Line, with the subset of ``machine.Pin`` used by
+    open-drain bit-bang drivers: pin(), pin(value), value(), init().
+
+    Args:
+        line: Line this pin is wired to
+        clock: VirtualClock to charge
+        op_us: Cost of one pin access on the target
+    """
+
+    OUT = 1
+    IN = 0
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, line, clock, op_us=0.0):
+        self.line = line
+        self.clock = clock
+        self.op_us = op_us
+        self.ops = 0
+        self.inits = 0
+        self.mode = self.OPEN_DRAIN
+
+    def init(self, mode=None, pull=None, value=None):
+        self.inits += 1
+        self.clock.charge(self.op_us * 4)
+        if mode is not None:
+            self.mode = mode
+        if mode == self.IN:
+            self.line.drive(self, False)
+        if value is not None:
+            self(value)
+
+    def __call__(self, value=None):
+        self.ops += 1
+        self.clock.charge(self.op_us)
+        if value is None:
+            return self.line.read()
+        # OUT mode is treated as open drain too: I2C lines always have pull-ups
+        self.line.drive(self, not value)
+
+    def value(self, value=None):
+        return self(value)
+
+
+class I2CTarget:
+    """
+    Pin-level I2C target with a 256-byte register file.
+
+    Follows the START/STOP conditions and clock edges on a pair of Lines,
+    ACKs its address, auto-increments the register pointer and can stretch
+    the clock after every byte.
+
+    Args:
+        scl, sda: Bus lines
+        clock: VirtualClock (needed for clock stretching)
+        addr: 7-bit address
+        regs: Initial register contents {reg: value}
+        stretch_us: SCL low-hold after each acknowledged byte (0 = none)
+    """
+
+    def __init__(self, scl, sda, clock, addr, regs=None, stretch_us=0):
+        self.scl = scl
+        self.sda = sda
+        self.clock = clock
+        self.addr = addr
+        self.mem = bytearray(256)
+        for reg, value in (regs or {}).items():
+            self.mem[reg] = value
+        self.stretch_us = stretch_us
+        self.stretch_until = None
+        self.state = "idle"
+        self.reg = 0
+        self.expect_reg = False
+        self.rw = 0
+        self.first = True
+        self.transactions = 0
+        scl.listeners.append(self._on_edge)
+        sda.listeners.append(self._on_edge)
+        scl.pollers.append(self._poll)
+
+    def _poll(self):
+        if self.stretch_until is not None and self.clock.now_us >= self.stretch_until:
+            self.stretch_until = None
+            self.scl.drive(self, False)
+
+    def _on_edge(self, line, level, source):
+        if line is self.sda:
+            if source is self:
+                return
+            if self.scl.level:
+                if level == 0:
+                    self._start()
+                else:
+                    self.state = "idle"
+            return
+        if level:
+            self._rise()
+        else:
+            self._fall()
+
+    def _start(self):
+        self.transactions += 1
+        self.state = "recv"
+        self.bits = 0
+        self.shift = 0
+        self.first = True
+        self.expect_reg = True
+        self.sda.drive(self, False)
+
+    def _rise(self):
+        if self.state == "recv":
+            self.shift = (self.shift << 1) | self.sda.level
+            self.bits += 1
+        elif self.state == "ack_in":
+            self.master_ack = self.sda.level == 0
+
+    def _fall(self):
+        if self.state == "recv" and self.bits == 8:
+            byte = self.shift
+            if self.first:
+                self.first = False
+                if byte >> 1 != self.addr:
+                    self.state = "idle"
+                    return
+                self.rw = byte & 1
+            elif self.expect_reg:
+                self.reg = byte
+                self.expect_reg = False
+            else:
+                self.mem[self.reg] = byte
+                self.reg = (self.reg + 1) & 0xFF
+            self.sda.drive(self, True)  # ACK
+            self.state = "ack_out"
+        elif self.state == "ack_out":
+            self.sda.drive(self, False)
+            self._stretch()
+            if self.rw:
+                self._load()
+            else:
+                self.state = "recv"
+                self.bits = 0
+                self.shift = 0
+        elif self.state == "send":
+            self.bitpos -= 1
+            if self.bitpos < 0:
+                self.sda.drive(self, False)
+                self.state = "ack_in"
+            else:
+                self.sda.drive(self, not (self.out >> self.bitpos) & 1)
+        elif self.state == "ack_in":
+            if self.master_ack:
+                self._stretch()
+                self._load()
+            else:
+                self.state = "idle"
+
+    def _load(self):
+        self.out = self.mem[self.reg]
+        self.reg = (self.reg + 1) & 0xFF
+        self.bitpos = 7
+        self.state = "send"
+        self.sda.drive(self, not (self.out >> 7) & 1)
+
+    def _stretch(self):
+        if self.stretch_us:
+            self.stretch_until = self.clock.now_us + self.stretch_us
+            self.scl.drive(self, True)
@@ -0,0 +1,80 @@
+"""
+Run lib/uplink.py on Linux against a local collector.
+
+The firmware module is imported unmodified; the fake ``network`` module in
+polysense/sim/stubs stands in for the Pico W radio.
+
+Usage:
+    # HTTP, with the stub collector running (python -m polysense.sim.collector)
+    python -m polysense.sim.run_uplink datalog_final.csv
+
+    # MQTT, against a local mosquitto (mosquitto_sub -t 'polysense/#' -v)
+    python -m polysense.sim.run_uplink datalog_final.csv --mqtt --port 1883
+
+    # ring log instead of CSV
+    python -m polysense.sim.run_uplink datalog.ring
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+STUBS = os.path.join(os.path.dirname(__file__), "stubs")
+
+
+def load_firmware():
+    """Import the firmware's uplink/ringlog modules with the stubs on sys.path."""
+    for path in (os.path.join(ROOT, "lib"), STUBS):
+        path = os.path.abspath(path)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    import network
+    import ringlog
+    import uplink
+    return network, ringlog, uplink
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forward a PolySense log to a collector")
+    parser.add_argument("log", help="datalog_final.csv or datalog.ring")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--mqtt", action="store_true", help="publish to an MQTT broker")
+    parser.add_argument("--state", help="offset file (default: <log>.uplink)")
+    parser.add_argument("--batch-bytes", type=int, default=16384)
+    parser.add_argument("--batches", type=int, default=50, help="batches per burst")
+    args = parser.parse_args()
+
+    network, ringlog, uplink = load_firmware()
+    if args.log.endswith(".ring"):
+        ring = ringlog.RingLog(args.log)
+        source = uplink.RingSource(ring)
+    else:
+        ring = None
+        source = uplink.CsvSource(args.log)
+    if args.mqtt:
+        transport = uplink.MqttTransport(args.host, args.port or 1883)
+    else:
+        transport = uplink.HttpTransport(args.host, args.port or 8080)
+
+    up = uplink.Uplink(source, transport, args.state or args.log + ".uplink",
+                       ssid="sim", password="sim", batch_bytes=args.batch_bytes)
+    bursts = 0
+    while True:
+        sent = up.run(args.batches)
+        bursts += 1
+        if sent < args.batches:
+            break
+    if ring:
+        ring.close()
+
+    wlan = network.WLAN(network.STA_IF)
+    ratio = up.sent_bytes / up.wire_bytes if up.wire_bytes else 0
+    print(f"{bursts} burst(s), {up.sent_rows} rows, {up.sent_bytes} bytes "
+          f"-> {up.wire_bytes} on the wire ({ratio:.1f}x), offset {up.offset}, "
+          f"radio on {wlan.radio_on_s:.2f} s over {wlan.activations} activation(s)")
+
+
+if __name__ == "__main__":
+    main()
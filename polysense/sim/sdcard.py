@@ -0,0 +1,288 @@
+"""
+SPI-mode SD card backed by a disk image, for lib/sdcard.py to talk to.
+
+Implements the part of the SD physical layer the MicroPython driver uses:
+CMD0/8/55/ACMD41/58 initialisation (SDHC, block addressing), CSD v2 via
+CMD9, CMD16, single and multiple block reads (CMD17/18/12) and writes
+(CMD24/25 with the 0xFE/0xFC/0xFD tokens, data response and busy). The
+image is memory-mapped; every command is counted, every block read and
+written is counted per block (and optionally traced), and the card's
+internal access/programming time from the latency model is charged to the
+board clock.
+"""
+
+import mmap
+import os
+from collections import Counter
+
+SECTOR = 512
+
+_R1_IDLE = 0x01
+_R1_ILLEGAL = 0x04
+_R1_ADDRESS = 0x20
+
+# Card-internal latency model (us); estimates for a class 10 microSD card,
+# override per card. Writes that land in an allocation unit the controller
+# does not have open pay for closing one (copying the rest of its pages).
+LATENCY = {
+    "read_us": 150.0,        # access time of a single block / first block of CMD18
+    "read_seq_us": 40.0,     # each further block of a CMD18 stream
+    "write_us": 700.0,       # programming a CMD24 block
+    "write_seq_us": 250.0,   # each further block of a CMD25 stream
+    "au_switch_us": 2500.0,  # extra when a write opens another allocation unit
+    "au_blocks": 8192,       # allocation unit size (4 MiB)
+    "open_aus": 2,           # allocation units kept open (LRU)
+}
+
+
+class SDCard:
+    """
+    The card model; attach it to an SPI bus with its chip-select net.
+
+    Args:
+        board: Board whose clock is charged for card latency
+        path: Image file (its size, rounded down to 512 KiB, is the capacity)
+        latency: Overrides for LATENCY
+        trace: Record every block access as (time_us, "R"/"W", block)
+    """
+
+    def __init__(self, board, path, latency=None, trace=False):
+        self.board = board
+        self.path = path
+        self.latency = dict(LATENCY)
+        if latency:
+            self.latency.update(latency)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.sectors = os.path.getsize(path) // SECTOR // 1024 * 1024
+        self.cs = None
+        self.idle = True
+        self.app = False
+        self.acmd41_polls = 0
+        self.out = bytearray()
+        self.out_pos = 0
+        self.cmdbuf = bytearray()
+        self.read_next = None     # next block of an open CMD18
+        self.write_next = None    # next block of an open CMD24/CMD25
+        self.write_multi = False
+        self.rx = None            # data block being received
+        self.rx_need = 0
+        self.streaming = False     # inside a CMD18/CMD25 stream past its first block
+        self.open_aus = []
+        self.trace = [] if trace else None
+        self.reset_counters()
+
+    def reset_counters(self):
+        """Zero the command, block and busy-time counters (not the card state)."""
+        self.commands = Counter()
+        self.reads = Counter()      # block -> times read
+        self.writes = Counter()     # block -> times written
+        self.blocks_read = 0
+        self.blocks_written = 0
+        self.busy_us = 0.0
+        self.au_switches = 0
+        if self.trace is not None:
+            self.trace = []
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    # --- SPI side ---
+    def _pop(self, n):
+        out, pos = self.out, self.out_pos
+        chunk = out[pos:pos + n]
+        self.out_pos = pos + len(chunk)
+        if self.out_pos >= len(out):
+            self.out = bytearray()
+            self.out_pos = 0
+        if len(chunk) < n:
+            chunk += b"\xff" * (n - len(chunk))
+        return chunk
+
+    def _queue(self, data):
+        self.out += data
+
+    def exchange(self, data):
+        n = len(data)
+        if self.rx is None and not self.cmdbuf and data.count(0xFF) == n:
+            # host clocking out data: refill from an open multi-block read
+            while self.read_next is not None and len(self.out) - self.out_pos < n:
+                self._queue_block(self.read_next)
+                self.read_next += 1
+            return bytes(self._pop(n))
+        result = bytearray()
+        i = 0
+        while i < n:
+            if self.rx is not None:
+                take = min(n - i, self.rx_need)
+                result += self._pop(take)
+                self.rx += data[i:i + take]
+                self.rx_need -= take
+                i += take
+                if not self.rx_need:
+                    self._write_block()
+                continue
+            result += self._pop(1)
+            self._input(data[i])
+            i += 1
+        return bytes(result)
+
+    def _input(self, byte):
+        if self.cmdbuf or (byte & 0xC0 == 0x40 and self.write_next is None):
+            if not self.cmdbuf:
+                self.out = bytearray()
+                self.out_pos = 0
+                self.read_next = None
+            self.cmdbuf.append(byte)
+            if len(self.cmdbuf) == 6:
+                cmd = self.cmdbuf
+                self.cmdbuf = bytearray()
+                self._command(cmd[0] & 0x3F, int.from_bytes(cmd[1:5], "big"))
+            return
+        if self.write_next is None:
+            return
+        if byte == 0xFE and not self.write_multi or byte == 0xFC and self.write_multi:
+            self.rx = bytearray()
+            self.rx_need = SECTOR + 2
+        elif byte == 0xFD and self.write_multi:
+            self.write_next = None
+            self._queue(b"\xff\x00")  # one busy byte after the stop token
+        elif byte & 0xC0 == 0x40:
+            self.write_next = None
+            self._input(byte)
+
+    # --- card side ---
+    def _r1(self, flags=0):
+        return (_R1_IDLE if self.idle else 0) | flags
+
+    def _command(self, cmd, arg):
+        self.commands[cmd] += 1
+        self.streaming = False
+        app, self.app = self.app, False
+        q = self._queue
+        if cmd == 0:
+            self.idle = True
+            self.acmd41_polls = 0
+            q(bytes((0xFF, _R1_IDLE)))
+        elif cmd == 8:
+            q(bytes((0xFF, self._r1(), 0, 0, (arg >> 8) & 0x0F, arg & 0xFF)))
+        elif cmd == 55:
+            self.app = True
+            q(bytes((0xFF, self._r1())))
+        elif cmd == 41 and app:
+            self.acmd41_polls += 1
+            if self.acmd41_polls >= 2:
+                self.idle = False
+            q(bytes((0xFF, self._r1())))
+        elif cmd == 58:
+            ocr = b"\xff\x80\x00" if self.idle else b"\xc0\xff\x80\x00"
+            q(bytes((0xFF, self._r1())) + (b"\x00" + ocr if self.idle else ocr))
+        elif cmd == 9:
+            q(bytes((0xFF, self._r1(), 0xFF, 0xFE)) + self._csd() + b"\xff\xff")
+        elif cmd == 16:
+            q(bytes((0xFF, self._r1(0 if arg == SECTOR else 0x40))))
+        elif cmd in (17, 18):
+            if arg >= self.sectors:
+                q(bytes((0xFF, self._r1(_R1_ADDRESS))))
+                return
+            q(bytes((0xFF, self._r1())))
+            self._queue_block(arg)
+            if cmd == 18:
+                self.read_next = arg + 1
+        elif cmd == 12:
+            self.read_next = None
+            q(b"\xff\xff\x00")
+        elif cmd in (24, 25):
+            if arg >= self.sectors:
+                q(bytes((0xFF, self._r1(_R1_ADDRESS))))
+                return
+            q(bytes((0xFF, self._r1())))
+            self.write_next = arg
+            self.write_multi = cmd == 25
+        elif cmd == 13:
+            q(bytes((0xFF, self._r1(), 0x00)))
+        else:
+            q(bytes((0xFF, self._r1(_R1_ILLEGAL))))
+
+    def _csd(self):
+        c_size = self.sectors // 1024 - 1
+        csd = bytearray(16)
+        csd[0] = 0x40                 # CSD version 2.0
+        csd[1] = 0x0E                 # TAAC
+        csd[3] = 0x32                 # TRAN_SPEED 25 MHz
+        csd[4] = 0x5B
+        csd[5] = 0x59                 # CCC, READ_BL_LEN = 9
+        csd[7] = (c_size >> 16) & 0x3F
+        csd[8] = (c_size >> 8) & 0xFF
+        csd[9] = c_size & 0xFF
+        csd[10] = 0x7F
+        csd[11] = 0x80
+        csd[12] = 0x0A
+        csd[13] = 0x40
+        csd[15] = 0x01
+        return bytes(csd)
+
+    def _busy(self, us):
+        self.busy_us += us
+        self.board.clock.charge(us)
+
+    def _access(self, op, block):
+        if self.trace is not None:
+            self.trace.append((self.board.clock.now_us, op, block))
+
+    def _queue_block(self, block):
+        if block >= self.sectors:
+            self.read_next = None
+            return
+        lat = self.latency
+        self._busy(lat["read_seq_us"] if self.streaming else lat["read_us"])
+        self.streaming = True
+        self._access("R", block)
+        self.reads[block] += 1
+        self.blocks_read += 1
+        offset = block * SECTOR
+        self._queue(b"\xff\xfe" + self.map[offset:offset + SECTOR] + b"\xff\xff")
+
+    def _write_block(self):
+        data, self.rx = self.rx[:SECTOR], None
+        block = self.write_next
+        if block >= self.sectors:
+            self._queue(b"\x0d")  # write error
+            self.write_next = None
+            return
+        lat = self.latency
+        au = block // lat["au_blocks"]
+        busy = lat["write_seq_us"] if self.streaming else lat["write_us"]
+        if au in self.open_aus:
+            self.open_aus.remove(au)
+        else:
+            if len(self.open_aus) >= lat["open_aus"]:
+                self.open_aus.pop(0)
+                self.au_switches += 1
+                busy += lat["au_switch_us"]
+        self.open_aus.append(au)
+        self._busy(busy)
+        self.streaming = self.write_multi
+        self._access("W", block)
+        offset = block * SECTOR
+        self.map[offset:offset + SECTOR] = data
+        self.writes[block] += 1
+        self.blocks_written += 1
+        self._queue(b"\x05\x00")  # data accepted, then busy until programmed
+        if self.write_multi:
+            self.write_next = block + 1
+        else:
+            self.write_next = None
+
+    def stats(self):
+        return {
+            "commands": dict(sorted(self.commands.items())),
+            "blocks_read": self.blocks_read,
+            "blocks_written": self.blocks_written,
+            "distinct_blocks_written": len(self.writes),
+            "max_writes_per_block": max(self.writes.values(), default=0),
+            "busy_ms": round(self.busy_us / 1000, 3),
+            "au_switches": self.au_switches,
+        }
@@ -0,0 +1,110 @@
+"""
+Fake MicroPython ``framebuf`` module.
+
+Implements the monochrome formats the SSD1306 driver uses, writing into the
+caller's buffer exactly like the C module, so the bytes sent to the display
+have the real layout. There is no font: text() draws each non-blank glyph
+as a 5x7 block and keeps the strings in ``FrameBuffer.texts`` (cleared by
+fill()) so tests can check what would be on screen.
+"""
+
+MONO_VLSB = 0
+MVLSB = MONO_VLSB
+RGB565 = 1
+GS4_HMSB = 2
+MONO_HLSB = 3
+MONO_HMSB = 4
+GS2_HMSB = 5
+GS8 = 6
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format=MONO_VLSB, stride=None):
+        if format not in (MONO_VLSB, MONO_HLSB, MONO_HMSB):
+            raise ValueError("format not supported by the simulator")
+        self.buf = buffer
+        self.width = width
+        self.height = height
+        self.format = format
+        self.stride = stride or width
+        self.texts = []
+
+    def _index(self, x, y):
+        if self.format == MONO_VLSB:
+            return (y >> 3) * self.stride + x, y & 7
+        offset = y * ((self.stride + 7) >> 3) + (x >> 3)
+        if self.format == MONO_HLSB:
+            return offset, 7 - (x & 7)
+        return offset, x & 7
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        i, bit = self._index(x, y)
+        if c is None:
+            return (self.buf[i] >> bit) & 1
+        if c:
+            self.buf[i] |= 1 << bit
+        else:
+            self.buf[i] &= ~(1 << bit) & 0xFF
+
+    def fill(self, c):
+        self.buf[:] = (b"\xff" if c else b"\x00") * len(self.buf)
+        self.texts = []
+
+    def fill_rect(self, x, y, w, h, c):
+        for yy in range(max(0, y), min(self.height, y + h)):
+            for xx in range(max(0, x), min(self.width, x + w)):
+                self.pixel(xx, yy, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx, dy = abs(x2 - x1), -abs(y2 - y1)
+        sx, sy = (1 if x1 < x2 else -1), (1 if y1 < y2 else -1)
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def text(self, s, x, y, c=1):
+        self.texts.append((x, y, s))
+        for i, ch in enumerate(s):
+            if ch != " ":
+                self.fill_rect(x + i * 8 + 1, y, 5, 7, c)
+
+    def scroll(self, xstep, ystep):
+        old = [[self.pixel(x, y) for x in range(self.width)] for y in range(self.height)]
+        for y in range(self.height):
+            for x in range(self.width):
+                sx, sy = x - xstep, y - ystep
+                if 0 <= sx < self.width and 0 <= sy < self.height:
+                    self.pixel(x, y, old[sy][sx])
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf.height):
+            for xx in range(fbuf.width):
+                c = fbuf.pixel(xx, yy)
+                if c != key:
+                    self.pixel(x + xx, y + yy, c)
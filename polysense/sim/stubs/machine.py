@@ -0,0 +1,345 @@
+"""
+Fake MicroPython ``machine`` module for the RP2040.
+
+Every peripheral is a thin front end to the attached
+polysense.sim.board.Board, which charges the cost of each access to its
+virtual clock and routes it to the device models wired to that pin or bus.
+polysense/sim/hil.py attaches a fully wired PolySense board; without one,
+an empty board is created on first use (pins float, buses are empty).
+"""
+
+import errno
+
+_board = None
+
+
+def attach(board):
+    """Route this module's peripherals to ``board``."""
+    global _board
+    _board = board
+
+
+def _get_board():
+    global _board
+    if _board is None:
+        from polysense.sim.board import Board
+        _board = Board()
+    return _board
+
+
+def _pin_id(pin):
+    return pin.id if isinstance(pin, Pin) else pin
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=-1, pull=-1, *, value=None, **kwargs):
+        self.id = id
+        self.board = _get_board()
+        self.net = self.board.net(id)
+        if mode != -1 or pull != -1 or value is not None:
+            self.init(mode, pull, value=value)
+
+    def init(self, mode=-1, pull=-1, *, value=None, **kwargs):
+        self.board.clock.charge(self.board.costs["pin_init_us"])
+        if value is not None:
+            self.net.out = 1 if value else 0
+        self.net.configure(None if mode == -1 else mode, None if pull == -1 else pull)
+
+    def value(self, x=None):
+        board = self.board
+        board.clock.charge(board.costs["pin_us"])
+        if x is None:
+            return self.net.read()
+        self.net.write(x)
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    high = on
+    low = off
+
+    def toggle(self):
+        self.net.write(not self.net.out)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self.handler = handler
+        return None
+
+    def __repr__(self):
+        return "Pin(%r)" % (self.id,)
+
+
+class Signal:
+    def __init__(self, pin, invert=False):
+        self.pin = pin if isinstance(pin, Pin) else Pin(pin)
+        self.invert = invert
+
+    def value(self, x=None):
+        if x is None:
+            return self.pin.value() ^ self.invert
+        self.pin.value(bool(x) ^ self.invert)
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+
+class I2C:
+    def __init__(self, id=0, *, scl=None, sda=None, freq=400000, timeout=50000):
+        self.board = _get_board()
+        self.bus = self.board.i2c_bus(id)
+        self.freq = freq
+        self._nack = errno.EIO
+
+    def init(self, *, scl=None, sda=None, freq=400000, timeout=50000):
+        self.freq = freq
+
+    def scan(self):
+        found = []
+        for addr in range(0x08, 0x78):
+            try:
+                self.bus.transfer(addr, b"", 0, self.freq, self._nack)
+                found.append(addr)
+            except OSError:
+                pass
+        return found
+
+    def writeto(self, addr, buf, stop=True):
+        self.bus.transfer(addr, buf, 0, self.freq, self._nack)
+        return len(buf)
+
+    def writevto(self, addr, vector, stop=True):
+        data = b"".join(bytes(b) for b in vector)
+        self.bus.transfer(addr, data, 0, self.freq, self._nack)
+        return len(data)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return self.bus.transfer(addr, None, nbytes, self.freq, self._nack)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self.bus.transfer(addr, None, len(buf), self.freq, self._nack)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, *, addrsize=8):
+        return self.bus.transfer(addr, self._memaddr(memaddr, addrsize), nbytes,
+                                 self.freq, self._nack)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, *, addrsize=8):
+        buf[:] = self.bus.transfer(addr, self._memaddr(memaddr, addrsize), len(buf),
+                                   self.freq, self._nack)
+
+    def writeto_mem(self, addr, memaddr, buf, *, addrsize=8):
+        self.bus.transfer(addr, self._memaddr(memaddr, addrsize) + bytes(buf), 0,
+                          self.freq, self._nack)
+
+    @staticmethod
+    def _memaddr(memaddr, addrsize):
+        return memaddr.to_bytes(addrsize // 8, "big")
+
+
+class SoftI2C(I2C):
+    def __init__(self, scl, sda, *, freq=400000, timeout=50000):
+        self.board = _get_board()
+        self.bus = self.board.soft_i2c_bus(_pin_id(scl), _pin_id(sda))
+        self.freq = freq
+        self._nack = errno.ENODEV
+
+
+class SPI:
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id=0, baudrate=1000000, *, polarity=0, phase=0, bits=8,
+                 firstbit=MSB, sck=None, mosi=None, miso=None):
+        self.board = _get_board()
+        self.bus = self.board.spi_bus(id)
+        self.baudrate = baudrate
+
+    def init(self, baudrate=1000000, *, polarity=0, phase=0, bits=8, firstbit=MSB,
+             sck=None, mosi=None, miso=None):
+        self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        self.bus.exchange(bytes(buf), self.baudrate)
+
+    def read(self, nbytes, write=0x00):
+        return self.bus.exchange(bytes((write,)) * nbytes, self.baudrate)
+
+    def readinto(self, buf, write=0x00):
+        buf[:] = self.bus.exchange(bytes((write,)) * len(buf), self.baudrate)
+
+    def write_readinto(self, write_buf, read_buf):
+        read_buf[:] = self.bus.exchange(bytes(write_buf), self.baudrate)
+
+
+class SoftSPI(SPI):
+    def __init__(self, baudrate=500000, *, polarity=0, phase=0, bits=8, firstbit=SPI.MSB,
+                 sck=None, mosi=None, miso=None):
+        super().__init__(("soft", _pin_id(sck)), baudrate)
+
+
+class ADC:
+    CORE_TEMP = 4
+
+    def __init__(self, id):
+        self.board = _get_board()
+        id = _pin_id(id)
+        self.channel = id - 26 if isinstance(id, int) and id >= 26 else id
+
+    def read_u16(self):
+        board = self.board
+        board.clock.charge(board.costs["adc_us"])
+        source = board.adc.get(self.channel)
+        volts = source() if source else 0.0
+        raw12 = max(0, min(4095, int(volts / 3.3 * 4095 + 0.5)))
+        return (raw12 << 4) | (raw12 >> 8)  # 12-bit result scaled like the rp2 port
+
+
+class RTC:
+    def __init__(self):
+        self.board = _get_board()
+
+    def datetime(self, datetimetuple=None):
+        board = self.board
+        if datetimetuple is not None:
+            y, mo, d, _, h, mi, s = datetimetuple[:7]
+            board.set_rtc(y, mo, d, h, mi, s)
+            return None
+        t = board.localtime()
+        sub = int(board.epoch() % 1 * 1e6)
+        return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_wday, t.tm_hour, t.tm_min, t.tm_sec, sub)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, *, mode=PERIODIC, period=-1, freq=-1, callback=None,
+                 tick_hz=1000):
+        self.board = _get_board()
+        self.callback = None
+        if callback is not None:
+            self.init(mode=mode, period=period, freq=freq, callback=callback, tick_hz=tick_hz)
+
+    def init(self, *, mode=PERIODIC, period=-1, freq=-1, callback=None, tick_hz=1000):
+        if freq > 0:
+            self.period_us = 1e6 / freq
+        else:
+            self.period_us = period * 1e6 / tick_hz
+        self.mode = mode
+        self.callback = callback
+        self.due_us = self.board.clock.now_us + self.period_us
+        self.board.add_timer(self)
+
+    def fire(self):
+        if self.mode == self.PERIODIC:
+            self.due_us += self.period_us
+        else:
+            self.board.remove_timer(self)
+        if self.callback:
+            self.callback(self)
+
+    def deinit(self):
+        self.board.remove_timer(self)
+
+
+class WDT:
+    def __init__(self, id=0, timeout=5000):
+        self.board = _get_board()
+        self.timeout_us = timeout * 1000
+        self.fed_us = self.board.clock.now_us
+
+    def feed(self):
+        self.fed_us = self.board.clock.now_us
+
+
+class _Mem:
+    def __init__(self):
+        self.words = {}
+
+    def __getitem__(self, addr):
+        return self.words.get(addr, 0)
+
+    def __setitem__(self, addr, value):
+        self.words[addr] = value
+
+
+mem8 = _Mem()
+mem16 = _Mem()
+mem32 = _Mem()
+
+PWRON_RESET = 1
+WDT_RESET = 3
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
+
+
+def freq(hz=None):
+    return 125000000 if hz is None else None
+
+
+def unique_id():
+    return b"\xe6\x61\x41\x04\x03\x2f\x5a\x2c"
+
+
+def reset_cause():
+    return PWRON_RESET
+
+
+def reset():
+    from polysense.sim.board import Halt
+    raise Halt("machine.reset()")
+
+
+soft_reset = reset
+
+
+def idle():
+    _get_board().sleep_us(1)
+
+
+def lightsleep(time_ms=None):
+    _get_board().sleep_us((time_ms or 0) * 1000)
+
+
+deepsleep = lightsleep
+
+
+def time_pulse_us(pin, pulse_level, timeout_us=1000000):
+    board = pin.board
+    clock = board.clock
+    t0 = clock.now_us
+    while pin.value() != pulse_level:
+        if clock.now_us - t0 > timeout_us:
+            return -2
+    t1 = clock.now_us
+    while pin.value() == pulse_level:
+        if clock.now_us - t1 > timeout_us:
+            return -1
+    return int(clock.now_us - t1)
@@ -0,0 +1,59 @@
+"""
+Fake MicroPython ``micropython`` module.
+
+Code emitters are no-ops on CPython: decorated functions run as plain
+Python, so native/viper code paths should be guarded by a platform check
+(see PCB/Firmware/softi2c.py).
+"""
+
+
+def const(value):
+    return value
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def asm_thumb(func):
+    raise NotImplementedError("inline assembler is not available on CPython")
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def schedule(func, arg):
+    func(arg)
+
+
+def opt_level(level=None):
+    return 0 if level is None else None
+
+
+def mem_info(verbose=False):
+    print("mem: simulated")
+
+
+def qstr_info(verbose=False):
+    pass
+
+
+def stack_use():
+    return 0
+
+
+def heap_lock():
+    return 0
+
+
+def heap_unlock():
+    return 0
+
+
+def kbd_intr(chr):
+    pass
@@ -0,0 +1,64 @@
+"""
+Fake MicroPython ``network`` module.
+
+The host already has a network, so WLAN only tracks the radio state the
+firmware asks for and how long the radio was on. Put this directory on
+sys.path before importing firmware modules.
+"""
+
+import time
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 0
+STAT_CONNECTING = 1
+STAT_GOT_IP = 3
+
+_interfaces = {}
+
+
+class WLAN:
+    """Singleton per interface, like the real driver."""
+
+    def __new__(cls, interface=STA_IF):
+        wlan = _interfaces.get(interface)
+        if wlan is None:
+            wlan = object.__new__(cls)
+            wlan._active = False
+            wlan._connected = False
+            wlan._on_since = None
+            wlan.radio_on_s = 0.0
+            wlan.activations = 0
+            wlan.ssid = None
+            _interfaces[interface] = wlan
+        return wlan
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        if state and not self._active:
+            self._on_since = time.time()
+            self.activations += 1
+        elif not state and self._active:
+            self.radio_on_s += time.time() - self._on_since
+            self._connected = False
+        self._active = bool(state)
+
+    def connect(self, ssid=None, key=None):
+        if not self._active:
+            raise OSError("WLAN not active")
+        self.ssid = ssid
+        self._connected = True
+
+    def disconnect(self):
+        self._connected = False
+
+    def isconnected(self):
+        return self._connected
+
+    def status(self, param=None):
+        return STAT_GOT_IP if self._connected else STAT_IDLE
+
+    def ifconfig(self, config=None):
+        return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
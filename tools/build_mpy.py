@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Precompile the MicroPython drivers in lib/ to .mpy bytecode.
+
+Importing a .mpy skips the on-device parser and compiler, which is most of
+the import cost of the drivers at boot. Copy the generated files to the
+Pico's /lib instead of the .py sources (e.g. with mpremote).
+
+Usage:
+    python tools/build_mpy.py [--mpy-cross PATH] [--out build/lib]
+
+Requires mpy-cross matching the firmware version (pip install mpy-cross).
+"""
+
+import argparse
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mpy-cross", default="mpy-cross", help="mpy-cross executable")
+    parser.add_argument("--out", default=str(ROOT / "build" / "lib"), help="output directory")
+    parser.add_argument("--arch", default="armv6m", help="native arch (armv6m for RP2040)")
+    args = parser.parse_args()
+
+    out_dir = pathlib.Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    for source in sorted((ROOT / "lib").glob("*.py")):
+        target = out_dir / (source.stem + ".mpy")
+        cmd = [args.mpy_cross, "-O2", "-march=" + args.arch, "-o", str(target), str(source)]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"✗ {source.name}: {result.stderr.strip()}")
+            return 1
+        print(f"✓ {source.name} -> {target.relative_to(ROOT) if target.is_relative_to(ROOT) else target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())